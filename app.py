@@ -1,10 +1,34 @@
 from flask_restful import Api
+from werkzeug.middleware.proxy_fix import ProxyFix
 from blacklist import BLACKLIST
 import jwt_utils
-from resources.user import User, UserList, UserCreate, UserLogin, UserLogout, UserChangePassword
+from resources.user import User, UserList, UserCreate, UserLogin, UserLogout, UserChangePassword, UserTokenRefresh
 from resources.maintenance_activity import MaintenanceActivity, MaintenanceActivityCreate, MaintenanceActivityList, MaintenanceActivityAssign
 from resources.maintainer_availability import MaintainerWeeklyAvailabilityList, MaintainerDailyAvailability
+from resources.batch import Batch
+from resources.agenda_events import AgendaEvents
+from resources.metrics import Metrics
+from resources.slow_query import SlowQueryList
+from resources.request_profile import RequestProfile, RequestProfileList
+from resources.health import Health, Readiness
+from resources.job import Job, JobCreate, JobResultDownload
 from flask_seeder import FlaskSeeder
+from common.password_hasher import hasher
+from common.rate_limit import LoginThrottle
+from common.json_representation import output_json
+from common.compression import Compression
+from common.batch import BatchDispatcher
+from common.response_cache import ResponseCache
+from common.agenda_feed import agenda_feed
+from common.metrics import metrics
+from common.query_audit import QueryAuditor
+from common.slow_query_log import SlowQueryLog
+from common.profiler import RequestProfiler
+from common.tracing import Tracer
+from common.jobs import JobRunner
+import common.job_kinds  # registers the built-in job kinds
+from common.bootstrap import Bootstrap, bootstrap
+from common.health import ReadinessProbe
 
 
 def create_app(config_class="config.Config"):
@@ -12,13 +36,29 @@ def create_app(config_class="config.Config"):
     app = Flask(__name__)
     app.config.from_object(config_class)
     jwt_utils.bind_jwt_messages(app)
+    BLACKLIST.init_app(app)
+    hasher.init_app(app)
+    LoginThrottle.from_config(app.config).init_app(app)
+    Compression().init_app(app)
+    BatchDispatcher.from_config(app.config).init_app(app)
+    ResponseCache.from_config(app.config).init_app(app)
+    agenda_feed.init_app(app)
+    metrics.init_app(app)
+    QueryAuditor().init_app(app)
+    SlowQueryLog.from_config(app.config).init_app(app)
+    RequestProfiler.from_config(app.config).init_app(app)
+    Tracer.from_config(app.config).init_app(app)
+    ReadinessProbe.from_config(app.config).init_app(app)
+    JobRunner.from_config(app.config).init_app(app)
     api = Api(app)
+    api.representation("application/json")(output_json)
 
     api.add_resource(User, "/user/<string:username>")
     api.add_resource(UserCreate, "/user")
     api.add_resource(UserList, "/users")
     api.add_resource(UserLogin, "/login")
     api.add_resource(UserLogout, "/logout")
+    api.add_resource(UserTokenRefresh, "/refresh")
     api.add_resource(UserChangePassword, "/change_password")
     api.add_resource(MaintenanceActivity, "/activity/<int:id>")
     api.add_resource(MaintenanceActivityCreate, "/activity")
@@ -29,21 +69,34 @@ def create_app(config_class="config.Config"):
                      "/maintainer/<string:username>/availability")
     api.add_resource(MaintenanceActivityAssign,
                      "/activity/<int:id>/assign")
+    api.add_resource(Batch, "/batch")
+    api.add_resource(AgendaEvents, "/events")
+    api.add_resource(SlowQueryList, "/slow_queries")
+    api.add_resource(Health, "/healthz")
+    api.add_resource(Readiness, "/readyz")
+    api.add_resource(JobCreate, "/jobs")
+    api.add_resource(Job, "/jobs/<int:id>")
+    api.add_resource(JobResultDownload, "/jobs/<int:id>/result")
+    if app.config["METRICS_ENABLED"]:
+        api.add_resource(Metrics, "/metrics")
+    if app.config["PROFILING_ENABLED"]:
+        api.add_resource(RequestProfileList, "/profiles")
+        api.add_resource(RequestProfile, "/profile/<string:name>")
 
     from db import db
     db.init_app(app)
     seeder = FlaskSeeder()
     seeder.init_app(app, db)
+    Bootstrap().init_app(app)
+    if app.config.get("TRUSTED_PROXY_HOPS"):
+        hops = app.config["TRUSTED_PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
     return app
 
 
 if __name__ == "__main__":
     app = create_app('config.Config')
-
-    from db import db
-
-    @app.before_first_request
-    def create_tables():
-        db.create_all()
+    with app.app_context():
+        bootstrap()
 
     app.run()
@@ -0,0 +1,59 @@
+"""Measures the per-request overhead of the role_required decorator with and without the verified token cache.
+
+Usage:
+    python -m bench.auth_decorator [--calls 20000]
+"""
+from argparse import ArgumentParser
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from blacklist import BLACKLIST
+import jwt_utils
+import json
+import time
+
+
+def run(cache_size, calls):
+    """Calls a role protected function many times with the same access token
+
+    Args:
+        cache_size (int): The verified token cache size, 0 disables the cache
+        calls (int): The number of calls to perform
+
+    Returns:
+        dict of (str, any): The measured overhead
+    """
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY="benchmark", JWT_BLACKLIST_ENABLED=True,
+                      JWT_BLACKLIST_TOKEN_CHECKS=["access"], REVOCATION_STORE="memory",
+                      JWT_VERIFIED_TOKEN_CACHE_SIZE=cache_size)
+    jwt_utils.bind_jwt_messages(app)
+    BLACKLIST.init_app(app)
+
+    @jwt_utils.role_required("planner")
+    def endpoint():
+        return {}, 200
+
+    with app.app_context():
+        token = create_access_token(identity="planner", user_claims={
+                                    "username": "planner", "role": "planner"})
+
+    headers = {"Authorization": f"Bearer {token}"}
+    with app.test_request_context(headers=headers):
+        endpoint()
+        start = time.perf_counter()
+        for _ in range(calls):
+            endpoint()
+        elapsed = time.perf_counter() - start
+
+    return {
+        "cache_size": cache_size,
+        "calls": calls,
+        "microseconds_per_call": round(elapsed / calls * 1e6, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps([run(0, args.calls), run(1024, args.calls)], indent=2))
@@ -0,0 +1,252 @@
+"""Measures the latency and the SQL statements of the main endpoints on seeded datasets of several sizes.
+
+Every scale is a number of maintainers and of activities, i.e. 10:10000. A fifth of the activities is
+assigned, each one to its own hour of a maintainer's agenda. The response cache is disabled unless --cache
+is given, so that every call reaches the models. The results are printed and, with --output, written as json
+so that the runs of two commits can be compared.
+
+Usage:
+    python -m bench.endpoints [--scales 10:10000,100:100000,1000:1000000] [--calls 200] [--cache] [--output results.json]
+"""
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from app import create_app
+from config import MAINTAINER_WORK_HOURS, MAINTAINER_WORK_START_HOUR, TestConfig
+from common.query_audit import QueryAudit
+import json
+import subprocess
+import time
+
+WEEK_DAYS = ("monday", "tuesday", "wednesday",
+             "thursday", "friday", "saturday", "sunday")
+ESTIMATED_TIMES = (30, 60, 90, 120)
+# Activities of this week are left unassigned, so that they can be assigned during the benchmark
+FREE_WEEK = 52
+BATCH_SIZE = 10000
+
+
+def slot(index, maintainers):
+    """Gets the index-th hour of the maintainers' agendas, going through every maintainer, then every hour,
+    then every day and week
+
+    Args:
+        index (int): The hour index
+        maintainers (int): The number of maintainers
+
+    Returns:
+        (str, int, str, int): The maintainer username, week, week day and start time
+    """
+    hour, maintainer = divmod(index, maintainers)
+    day, start_time = divmod(hour, MAINTAINER_WORK_HOURS)
+    week, week_day = divmod(day, len(WEEK_DAYS))
+    return (f"maintainer{maintainer}", week % (FREE_WEEK - 1) + 1, WEEK_DAYS[week_day],
+            MAINTAINER_WORK_START_HOUR + start_time)
+
+
+def activity_rows(activities, maintainers):
+    """Generates the activities to be seeded, in batches
+
+    Args:
+        activities (int): The number of activities
+        maintainers (int): The number of maintainers
+
+    Yields:
+        list of (dict of (str, any)): The activities of a batch
+    """
+    rows = []
+    for activity_id in range(1, activities + 1):
+        row = {"activity_id": activity_id, "activity_type": "planned", "site": "management", "typology": "electrical",
+               "description": "description", "interruptible": True, "materials": "drill",
+               "workspace_notes": "notes", "week": activity_id % FREE_WEEK + 1,
+               "estimated_time": ESTIMATED_TIMES[activity_id // FREE_WEEK % len(ESTIMATED_TIMES)],
+               "maintainer_username": None, "week_day": None, "start_time": None}
+        if activity_id % 5 == 0:
+            username, week, week_day, start_time = slot(
+                activity_id // 5, maintainers)
+            row.update(maintainer_username=username, week=week, week_day=week_day, start_time=start_time,
+                       estimated_time=ESTIMATED_TIMES[activity_id // 5 % 2])
+        rows.append(row)
+        if len(rows) == BATCH_SIZE:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def seed(app, maintainers, activities, password="password"):
+    """Creates the tables, an admin, a planner, the maintainers and the activities
+
+    Args:
+        app (Flask): The app
+        maintainers (int): The number of maintainers
+        activities (int): The number of activities
+        password (str, optional): The password of every user. Defaults to "password".
+    """
+    with app.app_context():
+        from db import db
+        from common.password_hasher import hasher
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        db.create_all()
+        password = hasher.hash(password)
+        users = [{"username": role, "password": password, "role": role} for role in ("admin", "planner")] + \
+            [{"username": f"maintainer{index}", "password": password, "role": "maintainer"}
+             for index in range(maintainers)]
+        db.session.execute(UserModel.__table__.insert(), users)
+        for rows in activity_rows(activities, maintainers):
+            db.session.execute(
+                MaintenanceActivityModel.__table__.insert(), rows)
+        db.session.commit()
+
+
+def percentile(values, fraction):
+    """Gets a percentile of the values, by the nearest rank
+
+    Args:
+        values (list of (float)): The sorted values
+        fraction (float): The percentile, between 0 and 1
+
+    Returns:
+        float: The percentile
+    """
+    return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+
+def measure(client, calls, request):
+    """Makes a request many times, measuring its latency and SQL statements
+
+    Args:
+        client (FlaskClient): The test client
+        calls (int): The number of calls
+        request (callable): The function making the call-th request with the client
+
+    Returns:
+        dict of (str, any): The latency percentiles in milliseconds, the statements per call and the status codes
+    """
+    latencies, queries, statuses = [], 0, {}
+    for call in range(calls):
+        with QueryAudit() as audit:
+            start = time.perf_counter()
+            status = request(client, call).status_code
+            latencies.append(time.perf_counter() - start)
+        queries += audit.total
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies.sort()
+    return {
+        "p50_milliseconds": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_milliseconds": round(percentile(latencies, 0.99) * 1000, 3),
+        "queries_per_call": round(queries / calls, 2),
+        "statuses": statuses,
+    }
+
+
+def endpoints(maintainers, activities):
+    """Gets the requests of the benchmarked endpoints, each varying with the call number
+
+    Args:
+        maintainers (int): The number of seeded maintainers
+        activities (int): The number of seeded activities
+
+    Returns:
+        dict of (str, callable): The requests by endpoint
+    """
+    def unassigned(call):
+        # skips the assigned activities, whose id is a multiple of 5
+        return (call * 7919 % activities) // 5 * 5 % activities + 1
+
+    def free(call):
+        # the unassigned activities of the free week: 52n+51 with n not congruent to 2 modulo 5
+        call %= (activities + 1) // FREE_WEEK // 5 * 4
+        return FREE_WEEK * (call // 4 * 5 + (0, 1, 3, 4)[call % 4]) + FREE_WEEK - 1
+
+    def assignment(call):
+        # two hours apart, so that the activities taking two hours do not overlap
+        day, maintainer = divmod(call, maintainers)
+        week_day, start_time = divmod(day, 4)
+        return {"maintainer_username": f"maintainer{maintainer}", "week_day": WEEK_DAYS[week_day % len(WEEK_DAYS)],
+                "start_time": MAINTAINER_WORK_START_HOUR + 2 * start_time}
+
+    return {
+        "/activities": lambda client, call: client.get(
+            "/activities", query_string={"week": call % FREE_WEEK + 1, "current_page": call % 3 + 1}),
+        "/maintainer/<id>/availabilities": lambda client, call: client.get(
+            f"/maintainer/{unassigned(call)}/availabilities",
+            query_string={"current_page": call % max(1, maintainers // 10) + 1}),
+        "/maintainer/<username>/availability": lambda client, call: client.get(
+            f"/maintainer/maintainer{call % maintainers}/availability",
+            query_string={"activity_id": unassigned(call), "week_day": WEEK_DAYS[call % len(WEEK_DAYS)]}),
+        "/activity/<id>/assign": lambda client, call: client.put(
+            f"/activity/{free(call)}/assign", data=assignment(call)),
+        "/login": lambda client, call: client.post(
+            "/login", data={"username": f"maintainer{call % maintainers}", "password": "password"}),
+    }
+
+
+def run(maintainers, activities, calls, cache, method):
+    """Seeds a dataset and measures every endpoint on it
+
+    Args:
+        maintainers (int): The number of maintainers
+        activities (int): The number of activities
+        calls (int): The number of calls of every endpoint
+        cache (bool): Whether the response cache is enabled
+        method (str): The password hashing method and cost
+
+    Returns:
+        dict of (str, any): The seeding time and the measures of every endpoint
+    """
+    with TemporaryDirectory() as directory:
+        class BenchConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory}/bench.db"
+            JWT_SECRET_KEY = TestConfig.JWT_SECRET_KEY or "benchmark"
+            PASSWORD_HASH_METHOD = method
+            LOGIN_USERNAME_BURST = LOGIN_ADDRESS_BURST = calls + 1
+            RESPONSE_CACHE_SIZE = TestConfig.RESPONSE_CACHE_SIZE if cache else 0
+
+        app = create_app(BenchConfig)
+        start = time.perf_counter()
+        seed(app, maintainers, activities)
+        results = {"maintainers": maintainers, "activities": activities,
+                   "seed_seconds": round(time.perf_counter() - start, 3), "endpoints": {}}
+
+        client = app.test_client()
+        access_token = client.post(
+            "/login", data={"username": "planner", "password": "password"}).get_json()["access_token"]
+        client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {access_token}"
+        for name, request in endpoints(maintainers, activities).items():
+            results["endpoints"][name] = measure(client, calls, request)
+        return results
+
+
+def commit():
+    """Gets the current commit, if the benchmark runs in a git checkout
+
+    Returns:
+        str: The commit hash, or None
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", default="10:10000,100:100000,1000:1000000",
+                        help="comma separated maintainers:activities pairs")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--method", default="pbkdf2:sha256:150000")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    scales = [tuple(int(value) for value in scale.split(":"))
+              for scale in args.scales.split(",")]
+    results = {"commit": commit(), "calls": args.calls, "cache": args.cache, "method": args.method,
+               "scales": [run(maintainers, activities, args.calls, args.cache, args.method)
+                          for maintainers, activities in scales]}
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,62 @@
+"""Compares the standard library and the orjson encoders on large activity list responses.
+
+Usage:
+    python -m bench.json_encoding [--rows 1000] [--repeat 50]
+"""
+from argparse import ArgumentParser
+from common import json_representation
+from models.maintenance_activity import MaintenanceActivityModel
+# Registers UserModel, which is referenced by the activity relationship
+import models.user
+import json
+import time
+
+
+def build_page(rows):
+    """Builds an /activities response page without touching the database
+
+    Args:
+        rows (int): The number of activities in the page
+
+    Returns:
+        dict of (str, any): The response data
+    """
+    activities = [MaintenanceActivityModel(activity_id=i, activity_type="planned", site="management",
+                                           typology="electrical", description="Planned electrical Maintenance Activity " * 2,
+                                           estimated_time=30, interruptible=True, week=1 + i % 52,
+                                           materials="drill", workspace_notes="Site: Management; Typology: Electrical")
+                  for i in range(rows)]
+    return {"rows": [activity.json() for activity in activities],
+            "meta": {"count": rows, "current_page": 1, "page_count": 1, "page_size": rows}}
+
+
+def measure(data, repeat):
+    """Encodes the same data many times
+
+    Args:
+        data (dict of (str, any)): The data to encode
+        repeat (int): The number of encodings
+
+    Returns:
+        dict of (str, float): The time spent per encoding and the encoded size
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = json_representation.dumps(data)
+    elapsed = time.perf_counter() - start
+    return {"milliseconds_per_response": round(elapsed / repeat * 1000, 3), "bytes": len(body)}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    data = build_page(args.rows)
+    results = {}
+    if json_representation.orjson is not None:
+        results["orjson"] = measure(data, args.repeat)
+    json_representation.orjson = None
+    results["json"] = measure(data, args.repeat)
+    print(json.dumps(results, indent=2))
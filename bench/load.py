@@ -0,0 +1,349 @@
+"""Drives weighted planner, admin and maintainer scenarios with many concurrent virtual users.
+
+Every virtual user picks a scenario by its weight, logs in and runs the scenario steps in a loop, pausing
+between them for a random think time (exponentially distributed around --think seconds). At the end it
+reports the throughput, the error rate and the latency percentiles of every step and of the whole run.
+
+The app runs in-process, on a temporary sqlite database seeded like bench.endpoints, unless --url is given:
+then the requests go to a running server, whose database must hold the users seeded by bench.endpoints
+(admin, planner and maintainer0...maintainerN, all with the same --password).
+
+Usage:
+    python -m bench.load [--users 20] [--duration 30] [--think 1] [--weights planner=6,admin=1,maintainer=3]
+                         [--scale 100:100000] [--url http://localhost:5000] [--output results.json]
+"""
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from threading import Event, Lock, Thread
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from bench.endpoints import WEEK_DAYS, FREE_WEEK, percentile, seed
+import json
+import random
+import time
+
+
+class InProcessTransport:
+    """Sends the requests to the app through its test client, without a server"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers, query=None, data=None):
+        """Sends a request
+
+        Args:
+            method (str): The HTTP method
+            path (str): The path
+            headers (dict of (str, str)): The request headers
+            query (dict of (str, any), optional): The query string arguments. Defaults to None.
+            data (dict of (str, any), optional): The form arguments. Defaults to None.
+
+        Returns:
+            (int, any): The status code and the json body, None if the body is not json
+        """
+        res = self.client.open(path, method=method, headers=headers,
+                               query_string=query, data=data)
+        return res.status_code, res.get_json(silent=True)
+
+
+class HttpTransport:
+    """Sends the requests to a running server"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, headers, query=None, data=None):
+        """Sends a request
+
+        Args:
+            method (str): The HTTP method
+            path (str): The path
+            headers (dict of (str, str)): The request headers
+            query (dict of (str, any), optional): The query string arguments. Defaults to None.
+            data (dict of (str, any), optional): The form arguments. Defaults to None.
+
+        Returns:
+            (int, any): The status code and the json body, None if the body is not json
+        """
+        url = self.url + path + ("?" + urlencode(query) if query else "")
+        body = urlencode(data).encode() if data is not None else None
+        request = Request(url, data=body, headers=headers, method=method)
+        try:
+            with urlopen(request, timeout=self.timeout) as res:
+                status, content = res.status, res.read()
+        except HTTPError as e:
+            status, content = e.code, e.read()
+        except URLError:
+            return 0, None
+        try:
+            return status, json.loads(content)
+        except ValueError:
+            return status, None
+
+
+class Stats:
+    """The latencies and the errors of every step, shared by the virtual users"""
+
+    def __init__(self):
+        self.steps = {}
+        self._lock = Lock()
+
+    def record(self, step, latency, error):
+        """Records a call
+
+        Args:
+            step (str): The step name
+            latency (float): The seconds the call took
+            error (bool): Whether the call failed
+        """
+        with self._lock:
+            latencies, errors = self.steps.setdefault(step, ([], [0]))
+            latencies.append(latency)
+            errors[0] += error
+
+    @staticmethod
+    def summary(latencies, errors, duration):
+        """Summarizes the calls of a step
+
+        Args:
+            latencies (list of (float)): The latencies
+            errors (int): The number of failed calls
+            duration (float): The seconds the run took
+
+        Returns:
+            dict of (str, any): The throughput, error rate and latency percentiles in milliseconds
+        """
+        latencies = sorted(latencies)
+        return {
+            "calls": len(latencies),
+            "throughput_per_second": round(len(latencies) / duration, 2),
+            "error_rate": round(errors / len(latencies), 4),
+            "p50_milliseconds": round(percentile(latencies, 0.5) * 1000, 3),
+            "p90_milliseconds": round(percentile(latencies, 0.9) * 1000, 3),
+            "p99_milliseconds": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+
+    def report(self, duration):
+        """Summarizes the run
+
+        Args:
+            duration (float): The seconds the run took
+
+        Returns:
+            dict of (str, any): The summary of the whole run and of every step
+        """
+        with self._lock:
+            steps = {step: (list(latencies), errors[0])
+                     for step, (latencies, errors) in self.steps.items()}
+        if not steps:
+            return {"total": None, "steps": {}}
+        every_latency = [latency for latencies,
+                         _ in steps.values() for latency in latencies]
+        every_error = sum(errors for _, errors in steps.values())
+        return {
+            "total": self.summary(every_latency, every_error, duration),
+            "steps": {step: self.summary(latencies, errors, duration)
+                      for step, (latencies, errors) in sorted(steps.items())},
+        }
+
+
+class VirtualUser:
+    """A user running a scenario in a loop, with think times between its steps"""
+
+    def __init__(self, transport, stats, stop, think, maintainers, password):
+        self.transport = transport
+        self.stats = stats
+        self.stop = stop
+        self.think = think
+        self.maintainers = maintainers
+        self.password = password
+        self.headers = {}
+
+    def call(self, step, method, path, query=None, data=None, expected=(200,)):
+        """Makes a request, recording its latency and whether it failed
+
+        Args:
+            step (str): The step name
+            method (str): The HTTP method
+            path (str): The path
+            query (dict of (str, any), optional): The query string arguments. Defaults to None.
+            data (dict of (str, any), optional): The form arguments. Defaults to None.
+            expected (tuple of (int), optional): The status codes of a successful call. Defaults to (200,).
+
+        Returns:
+            any: The json body, None if the call failed
+        """
+        start = time.perf_counter()
+        status, body = self.transport.request(
+            method, path, self.headers, query, data)
+        failed = status not in expected
+        self.stats.record(step, time.perf_counter() - start, failed)
+        return None if failed else body
+
+    def pause(self):
+        """Waits for a think time, or until the run stops
+
+        Returns:
+            bool: Whether the run goes on
+        """
+        if self.think > 0:
+            self.stop.wait(random.expovariate(1 / self.think))
+        return not self.stop.is_set()
+
+    def login(self, username):
+        """Logs in, setting the authorization header of the next calls
+
+        Args:
+            username (str): The username
+
+        Returns:
+            dict of (str, str): The tokens, None if the login failed
+        """
+        self.headers = {}
+        tokens = self.call("login", "POST", "/login", data={
+                           "username": username, "password": self.password})
+        if tokens:
+            self.headers = {
+                "Authorization": f"Bearer {tokens['access_token']}"}
+        return tokens
+
+    def planner(self):
+        """Lists the activities of a week, opens the availabilities of the maintainers for one of them,
+        opens the agenda of the most available maintainer and assigns the activity to its freest hour
+        """
+        if not self.login("planner"):
+            return
+        while self.pause():
+            page = self.call("list week", "GET", "/activities",
+                             query={"week": random.randint(1, FREE_WEEK)})
+            if not page or not page["rows"] or not self.pause():
+                continue
+            activity_id = random.choice(page["rows"])["activity_id"]
+            availabilities = self.call(
+                "open availabilities", "GET", f"/maintainer/{activity_id}/availabilities")
+            if not availabilities or not availabilities["rows"] or not self.pause():
+                continue
+            username = random.choice(availabilities["rows"])[
+                "user"]["username"]
+            week_day = random.choice(WEEK_DAYS)
+            agenda = self.call("open agenda", "GET", f"/maintainer/{username}/availability",
+                               query={"activity_id": activity_id, "week_day": week_day})
+            if not agenda or not self.pause():
+                continue
+            start_time = max(agenda, key=agenda.get)
+            # an activity that does not fit in the agenda is a legitimate answer
+            self.call("assign", "PUT", f"/activity/{activity_id}/assign", expected=(200, 400),
+                      data={"maintainer_username": username, "week_day": week_day, "start_time": start_time})
+
+    def admin(self):
+        """Lists the users and opens one of them"""
+        if not self.login("admin"):
+            return
+        while self.pause():
+            page = self.call("list users", "GET", "/users",
+                             query={"current_page": random.randint(1, max(1, self.maintainers // 10))})
+            if not page or not page["rows"] or not self.pause():
+                continue
+            username = random.choice(page["rows"])["username"]
+            self.call("open user", "GET", f"/user/{username}")
+
+    def maintainer(self):
+        """Logs in, renews the access token and logs out"""
+        username = f"maintainer{random.randrange(self.maintainers)}"
+        while self.pause():
+            tokens = self.login(username)
+            if not tokens or not self.pause():
+                continue
+            access_headers = self.headers
+            self.headers = {
+                "Authorization": f"Bearer {tokens['refresh_token']}"}
+            self.call("refresh", "POST", "/refresh")
+            self.headers = access_headers
+            if self.pause():
+                self.call("logout", "POST", "/logout")
+
+
+def run(transport_factory, users, duration, think, weights, maintainers, password):
+    """Runs the virtual users for a while
+
+    Args:
+        transport_factory (callable): The function creating the transport of a virtual user
+        users (int): The number of virtual users
+        duration (float): The seconds the run lasts
+        think (float): The mean think time in seconds
+        weights (dict of (str, float)): The weight of every scenario
+        maintainers (int): The number of seeded maintainers
+        password (str): The password of the seeded users
+
+    Returns:
+        dict of (str, any): The report of the run
+    """
+    stats, stop = Stats(), Event()
+    scenarios = random.choices(
+        list(weights), weights=list(weights.values()), k=users)
+    threads = []
+    for scenario in scenarios:
+        user = VirtualUser(transport_factory(), stats,
+                           stop, think, maintainers, password)
+        threads.append(Thread(target=getattr(
+            user, scenario), daemon=True))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    report = stats.report(time.perf_counter() - start)
+    report["scenarios"] = {scenario: scenarios.count(
+        scenario) for scenario in weights}
+    return report
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--think", type=float, default=1,
+                        help="mean think time in seconds, 0 for none")
+    parser.add_argument("--weights", default="planner=6,admin=1,maintainer=3")
+    parser.add_argument("--scale", default="100:100000",
+                        help="maintainers:activities seeded in-process, or already seeded at --url")
+    parser.add_argument("--url")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--method", default="pbkdf2:sha256:150000")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    weights = {name: float(weight) for name, weight in (
+        pair.split("=") for pair in args.weights.split(","))}
+    maintainers, activities = (int(value) for value in args.scale.split(":"))
+    settings = {"users": args.users, "duration": args.duration,
+                "think": args.think, "weights": weights}
+    if args.url:
+        results = run(lambda: HttpTransport(args.url), args.users, args.duration, args.think,
+                      weights, maintainers, args.password)
+        results.update(settings, url=args.url)
+    else:
+        from app import create_app
+        from config import TestConfig
+        with TemporaryDirectory() as directory:
+            class LoadConfig(TestConfig):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory}/load.db"
+                JWT_SECRET_KEY = TestConfig.JWT_SECRET_KEY or "benchmark"
+                PASSWORD_HASH_METHOD = args.method
+                # the virtual users share the same address and log in over and over
+                LOGIN_ADDRESS_BURST = LOGIN_USERNAME_BURST = 1000000
+
+            app = create_app(LoadConfig)
+            seed(app, maintainers, activities, args.password)
+            results = run(lambda: InProcessTransport(app), args.users, args.duration, args.think,
+                          weights, maintainers, args.password)
+            results.update(settings, scale=args.scale)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    print(json.dumps(results, indent=2))
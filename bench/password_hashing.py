@@ -0,0 +1,65 @@
+"""Measures how many password verifications (the cost of a login) the hashing pool sustains.
+
+Usage:
+    python -m bench.password_hashing [--method pbkdf2:sha256:150000] [--logins 200] [--threads 16]
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from werkzeug.security import generate_password_hash
+from common.password_hasher import PasswordHasher
+import json
+import os
+import time
+
+
+def run(method, workers, logins, threads):
+    """Verifies the same password many times from concurrent request threads
+
+    Args:
+        method (str): The password hashing method and cost
+        workers (int): The number of hashing processes, 0 hashes on the request threads
+        logins (int): The number of verifications to perform
+        threads (int): The number of concurrent request threads
+
+    Returns:
+        dict of (str, any): The measured throughput
+    """
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_MAX_PENDING=logins, PASSWORD_HASH_QUEUE_TIMEOUT=60)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    password_hash = generate_password_hash("password", method)
+    # Starts the worker processes before measuring
+    hasher.verify(password_hash, "password")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: hasher.verify(
+            password_hash, "password"), range(logins)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    cores = max(1, workers)
+    return {
+        "method": method,
+        "workers": workers,
+        "threads": threads,
+        "logins": logins,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(logins / elapsed, 1),
+        "logins_per_second_per_core": round(logins / elapsed / cores, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--method", default="pbkdf2:sha256:150000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    results = [run(args.method, workers, args.logins, args.threads)
+               for workers in range(0, (os.cpu_count() or 1) + 1)]
+    print(json.dumps(results, indent=2))
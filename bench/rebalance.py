@@ -0,0 +1,98 @@
+"""Measures the rebalancing of a week whose activities were assigned without looking at the loads.
+
+Every scale is a number of maintainers and of activities, i.e. 100:2000. The activities, taking 30 to 120 minutes,
+are assigned first fit: every day of the first maintainers is filled before the next one is used, so that some
+maintainers are 0% available and the others 100%. The rebalancing runs in memory, as the rebalance_week job does
+once the week is loaded. The results are printed and, with --output, written as json.
+
+Usage:
+    python -m bench.rebalance [--scales 100:2000] [--repeat 3] [--tolerance 30] [--output results.json]
+"""
+from argparse import ArgumentParser
+from common.rebalancer import WeekState, rebalance
+from bench.endpoints import ESTIMATED_TIMES, commit
+import json
+import time
+
+
+def skewed_week(maintainers, activities):
+    """Generates the assigned activities of a week, first fit
+
+    Args:
+        maintainers (int): The number of maintainers
+        activities (int): The number of activities
+
+    Returns:
+        (list of (str), list of (int, str, str, int, int)): The maintainer usernames and the identifier,
+        maintainer username, week day, start time and estimated time of every activity
+    """
+    usernames = [f"maintainer{maintainer}" for maintainer in range(maintainers)]
+    state = WeekState(usernames, [])
+    days = iter(state.days)
+    day = next(days)
+    rows = []
+    for activity_id in range(1, activities + 1):
+        estimated_time = ESTIMATED_TIMES[activity_id % len(ESTIMATED_TIMES)]
+        state.slots[activity_id] = (*day, state.work_start_hour)
+        state.estimated_times[activity_id] = estimated_time
+        start_time = state.find_start_time(activity_id, day)
+        while start_time is None:
+            day = next(days)
+            start_time = state.find_start_time(activity_id, day)
+        state.slots[activity_id] = (*day, start_time)
+        state.days[day][activity_id] = start_time
+        rows.append((activity_id, *day, start_time, estimated_time))
+    return usernames, rows
+
+
+def run(maintainers, activities, repeat, tolerance):
+    """Rebalances a skewed week several times
+
+    Args:
+        maintainers (int): The number of maintainers
+        activities (int): The number of activities
+        repeat (int): The number of runs
+        tolerance (int): The minutes of difference between two loads not worth a move
+
+    Returns:
+        dict of (str, any): The timings, moves and variances
+    """
+    usernames, rows = skewed_week(maintainers, activities)
+    timings = []
+    for _ in range(repeat):
+        state = WeekState(usernames, rows)
+        start = time.perf_counter()
+        result = rebalance(state, tolerance=tolerance)
+        timings.append(time.perf_counter() - start)
+    loads = sorted(state.loads.values())
+    return {
+        "maintainers": maintainers,
+        "activities": activities,
+        "idle_maintainers_before": maintainers - len({row[1] for row in rows}),
+        "seconds": round(min(timings), 3),
+        "moves": len(result["moves"]),
+        "variance_before": result["variance_before"],
+        "variance_after": result["variance_after"],
+        "min_load_after": loads[0],
+        "max_load_after": loads[-1],
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", default="100:2000",
+                        help="comma separated maintainers:activities pairs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=int, default=30)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    scales = [tuple(int(value) for value in scale.split(":"))
+              for scale in args.scales.split(",")]
+    results = {"commit": commit(), "tolerance": args.tolerance,
+               "scales": [run(maintainers, activities, args.repeat, args.tolerance)
+                          for maintainers, activities in scales]}
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,73 @@
+"""Compares reqparse and the precompiled request schemas on the arguments of the busiest endpoints.
+
+Usage:
+    python -m bench.request_parsing [--repeat 20000]
+"""
+from argparse import ArgumentParser
+from flask import Flask
+from flask_restful import reqparse
+from resources.maintenance_activity import MaintenanceActivityAssign, MaintenanceActivityCreate, MaintenanceActivityList
+import json
+import time
+
+CASES = {
+    "assign": (MaintenanceActivityAssign, dict(method="PUT", data={
+        "maintainer_username": "maintainer", "week_day": "monday", "start_time": "10"})),
+    "create": (MaintenanceActivityCreate, dict(method="POST", json={
+        "activity_type": "planned", "site": "management", "typology": "electrical", "description": "description",
+        "estimated_time": 30, "interruptible": True, "materials": "drill", "week": 1, "workspace_notes": "notes"})),
+    "list": (MaintenanceActivityList, dict(method="GET", query_string={"week": "1", "current_page": "2", "page_size": "20"})),
+}
+
+
+def to_reqparse(schema):
+    """Builds the reqparse parser equivalent to a schema
+
+    Args:
+        schema (Schema): The schema
+
+    Returns:
+        RequestParser: The parser
+    """
+    parser = reqparse.RequestParser()
+    for field in schema.fields:
+        parser.add_argument(field.name, type=field.type, required=field.required,
+                            default=field.default, help=field.help, location=field.location)
+    return parser
+
+
+def measure(app, parser, request_kwargs, repeat):
+    """Parses the same request many times
+
+    Args:
+        app (Flask): The app providing the request context
+        parser (Schema or RequestParser): The parser to use
+        request_kwargs (dict of (str, any)): The arguments of the test request
+        repeat (int): The number of parses
+
+    Returns:
+        float: The microseconds spent per parse
+    """
+    with app.test_request_context("/", **request_kwargs):
+        parser.parse_args()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parser.parse_args()
+        elapsed = time.perf_counter() - start
+    return round(elapsed / repeat * 1e6, 2)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    results = {}
+    for name, (resource, request_kwargs) in CASES.items():
+        schema = resource._activity_parser
+        results[name] = {
+            "reqparse_microseconds": measure(app, to_reqparse(schema), request_kwargs, args.repeat),
+            "schema_microseconds": measure(app, schema, request_kwargs, args.repeat),
+        }
+    print(json.dumps(results, indent=2))
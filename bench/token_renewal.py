@@ -0,0 +1,80 @@
+"""Compares the cost of renewing an access token with a password login and with a refresh token.
+
+Usage:
+    python -m bench.token_renewal [--renewals 50] [--method pbkdf2:sha256:150000]
+"""
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from app import create_app
+from config import TestConfig
+import json
+import time
+
+
+def measure(client, renewals, renew):
+    """Renews a token many times, measuring the wall clock and the CPU time spent
+
+    Args:
+        client (FlaskClient): The test client
+        renewals (int): The number of renewals to perform
+        renew (callable): The function performing one renewal
+
+    Returns:
+        dict of (str, float): The measured costs
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(renewals):
+        assert renew(client).status_code == 200
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        "milliseconds_per_renewal": round(wall / renewals * 1000, 3),
+        "cpu_milliseconds_per_renewal": round(cpu / renewals * 1000, 3),
+    }
+
+
+def run(renewals, method):
+    """Renews access tokens with the login and the refresh endpoints
+
+    Args:
+        renewals (int): The number of renewals to perform for each endpoint
+        method (str): The password hashing method and cost
+
+    Returns:
+        dict of (str, any): The measured costs
+    """
+    with TemporaryDirectory() as directory:
+        class BenchConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory}/bench.db"
+            JWT_SECRET_KEY = TestConfig.JWT_SECRET_KEY or "benchmark"
+            PASSWORD_HASH_METHOD = method
+            # Hashes on the request thread, so that their CPU time is measured
+            PASSWORD_HASH_WORKERS = 0
+            LOGIN_USERNAME_BURST = LOGIN_ADDRESS_BURST = renewals + 1
+
+        app = create_app(BenchConfig)
+        credentials = {"username": "planner", "password": "password"}
+        with app.app_context():
+            from db import db
+            from models.user import UserModel
+            db.create_all()
+            UserModel(role="planner", **credentials).save_to_db()
+
+        client = app.test_client()
+        refresh_token = client.post(
+            "/login", data=credentials).get_json()["refresh_token"]
+        headers = {"Authorization": f"Bearer {refresh_token}"}
+
+        return {
+            "method": method,
+            "renewals": renewals,
+            "login": measure(client, renewals, lambda c: c.post("/login", data=credentials)),
+            "refresh": measure(client, renewals, lambda c: c.post("/refresh", headers=headers)),
+        }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--renewals", type=int, default=50)
+    parser.add_argument("--method", default="pbkdf2:sha256:150000")
+    args = parser.parse_args()
+    print(json.dumps(run(args.renewals, args.method), indent=2))
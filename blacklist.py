@@ -1,2 +1,237 @@
-# A set in memory which contains jwt id for jwt revoked tokens
-BLACKLIST = set()
+from threading import Lock
+from common.bloom_filter import BloomFilter
+from models.revoked_token import RevokedTokenModel
+import time
+
+
+class MemoryRevocationBackend:
+    """Revocation backend that keeps revoked jwt ids in the memory of the current process.
+    Logouts are not shared between workers, so it should only be used with a single process.
+    """
+    name = "memory"
+
+    def __init__(self):
+        """MemoryRevocationBackend constructor."""
+        self._entries = {}
+
+    def add(self, jti, expires_at, revoked_at):
+        """Stores a revoked jwt id
+
+        Args:
+            jti (str): The unique identifier of the revoked jwt
+            expires_at (int): The unix timestamp after which the token is no longer valid anyway
+            revoked_at (float): The unix timestamp of the revocation
+        """
+        self._entries[jti] = (expires_at, revoked_at)
+
+    def is_revoked(self, jti, now):
+        """Checks if a jwt id has been revoked and its token has not expired yet.
+
+        Args:
+            jti (str): The unique identifier of the jwt
+            now (float): The current unix timestamp
+
+        Returns:
+            bool: True if the token is revoked
+        """
+        entry = self._entries.get(jti)
+        return entry is not None and entry[0] > now
+
+    def revoked_since(self, since, now):
+        """Finds the identifiers of the not expired tokens revoked after a given instant.
+
+        Args:
+            since (float): The unix timestamp to start from
+            now (float): The current unix timestamp
+
+        Returns:
+            list of (str): List of revoked jwt ids
+        """
+        return [jti for jti, (expires_at, revoked_at) in list(self._entries.items())
+                if revoked_at >= since and expires_at > now]
+
+    def purge(self, now):
+        """Removes every revoked jwt id whose token has already expired.
+
+        Args:
+            now (float): The current unix timestamp
+
+        Returns:
+            int: The number of removed entries
+        """
+        expired = [jti for jti, (expires_at, _) in list(self._entries.items())
+                   if expires_at <= now]
+        for jti in expired:
+            self._entries.pop(jti, None)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseRevocationBackend:
+    """Revocation backend that keeps revoked jwt ids in the revoked_tokens table, shared by every worker."""
+    name = "database"
+
+    def add(self, jti, expires_at, revoked_at):
+        """Stores a revoked jwt id
+
+        Args:
+            jti (str): The unique identifier of the revoked jwt
+            expires_at (int): The unix timestamp after which the token is no longer valid anyway
+            revoked_at (float): The unix timestamp of the revocation
+        """
+        RevokedTokenModel(jti, expires_at, revoked_at).save_to_db()
+
+    def is_revoked(self, jti, now):
+        """Checks if a jwt id has been revoked and its token has not expired yet.
+
+        Args:
+            jti (str): The unique identifier of the jwt
+            now (float): The current unix timestamp
+
+        Returns:
+            bool: True if the token is revoked
+        """
+        return RevokedTokenModel.is_revoked(jti, now)
+
+    def revoked_since(self, since, now):
+        """Finds the identifiers of the not expired tokens revoked after a given instant.
+
+        Args:
+            since (float): The unix timestamp to start from
+            now (float): The current unix timestamp
+
+        Returns:
+            list of (str): List of revoked jwt ids
+        """
+        return RevokedTokenModel.find_jtis_revoked_since(since, now)
+
+    def purge(self, now):
+        """Removes every revoked jwt id whose token has already expired.
+
+        Args:
+            now (float): The current unix timestamp
+
+        Returns:
+            int: The number of removed entries
+        """
+        return RevokedTokenModel.delete_expired(now)
+
+
+class RevocationStore:
+    """Set-like store of revoked jwt ids, backed by a pluggable backend and fronted by a Bloom filter.
+
+    Most tokens are not revoked, so most lookups are answered by the Bloom filter without
+    reaching the backend. Revocations made by other workers are pulled into the filter
+    every REVOCATION_SYNC_INTERVAL seconds, while expired tokens are purged from the backend
+    every REVOCATION_PURGE_INTERVAL seconds.
+    """
+    backends = {
+        MemoryRevocationBackend.name: MemoryRevocationBackend,
+        DatabaseRevocationBackend.name: DatabaseRevocationBackend,
+    }
+    # Revocations committed slightly after their revoked_at timestamp are still picked up by the next sync
+    sync_overlap = 5
+
+    def __init__(self):
+        """RevocationStore constructor."""
+        self.backend = MemoryRevocationBackend()
+        self.ttl = 3600
+        self.sync_interval = 1
+        self.purge_interval = 300
+        self.bloom_capacity = 100000
+        self._bloom = BloomFilter(self.bloom_capacity)
+        self._lock = Lock()
+        self._last_sync = time.time()
+        self._last_purge = time.time()
+
+    def init_app(self, app):
+        """Configures the store with the app configuration.
+
+        Args:
+            app: The main app, configured but not started
+
+        Raises:
+            ValueError: If REVOCATION_STORE is not a known backend
+        """
+        name = app.config.get("REVOCATION_STORE", MemoryRevocationBackend.name)
+        if name not in self.backends:
+            raise ValueError(f"Unknown revocation store '{name}'")
+        if self.backend.name != name:
+            self.backend = self.backends[name]()
+        self.ttl = app.config.get("JWT_ACCESS_TOKEN_EXPIRES", self.ttl)
+        self.sync_interval = app.config.get(
+            "REVOCATION_SYNC_INTERVAL", self.sync_interval)
+        self.purge_interval = app.config.get(
+            "REVOCATION_PURGE_INTERVAL", self.purge_interval)
+        self.bloom_capacity = app.config.get(
+            "REVOCATION_BLOOM_CAPACITY", self.bloom_capacity)
+        # refilled from the backend by the next sync
+        with self._lock:
+            self._bloom = BloomFilter(self.bloom_capacity)
+            self._last_sync = 0
+
+    def add(self, jti, expires_at=None):
+        """Revokes a jwt id until its token expires.
+
+        Args:
+            jti (str): The unique identifier of the jwt
+            expires_at (int, optional): The unix timestamp of the token expiration. Defaults to now plus JWT_ACCESS_TOKEN_EXPIRES.
+        """
+        now = time.time()
+        if expires_at is None:
+            expires_at = int(now + self.ttl)
+        self.backend.add(jti, expires_at, now)
+        with self._lock:
+            self._bloom.add(jti)
+
+    def __contains__(self, jti):
+        now = time.time()
+        if now - self._last_sync >= self.sync_interval:
+            self._refresh(now)
+        if jti not in self._bloom:
+            return False
+        return self.backend.is_revoked(jti, now)
+
+    def _refresh(self, now):
+        """Private method used to pull revocations made by other workers into the Bloom filter and
+        to purge expired revocations. Only one thread at a time refreshes the store, the others skip it.
+
+        Args:
+            now (float): The current unix timestamp
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._last_purge >= self.purge_interval:
+                self.backend.purge(now)
+                jtis = self.backend.revoked_since(0, now)
+                bloom = BloomFilter(max(self.bloom_capacity, 2 * len(jtis)))
+                for jti in jtis:
+                    bloom.add(jti)
+                self._bloom = bloom
+                self._last_purge = now
+            else:
+                for jti in self.backend.revoked_since(self._last_sync - self.sync_overlap, now):
+                    self._bloom.add(jti)
+            self._last_sync = now
+        finally:
+            self._lock.release()
+
+    def status(self):
+        """Public representation of the store state.
+
+        Returns:
+            dict of (str, any): The backend name and the Bloom filter occupation
+        """
+        return {
+            "backend": self.backend.name,
+            "bloom_filter_count": len(self._bloom),
+            "bloom_filter_capacity": self._bloom.capacity,
+            "seconds_since_sync": round(time.time() - self._last_sync, 3),
+        }
+
+
+# The store which contains jwt ids for revoked jwt tokens
+BLACKLIST = RevocationStore()
@@ -0,0 +1,40 @@
+from exceptions.invalid_agenda_error import InvalidAgendaError
+
+
+def calculate_agenda(activities, work_start_hour, work_hours):
+    """Calculates the minutes left free in every work hour of a maintainer's day.
+    Every activity takes its minutes from its start hour; an hour that overflows borrows the free minutes
+    of the following hours, the nearest first.
+
+    Args:
+        activities (iterable of (int, int)): The start time and estimated time of every activity of the day
+        work_start_hour (int): The first work hour
+        work_hours (int): The number of work hours
+
+    Raises:
+        InvalidAgendaError: If the following hours do not have enough free minutes for an overflowing hour
+
+    Returns:
+        dict of (int, int): The dictionary with the work hour as key and the minutes left free in that hour
+    """
+    d = {}
+
+    for hour in range(work_start_hour, work_start_hour+work_hours):
+        d[hour] = 60
+    for start_time, estimated_time in activities:
+        d[start_time] -= estimated_time
+
+    visited_hours = []
+    for hour in sorted(d.keys(), reverse=True):
+        if d[hour] < 0:
+            for visited_hour in reversed(visited_hours):
+                m = min(d[visited_hour], -d[hour])
+                d[visited_hour] -= m
+                d[hour] += m
+                if d[hour] >= 0:
+                    break
+            if d[hour] != 0:
+                raise InvalidAgendaError()
+
+        visited_hours.append(hour)
+    return d
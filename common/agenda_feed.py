@@ -0,0 +1,256 @@
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import SQLAlchemyError
+from common.event_bus import EventBus
+from db import db
+from exceptions.error import Error
+from exceptions.event_streams_busy_error import EventStreamsBusyError
+from models.agenda_change import AgendaChangeModel
+from models.version import VersionModel
+import os
+import time
+
+
+class AgendaFeed:
+    """Publishes the changes of the maintainers' agendas to the subscribers of every week.
+
+    Every change is a compact delta about an hour of a maintainer's day: the activity that has been
+    scheduled in or removed from that hour and the minutes left free in it. The writers only record the changed
+    hours in the agenda_changes table, within their transaction: a poller thread of every worker process reads
+    the changes of the weeks its subscribers follow every EVENTS_POLL_INTERVAL seconds, or as soon as a change is
+    committed by the same process, and builds the deltas, which take an agenda computation, off the write requests.
+    The recorded changes are deleted after retention seconds.
+    Every subscriber holds a thread of the worker, so at most max_streams subscribe at the same time, and they
+    are all closed when the worker stops.
+    """
+
+    def __init__(self):
+        """AgendaFeed constructor."""
+        self.bus = EventBus()
+        self.heartbeat_interval = 15
+        self.poll_interval = 1
+        self.max_streams = 3
+        self.retention = 300
+        self.app = None
+        self.closed = False
+        self._versions = {}
+        self._pid = None
+        self._lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+
+    def init_app(self, app):
+        """Configures the feed with the app configuration, starting its poller on the first request
+        of every worker process.
+
+        Args:
+            app: The main app, configured but not started
+        """
+        self.app = app
+        self.bus.queue_size = app.config.get(
+            "EVENTS_QUEUE_SIZE", self.bus.queue_size)
+        self.heartbeat_interval = app.config.get(
+            "EVENTS_HEARTBEAT_INTERVAL", self.heartbeat_interval)
+        self.poll_interval = app.config.get(
+            "EVENTS_POLL_INTERVAL", self.poll_interval)
+        # every thread of the worker but one, left to the other requests
+        self.max_streams = app.config.get("EVENTS_MAX_STREAMS") or max(
+            app.config.get("SERVER_THREADS", 1) - 1, 0)
+        with self._lock:
+            self.closed = False
+        VersionModel.on_commit(self._on_commit)
+        app.before_request(self.start)
+
+    def start(self):
+        """Starts the poller of the current process, once. The thread is not started in the server master
+        process, whose threads would not be forked with the workers."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid() or self.closed:
+                return
+            self._pid = os.getpid()
+            # a poller of a closed feed may still be running, it keeps its own stop event
+            self._stop = Event()
+            Thread(target=self._poll, args=(self._stop,),
+                   name="agenda-feed", daemon=True).start()
+
+    def subscribe(self, week, version):
+        """Subscribes to the agenda changes of a week
+
+        Args:
+            week (int): The nth week of the year
+            version (int): The version of the week the subscriber has loaded, the changes committed after it are
+                published to the subscriber if it is the first one of the week
+
+        Raises:
+            EventStreamsBusyError: If there are already max_streams subscribers or the feed is closed
+
+        Returns:
+            Subscription: The subscription
+        """
+        with self._lock:
+            if self.closed or self.bus.status()["subscribers"] >= self.max_streams:
+                raise EventStreamsBusyError()
+            if not self.bus.has_subscribers(week):
+                self._versions[week] = version
+            return self.bus.subscribe(week)
+
+    def close(self):
+        """Closes every subscription and refuses the new ones, so that a stopping worker is not kept alive
+        by its event streams, and stops the poller"""
+        with self._lock:
+            self.closed = True
+            self.bus.close()
+            self._stop.set()
+            self._wake.set()
+            self._pid = None
+
+    def unsubscribe(self, subscription):
+        """Removes a subscription
+
+        Args:
+            subscription (Subscription): The subscription
+        """
+        self.bus.unsubscribe(subscription)
+
+    def record(self, activity_id, before, after):
+        """Records the agenda changes caused by a change of an activity, within its transaction:
+        they are published once it is committed. Must be called after bumping the versions of the change.
+
+        Args:
+            activity_id (int): The identifier of the changed activity
+            before (tuple of (str, int, str, int)): The maintainer username, week, week day and start time
+                the activity was scheduled to before the change, None if it was not assigned
+            after (tuple of (str, int, str, int)): The same slot after the change, None if it is not assigned anymore
+        """
+        slots = []
+        if before is not None and before != after:
+            slots.append((before, False))
+        if after is not None:
+            slots.append((after, True))
+        if not slots:
+            return
+        versions = VersionModel.find_versions(
+            sorted({f"week:{week}" for (_, week, _, _), _ in slots}))
+        now = time.time()
+        for (maintainer, week, week_day, start_time), assigned in slots:
+            db.session.add(AgendaChangeModel(week, versions[f"week:{week}"], activity_id, assigned,
+                                             maintainer, week_day, start_time, now))
+
+    def _on_commit(self, keys):
+        """Private method used to wake the poller up when a week followed by a subscriber has been changed
+
+        Args:
+            keys (set of (str)): The version keys bumped by the committed transaction
+        """
+        if any(self.bus.has_subscribers(int(key[5:])) for key in keys if key.startswith("week:")):
+            self._wake.set()
+
+    def _poll(self, stop):
+        """Private method used to publish the recorded changes and delete the old ones, until the feed is closed
+
+        Args:
+            stop (Event): The event set when the poller has to stop
+        """
+        last_prune = time.time()
+        while not stop.is_set():
+            self._wake.clear()
+            weeks = self.bus.topics()
+            now = time.time()
+            if weeks or now - last_prune >= self.retention:
+                with self.app.app_context():
+                    try:
+                        if weeks:
+                            self._publish(weeks)
+                        if now - last_prune >= self.retention:
+                            AgendaChangeModel.prune(now - self.retention)
+                            last_prune = now
+                    except SQLAlchemyError as e:
+                        # i.e.: the agenda_changes table has not been created yet, see the bootstrap command
+                        self.app.logger.warning(
+                            "Agenda changes not polled: %s", e)
+                    finally:
+                        db.session.remove()
+            self._wake.wait(self.poll_interval)
+
+    def _publish(self, weeks):
+        """Private method used to publish the changes of some weeks committed since the last poll
+
+        Args:
+            weeks (list of (int)): The weeks with subscribers
+        """
+        versions = VersionModel.find_versions(
+            [f"week:{week}" for week in weeks])
+        agendas, published = {}, {}
+        for week in weeks:
+            version = versions[f"week:{week}"]
+            last = self._versions.get(week, version)
+            if version != last:
+                for change in AgendaChangeModel.find_since(week, last):
+                    self.bus.publish(week, {
+                        "activity_id": change.activity_id,
+                        "assigned": change.assigned,
+                        "maintainer": change.maintainer,
+                        "week": week,
+                        "week_day": change.week_day,
+                        "start_time": change.start_time,
+                        "free_minutes": self._free_minutes(agendas, change.maintainer, week, change.week_day,
+                                                           change.start_time),
+                        "version": change.version,
+                    })
+                    version = max(version, change.version)
+            published[week] = version
+        with self._lock:
+            self._versions = {week: published.get(week, last) for week, last in self._versions.items()
+                              if self.bus.has_subscribers(week)}
+
+    @staticmethod
+    def _free_minutes(agendas, maintainer, week, week_day, start_time):
+        """Private method used to calculate the minutes left free in an hour of a maintainer's day
+
+        Args:
+            agendas (dict of (tuple, dict)): The daily agendas already calculated by the current poll
+            maintainer (str): The username of the maintainer
+            week (int): The nth week of the year
+            week_day (str): The day of the week (i.e.: monday, tuesday, ...)
+            start_time (int): The hour
+
+        Returns:
+            int: The free minutes, or None if the maintainer has no valid agenda for that day
+        """
+        key = (maintainer, week, week_day)
+        if key not in agendas:
+            from models.user import UserModel
+            user = UserModel.find_by_username(maintainer)
+            try:
+                agendas[key] = None if user is None else user.get_daily_agenda(
+                    week, week_day).json()
+            except Error:
+                agendas[key] = None
+        agenda = agendas[key]
+        return None if agenda is None else agenda.get(start_time)
+
+    @staticmethod
+    def week_version(week):
+        """Gets the version of the activities of a week, that changes with every committed change made by any worker
+
+        Args:
+            week (int): The nth week of the year
+
+        Returns:
+            int: The version
+        """
+        key = f"week:{week}"
+        return VersionModel.find_versions([key])[key]
+
+    def status(self):
+        """Public representation of the feed state.
+
+        Returns:
+            dict of (str, int): The number of weeks, subscribers and dropped subscribers
+        """
+        return self.bus.status()
+
+
+# The feed of the changes of the maintainers' agendas
+agenda_feed = AgendaFeed()
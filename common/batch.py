@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import current_app, json
+from werkzeug.test import EnvironBuilder
+from common.tracing import TRACEPARENT_HEADER, current_traceparent
+
+METHODS = ("GET", "POST", "PUT", "DELETE")
+
+
+class BatchDispatcher:
+    """Runs the sub-requests of a batch in-process through the app resources.
+
+    Consecutive GET sub-requests are independent reads, so they run concurrently on a thread pool,
+    every one with its own database session. Any other sub-request is a write: it runs alone on the
+    batch request thread, sharing its database session, after every previous sub-request has completed.
+    """
+
+    def __init__(self, max_requests=20, workers=4):
+        """BatchDispatcher constructor.
+
+        Args:
+            max_requests (int, optional): The maximum number of sub-requests of a batch. Defaults to 20.
+            workers (int, optional): The number of threads running reads, 0 runs them on the request thread. Defaults to 4.
+        """
+        self.max_requests = max_requests
+        self.workers = workers
+        self._executor = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a dispatcher from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            BatchDispatcher: The configured dispatcher
+        """
+        return cls(config.get("BATCH_MAX_REQUESTS", 20), config.get("BATCH_WORKERS", 4))
+
+    def init_app(self, app):
+        """Registers the dispatcher in the app extensions
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["batch_dispatcher"] = self
+
+    def _get_executor(self):
+        """Private method used to lazily create the thread pool, so that idle apps do not hold threads
+
+        Returns:
+            ThreadPoolExecutor: The thread pool
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="batch")
+        return self._executor
+
+    def validate(self, value):
+        """Validates the list of sub-requests of a batch
+
+        Args:
+            value (list of (dict of (str, any))): The sub-requests, with method (defaults to GET), path, query and body
+
+        Raises:
+            ValueError: If the sub-requests are too many or not valid
+
+        Returns:
+            list of (dict of (str, any)): The sub-requests with their method upper case
+        """
+        if not isinstance(value, list) or not value:
+            raise ValueError("Requests should be a non-empty list")
+        if len(value) > self.max_requests:
+            raise ValueError(
+                f"A batch can contain at most {self.max_requests} requests")
+        sub_requests = []
+        for sub_request in value:
+            if not isinstance(sub_request, dict) or not isinstance(sub_request.get("path"), str) \
+                    or not sub_request["path"].startswith("/"):
+                raise ValueError("Every request should have an absolute path")
+            method = str(sub_request.get("method", "GET")).upper()
+            if method not in METHODS:
+                raise ValueError(
+                    f"Method should be one of {', '.join(METHODS)}")
+            if sub_request["path"].split("?")[0].rstrip("/") == "/batch":
+                raise ValueError("Batches cannot be nested")
+            sub_requests.append(dict(sub_request, method=method))
+        return sub_requests
+
+    def dispatch(self, sub_requests, authorization=None, remote_addr=None):
+        """Runs the sub-requests and collects their responses in the same order
+
+        Args:
+            sub_requests (list of (dict of (str, any))): The validated sub-requests
+            authorization (str, optional): The Authorization header of the batch, forwarded to every sub-request. Defaults to None.
+            remote_addr (str, optional): The client address of the batch. Defaults to None.
+
+        Returns:
+            list of (dict of (str, any)): The status and body of every sub-request
+        """
+        app = current_app._get_current_object()
+        headers = {"Authorization": authorization} if authorization else {}
+        # the reads running on the pool threads continue the trace of the batch, if any
+        traceparent = current_traceparent()
+        if traceparent is not None:
+            headers[TRACEPARENT_HEADER] = traceparent
+        environ = {"REMOTE_ADDR": remote_addr} if remote_addr else {}
+        results = [None] * len(sub_requests)
+        reads = []
+        for index, sub_request in enumerate(sub_requests):
+            if sub_request["method"] == "GET":
+                reads.append(index)
+                continue
+            self._run_reads(app, sub_requests, reads,
+                            results, headers, environ)
+            reads = []
+            results[index] = self._run(
+                app, sub_request, headers, environ)
+        self._run_reads(app, sub_requests, reads, results, headers, environ)
+        return results
+
+    def _run_reads(self, app, sub_requests, indexes, results, headers, environ):
+        """Private method used to run a group of reads concurrently, storing their responses in results
+
+        Args:
+            app: The main app
+            sub_requests (list of (dict of (str, any))): Every sub-request of the batch
+            indexes (list of (int)): The positions of the reads to run
+            results (list of (dict of (str, any))): The responses of the batch
+            headers (dict of (str, str)): The headers of every sub-request
+            environ (dict of (str, str)): The WSGI environ overrides of every sub-request
+        """
+        if len(indexes) < 2 or self.workers <= 0:
+            for index in indexes:
+                results[index] = self._run(
+                    app, sub_requests[index], headers, environ)
+            return
+        futures = {index: self._get_executor().submit(self._run_in_app_context, app, sub_requests[index], headers, environ)
+                   for index in indexes}
+        for index, future in futures.items():
+            results[index] = future.result()
+
+    def _run_in_app_context(self, app, sub_request, headers, environ):
+        """Private method used to run a sub-request on a pool thread, in an app context of its own
+        whose teardown releases the database session of the thread
+
+        Returns:
+            dict of (str, any): The status and body of the response
+        """
+        with app.app_context():
+            return self._run(app, sub_request, headers, environ)
+
+    @staticmethod
+    def _run(app, sub_request, headers, environ):
+        """Private method used to run a sub-request through the app, as if it came from the client
+
+        Args:
+            app: The main app
+            sub_request (dict of (str, any)): The sub-request
+            headers (dict of (str, str)): The headers of the sub-request
+            environ (dict of (str, str)): The WSGI environ overrides of the sub-request
+
+        Returns:
+            dict of (str, any): The status and body of the response
+        """
+        builder = EnvironBuilder(path=sub_request["path"], method=sub_request["method"],
+                                 query_string=sub_request.get("query"), json=sub_request.get("body"),
+                                 headers=headers, environ_overrides=environ)
+        try:
+            with app.request_context(builder.get_environ()):
+                response = app.full_dispatch_request()
+                data = response.get_data()
+        except Exception as e:
+            return {"status": 500, "body": {"error": str(e)}}
+        finally:
+            builder.close()
+        try:
+            body = json.loads(data) if data else None
+        except ValueError:
+            body = data.decode(errors="replace")
+        return {"status": response.status_code, "body": body}
@@ -0,0 +1,57 @@
+from hashlib import blake2b
+from math import ceil, log
+
+
+class BloomFilter:
+    """A fixed size probabilistic set. It can answer "definitely not present" or "maybe present"
+    and it never forgets an added element, so it is rebuilt when its elements have to be evicted.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        """BloomFilter constructor.
+
+        Args:
+            capacity (int, optional): The number of elements the filter is sized for. Defaults to 100000.
+            error_rate (float, optional): The false positive rate expected at full capacity. Defaults to 0.001.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = ceil(-capacity * log(error_rate) / (log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * log(2)))
+        self.count = 0
+        self._bits = bytearray(ceil(self.size / 8))
+
+    def _indexes(self, key):
+        """Private method used to calculate the bit positions of a key by means of double hashing
+
+        Args:
+            key (str): The element to hash
+
+        Returns:
+            generator of (int): The bit positions associated with the key
+        """
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        """Adds an element to the filter
+
+        Args:
+            key (str): The element to add
+        """
+        for index in self._indexes(key):
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        for index in self._indexes(key):
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
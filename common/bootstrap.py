@@ -0,0 +1,119 @@
+from os import environ
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+import click
+import time
+
+
+def bootstrap(create=True):
+    """Checks the database schema of the current app against the models: the missing tables and the missing indexes
+    of the existing tables (i.e.: the ones added to the models after their tables have been created).
+
+    Args:
+        create (bool, optional): Whether the missing tables and indexes are created. Defaults to True.
+
+    Returns:
+        dict of (str, list of (str)): The names of the missing tables and indexes
+    """
+    inspector = inspect(db.engine)
+    existing = set(inspector.get_table_names())
+    missing_tables = [table.name for table in db.metadata.sorted_tables
+                      if table.name not in existing]
+    missing_indexes = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        names = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing_indexes.extend(index for index in table.indexes
+                               if index.name not in names)
+    if create:
+        db.create_all()
+        for index in missing_indexes:
+            index.create(bind=db.engine)
+    return {"tables": missing_tables, "indexes": [index.name for index in missing_indexes]}
+
+
+def warm_up(app):
+    """Prepares a worker to serve its first request as fast as the following ones: it opens WARMUP_CONNECTIONS
+    database connections, runs the statements of the hottest endpoints once, so that they are compiled and cached
+    by SQLAlchemy and their pages loaded by the database, including the maintainer roster,
+    and starts the password hashing processes.
+    A database without the tables (see the bootstrap command) is not warmed up.
+
+    Args:
+        app: The main app, configured but not started
+
+    Returns:
+        dict of (str, float): The seconds spent warming up the pool, the statements and the hasher
+    """
+    from models.maintenance_activity import MaintenanceActivityModel
+    from models.user import UserModel
+    from models.version import VersionModel
+    from common.password_hasher import hasher
+    timings = {}
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            connections = [db.engine.connect()
+                           for _ in range(app.config.get("WARMUP_CONNECTIONS", 5))]
+            for connection in connections:
+                connection.close()
+            timings["pool_seconds"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            VersionModel.find_versions(["users", "week:1"])
+            UserModel.find_by_username("")
+            UserModel.find_all_maintainers()
+            UserModel.find_some_maintainers()
+            MaintenanceActivityModel.find_by_id(0)
+            MaintenanceActivityModel.find_some_in_week(1)
+            MaintenanceActivityModel.find_all_in_day_for_user(
+                "", 1, "monday")
+            timings["statements_seconds"] = time.perf_counter() - start
+        except SQLAlchemyError as e:
+            app.logger.warning("Database not warmed up: %s", e)
+        finally:
+            db.session.remove()
+
+    start = time.perf_counter()
+    hasher.warm_up()
+    timings["hasher_seconds"] = time.perf_counter() - start
+    return timings
+
+
+class Bootstrap:
+    """Registers the bootstrap command and, if WARMUP_ENABLED is set, warms the app up as soon as it is created,
+    unless the app is preloaded by a pre-fork server (SERVER_PRELOAD set in the environment, i.e. for gunicorn
+    --preload): the connections and hashing processes of the master would be discarded before forking, so the
+    workers should warm themselves up instead. serve.py creates the app in the workers."""
+
+    def init_app(self, app):
+        """Registers the bootstrap command on the app and warms it up
+
+        Args:
+            app: The main app, configured, with the database bound, but not started
+        """
+        app.config.setdefault("WARMUP_ENABLED", True)
+        app.cli.add_command(bootstrap_command)
+        # The flask commands (i.e.: bootstrap) do not need it, flask run serves development traffic only
+        if app.config["WARMUP_ENABLED"] and not environ.get("FLASK_RUN_FROM_CLI") \
+                and not environ.get("SERVER_PRELOAD"):
+            warm_up(app)
+
+
+@click.command("bootstrap")
+@with_appcontext
+@click.option("--check", is_flag=True, help="Only report the missing tables and indexes, failing if there are some.")
+def bootstrap_command(check):
+    """Creates the missing tables and indexes of the database."""
+    missing = bootstrap(create=not check)
+    for kind in ("tables", "indexes"):
+        if missing[kind]:
+            action = "Missing" if check else "Created"
+            click.echo(f"{action} {kind}: {', '.join(missing[kind])}")
+    if not missing["tables"] and not missing["indexes"]:
+        click.echo("The database is up to date")
+    elif check:
+        raise SystemExit(1)
@@ -0,0 +1,169 @@
+from flask import request, current_app
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, it is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, it is not offered without it
+    zstandard = None
+
+
+def _gzip_compressor(level):
+    """Private function used to create a gzip compressor
+
+    Args:
+        level (int): The compression level
+
+    Returns:
+        any: The compressor
+    """
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+def _brotli_compressor(level):
+    """Private function used to create a brotli compressor
+
+    Args:
+        level (int): The compression level, used as brotli quality
+
+    Returns:
+        any: The compressor
+    """
+    return _BrotliCompressor(brotli.Compressor(quality=min(level, 11)))
+
+
+def _zstd_compressor(level):
+    """Private function used to create a zstd compressor
+
+    Args:
+        level (int): The compression level
+
+    Returns:
+        any: The compressor
+    """
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+class _BrotliCompressor:
+    """Private adapter giving a brotli compressor the zlib compressor interface"""
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class Compression:
+    """Compresses responses with the best encoding accepted by the client among brotli, zstd and gzip.
+
+    Only responses larger than COMPRESSION_MIN_SIZE bytes are compressed, while streamed responses
+    are compressed chunk by chunk as they are sent. Resources can override the defaults with a
+    `compression` class attribute: False disables compression, a dictionary overrides min_size and level.
+    """
+
+    def __init__(self):
+        """Compression constructor."""
+        self.compressors = {}
+        if brotli is not None:
+            self.compressors["br"] = _brotli_compressor
+        if zstandard is not None:
+            self.compressors["zstd"] = _zstd_compressor
+        self.compressors["gzip"] = _gzip_compressor
+
+    def init_app(self, app):
+        """Registers the compression of the responses on the app
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.config.setdefault("COMPRESSION_ENABLED", True)
+        app.config.setdefault("COMPRESSION_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESSION_LEVEL", 6)
+        app.after_request(self.compress)
+
+    def _get_settings(self):
+        """Private method used to get the compression settings for the current resource
+
+        Returns:
+            dict of (str, int): The minimum size and the level, or None if compression is disabled
+        """
+        config = current_app.config
+        if not config["COMPRESSION_ENABLED"]:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        overrides = getattr(getattr(view, "view_class", None),
+                            "compression", {})
+        if overrides is False:
+            return None
+        if not isinstance(overrides, dict):
+            # i.e.: compression = True, the app settings apply
+            overrides = {}
+        return {"min_size": config["COMPRESSION_MIN_SIZE"], "level": config["COMPRESSION_LEVEL"], **overrides}
+
+    def compress(self, response):
+        """Compresses a response if the client accepts it and the response is worth compressing
+
+        Args:
+            response (Response): The response
+
+        Returns:
+            Response: The same response, possibly compressed
+        """
+        if (request.method == "HEAD" or response.status_code < 200 or response.status_code in (204, 304)
+                or "Content-Encoding" in response.headers
+                or response.mimetype == "text/event-stream"
+                or "no-transform" in response.headers.get("Cache-Control", "")):
+            return response
+
+        settings = self._get_settings()
+        if settings is None:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(list(self.compressors))
+        if encoding is None:
+            return response
+        compressor = self.compressors[encoding](settings["level"])
+
+        if response.is_streamed:
+            chunks = response.response
+            response.response = self._compress_stream(compressor, chunks)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < settings["min_size"]:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def _compress_stream(compressor, chunks):
+        """Private generator used to compress a streamed response chunk by chunk
+
+        Args:
+            compressor (any): The compressor, with the zlib compressor interface
+            chunks (iterable of (bytes)): The response chunks
+
+        Returns:
+            generator of (bytes): The compressed chunks
+        """
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                compressed = compressor.compress(chunk)
+                if compressed:
+                    yield compressed
+            yield compressor.flush()
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
@@ -0,0 +1,113 @@
+from functools import wraps
+from hashlib import blake2b
+from threading import Thread
+from flask import copy_current_request_context, current_app, request, Response
+from flask_jwt_extended import get_jwt_claims
+from models.version import VersionModel
+
+
+def request_fingerprint():
+    """Gets a normalized representation of what the current request asks for: the path,
+    the query string and body arguments in sorted order and the role of the requester
+
+    Returns:
+        str: The request fingerprint
+    """
+    args = sorted(request.args.items(multi=True))
+    form = sorted(request.form.items(multi=True))
+    body = request.get_json(silent=True) if request.is_json else None
+    return f"{request.path}|{args}|{form}|{body}|{get_jwt_claims().get('role')}"
+
+
+def make_etag(versions, fingerprint=None):
+    """Builds a weak entity tag for the current request out of the versions of the data it depends on
+
+    Args:
+        versions (dict of (str, int)): The version for every key the response depends on
+        fingerprint (str, optional): The fingerprint of the current request. Defaults to request_fingerprint().
+
+    Returns:
+        str: The entity tag, without quotes and weakness marker
+    """
+    if fingerprint is None:
+        fingerprint = request_fingerprint()
+    seed = f"{fingerprint}|{sorted(versions.items())}"
+    return blake2b(seed.encode(), digest_size=12).hexdigest()
+
+
+def _unpack(rv):
+    """Private function used to normalize the value returned by a resource method
+
+    Args:
+        rv (any): The returned data, optionally in a tuple with status code and headers
+
+    Returns:
+        (any, int, dict of (str, str)): The data, the status code and the headers
+    """
+    if not isinstance(rv, tuple):
+        return rv, 200, None
+    if len(rv) == 2:
+        return rv[0], rv[1], None
+    return rv
+
+
+def _rebuild(cache, fingerprint, fn, args, kwargs, versions):
+    """Private function used to rebuild an outdated cached response in background, in a copy of the request context
+
+    Args:
+        cache (ResponseCache): The response cache
+        fingerprint (str): The fingerprint of the request
+        fn (callable): The resource method
+        args (tuple): The resource method positional arguments
+        kwargs (dict of (str, any)): The resource method keyword arguments
+        versions (dict of (str, int)): The versions of the data read by the request
+    """
+    data, code, _ = _unpack(fn(*args, **kwargs))
+    if code == 200:
+        cache.put(fingerprint, data, versions)
+
+
+def conditional(get_keys, cached=False):
+    """Custom decorator factory that produces a decorator that answers conditional GET requests.
+
+    The decorated resource method gets a weak ETag built from the versions of the data it depends on:
+    when the request If-None-Match header contains it, a 304 response is sent without calling the method.
+    When cached is True the responses are also stored in the app response cache (see ResponseCache),
+    that answers the requests of every client as long as those versions do not change.
+
+    Args:
+        get_keys (callable): Function called with the resource method arguments that returns the keys of
+            the versioned data (see VersionModel) the response depends on, or None to skip the check
+        cached (bool, optional): Whether the responses can be served from the response cache. Defaults to False.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            keys = get_keys(*args, **kwargs)
+            if keys is None:
+                return fn(*args, **kwargs)
+
+            fingerprint = request_fingerprint()
+            versions = VersionModel.find_versions(keys)
+            etag = make_etag(versions, fingerprint)
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers={"ETag": f'W/"{etag}"'})
+
+            cache = current_app.extensions.get(
+                "response_cache") if cached else None
+            if cache is not None and cache.enabled:
+                entry, fresh = cache.get(fingerprint, versions)
+                if entry is not None:
+                    if not fresh and cache.start_revalidation(entry):
+                        Thread(target=copy_current_request_context(_rebuild), daemon=True,
+                               args=(cache, fingerprint, fn, args, kwargs, versions)).start()
+                    return entry.data, 200, {"ETag": f'W/"{make_etag(entry.versions, fingerprint)}"'}
+
+            data, code, headers = _unpack(fn(*args, **kwargs))
+            if code == 200:
+                headers = dict(headers or {}, ETag=f'W/"{etag}"')
+                if cache is not None:
+                    cache.put(fingerprint, data, versions)
+            return data, code, headers
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+from queue import Empty, Full, Queue
+from threading import Lock
+
+
+class Subscription:
+    """The queue of events of a topic for a single subscriber"""
+
+    def __init__(self, topic, queue_size):
+        """Subscription constructor.
+
+        Args:
+            topic (any): The topic of the events
+            queue_size (int): The maximum number of events waiting to be consumed
+        """
+        self.topic = topic
+        self.dropped = False
+        self.closed = False
+        self._queue = Queue(queue_size)
+
+    def get(self, timeout=None):
+        """Waits for the next event
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait. Defaults to None, that waits forever.
+
+        Returns:
+            any: The event, or None if no event has been published before the timeout
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class EventBus:
+    """An in-process publish/subscribe bus. Every subscriber has a bounded queue: a subscriber that does
+    not keep up with the published events is dropped instead of slowing down the publishers or
+    growing its queue without limit, and it is expected to subscribe again and resync.
+    """
+
+    def __init__(self, queue_size=100):
+        """EventBus constructor.
+
+        Args:
+            queue_size (int, optional): The maximum number of events waiting for every subscriber. Defaults to 100.
+        """
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscriptions = {}
+        self._lock = Lock()
+
+    def subscribe(self, topic):
+        """Subscribes to the events of a topic
+
+        Args:
+            topic (any): The topic
+
+        Returns:
+            Subscription: The subscription, to be passed to unsubscribe once done
+        """
+        subscription = Subscription(topic, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Removes a subscription
+
+        Args:
+            subscription (Subscription): The subscription
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.topic)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.topic]
+
+    def has_subscribers(self, topic):
+        """Checks if anybody is subscribed to a topic, so that publishers can skip building unwanted events
+
+        Args:
+            topic (any): The topic
+
+        Returns:
+            bool: True if the topic has subscribers
+        """
+        return topic in self._subscriptions
+
+    def topics(self):
+        """Gets the topics somebody is subscribed to
+
+        Returns:
+            list of (any): The topics
+        """
+        with self._lock:
+            return list(self._subscriptions)
+
+    def publish(self, topic, event):
+        """Publishes an event to every subscriber of a topic, without waiting.
+        Subscribers whose queue is full are dropped.
+
+        Args:
+            topic (any): The topic
+            event (any): The event
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(topic, ()))
+        for subscription in subscriptions:
+            try:
+                subscription._queue.put_nowait(event)
+            except Full:
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+                self.dropped += 1
+
+    def close(self):
+        """Removes every subscription, marking it closed and waking up its subscriber"""
+        with self._lock:
+            subscriptions = [subscription for subscriptions in self._subscriptions.values()
+                             for subscription in subscriptions]
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.closed = True
+            try:
+                subscription._queue.put_nowait(None)
+            except Full:
+                # its subscriber is not waiting
+                pass
+
+    def status(self):
+        """Public representation of the bus state.
+
+        Returns:
+            dict of (str, int): The number of topics, subscribers and dropped subscribers
+        """
+        with self._lock:
+            subscribers = sum(len(subscriptions)
+                              for subscriptions in self._subscriptions.values())
+            topics = len(self._subscriptions)
+        return {"topics": topics, "subscribers": subscribers, "dropped": self.dropped}
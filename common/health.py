@@ -0,0 +1,75 @@
+from threading import Lock
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+import time
+
+
+class ReadinessProbe:
+    """Pings the database for the readiness checks, at most once every READINESS_PING_INTERVAL seconds:
+    the checks in between, and the ones made while another thread is pinging, get the last result,
+    so that load balancers can probe often without adding load to the database.
+    """
+
+    def __init__(self, ping_interval=1):
+        """ReadinessProbe constructor.
+
+        Args:
+            ping_interval (float, optional): The seconds a ping result is reused for. Defaults to 1.
+        """
+        self.ping_interval = ping_interval
+        self._result = None
+        self._pinged_at = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a probe from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            ReadinessProbe: The configured probe
+        """
+        return cls(config.get("READINESS_PING_INTERVAL", 1))
+
+    def init_app(self, app):
+        """Registers the probe in the app extensions
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["readiness_probe"] = self
+
+    @staticmethod
+    def ping():
+        """Runs a trivial statement on a pooled connection of the current app
+
+        Returns:
+            dict of (str, any): Whether the database answered, the milliseconds it took and the error, if any
+        """
+        start = time.perf_counter()
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except SQLAlchemyError as e:
+            return {"ok": False, "milliseconds": round((time.perf_counter() - start) * 1000, 3),
+                    "error": str(e.orig if getattr(e, "orig", None) is not None else e)}
+        return {"ok": True, "milliseconds": round((time.perf_counter() - start) * 1000, 3)}
+
+    def database(self):
+        """Gets the result of the last ping, pinging the database again if it is older than ping_interval
+
+        Returns:
+            dict of (str, any): The ping result, with the seconds since the ping was made
+        """
+        now = time.monotonic()
+        if (self._pinged_at is None or now - self._pinged_at >= self.ping_interval) \
+                and self._lock.acquire(blocking=self._result is None):
+            try:
+                self._result = self.ping()
+                self._pinged_at = now = time.monotonic()
+            finally:
+                self._lock.release()
+        return dict(self._result, age_seconds=round(now - self._pinged_at, 3))
@@ -0,0 +1,303 @@
+"""The built-in job kinds, registered with the job runner on import (see common.jobs.job_kind)"""
+from io import StringIO
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from common.agenda_feed import agenda_feed
+from common.jobs import JobResult, job_kind
+from common.rebalancer import WeekState, rebalance
+from models.maintenance_activity import MaintenanceActivityModel
+from models.user import UserModel
+from models.version import VersionModel
+import csv
+
+# Activities read or written per transaction
+CHUNK_SIZE = 500
+EXPORT_COLUMNS = ("activity_id", "activity_type", "site", "typology", "description", "estimated_time",
+                  "interruptible", "materials", "week", "workspace_notes", "maintainer_username", "week_day",
+                  "start_time")
+_ACTIVITY_TYPES = ("planned", "unplanned", "extra")
+# The type of every imported activity field and whether it is required
+_IMPORT_FIELDS = {
+    "activity_type": (str, True),
+    "site": (str, True),
+    "typology": (str, True),
+    "description": (str, True),
+    "estimated_time": (int, True),
+    "interruptible": (bool, True),
+    "week": (int, True),
+    "materials": (str, False),
+    "workspace_notes": (str, False),
+}
+
+
+def _week(value):
+    """Private function used to validate a week number
+
+    Args:
+        value (any): The week
+
+    Raises:
+        ValueError: If the week is not an integer between 1 and 52
+
+    Returns:
+        int: The week
+    """
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= 52:
+        raise ValueError("Week should be an integer between 1 and 52")
+    return value
+
+
+def validate_export(params):
+    """Validates the parameters of an activities export
+
+    Args:
+        params (dict of (str, any)): The parameters: week (optional)
+
+    Raises:
+        ValueError: If the week is not valid
+
+    Returns:
+        dict of (str, any): The validated parameters
+    """
+    week = params.get("week")
+    return {"week": _week(week) if week is not None else None}
+
+
+@job_kind("export_activities", validate=validate_export)
+def export_activities(context, params):
+    """Exports the activities, of a week or of every week, as a CSV file written chunk by chunk
+
+    Args:
+        context (JobContext): The job context
+        params (dict of (str, any)): The validated parameters
+
+    Returns:
+        JobResult: The CSV file, written with context.write
+    """
+    query = MaintenanceActivityModel.query
+    if params["week"] is not None:
+        query = query.filter_by(week=params["week"])
+    total = query.count()
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    exported, last_id = 0, 0
+    while True:
+        # by key ranges rather than offsets, so that every chunk is an index seek
+        activities = (query.filter(MaintenanceActivityModel.activity_id > last_id)
+                      .order_by(MaintenanceActivityModel.activity_id)
+                      .limit(CHUNK_SIZE)
+                      .all())
+        if not activities:
+            break
+        for activity in activities:
+            writer.writerow([getattr(activity, column)
+                            for column in EXPORT_COLUMNS])
+        context.write(output.getvalue())
+        output.seek(0)
+        output.truncate()
+        exported += len(activities)
+        last_id = activities[-1].activity_id
+        db.session.expunge_all()
+        context.progress(exported / total if total else 1,
+                         f"Exported {exported} of {total} activities")
+    if not exported:
+        # the header alone
+        context.write(output.getvalue())
+    suffix = f"_week_{params['week']}" if params["week"] is not None else ""
+    return JobResult(None, "text/csv", f"activities{suffix}.csv")
+
+
+def validate_import(params):
+    """Validates the parameters of an activities import
+
+    Args:
+        params (dict of (str, any)): The parameters: activities, the list of activities to create,
+            with the fields of the activity creation
+
+    Raises:
+        ValueError: If there are no activities or an activity is not valid
+
+    Returns:
+        dict of (str, any): The validated parameters
+    """
+    activities = params.get("activities")
+    if not isinstance(activities, list) or not activities:
+        raise ValueError("Activities should be a non empty list")
+    validated = []
+    for index, activity in enumerate(activities):
+        if not isinstance(activity, dict):
+            raise ValueError(f"Activity {index} should be an object")
+        row = {}
+        for name, (type_, required) in _IMPORT_FIELDS.items():
+            value = activity.get(name)
+            if value is None:
+                if required:
+                    raise ValueError(f"Activity {index}: {name} is required")
+                continue
+            if not isinstance(value, type_) or (type_ is int and isinstance(value, bool)):
+                raise ValueError(
+                    f"Activity {index}: {name} should be of type {type_.__name__}")
+            row[name] = value
+        if row["activity_type"] not in _ACTIVITY_TYPES:
+            raise ValueError(
+                f"Activity {index}: activity_type should be planned, unplanned or extra")
+        try:
+            _week(row["week"])
+        except ValueError as e:
+            raise ValueError(f"Activity {index}: {e}")
+        validated.append(row)
+    return {"activities": validated}
+
+
+@job_kind("import_activities", validate=validate_import)
+def import_activities(context, params):
+    """Creates the activities in chunks, every chunk in its own transaction.
+    A job queued again after its worker stopped resumes from the first chunk that was not committed. A failed job
+    keeps the chunks committed before the failure: its error tells how many activities have been imported, the
+    first ones of the list, so that only the others are submitted again.
+
+    Args:
+        context (JobContext): The job context
+        params (dict of (str, any)): The validated parameters
+
+    Raises:
+        RuntimeError: If a chunk cannot be imported
+
+    Returns:
+        dict of (str, int): The number of imported activities
+    """
+    activities = params["activities"]
+    imported = context.checkpoint or 0
+    while imported < len(activities):
+        chunk = [dict({"materials": None, "workspace_notes": None}, **activity)
+                 for activity in activities[imported:imported + CHUNK_SIZE]]
+        try:
+            db.session.execute(
+                MaintenanceActivityModel.__table__.insert(), chunk)
+            VersionModel.bump(
+                ["activities"] + [f"week:{week}" for week in {activity["week"] for activity in chunk}])
+            # commits the chunk together with the checkpoint
+            context.progress((imported + len(chunk)) / len(activities),
+                             f"Imported {imported + len(chunk)} of {len(activities)} activities",
+                             checkpoint=imported + len(chunk))
+        except SQLAlchemyError as e:
+            error = e.orig if getattr(e, "orig", None) is not None else e
+            raise RuntimeError(
+                f"Imported the first {imported} of {len(activities)} activities, "
+                f"the ones from index {imported} failed: {error}")
+        imported += len(chunk)
+    return {"imported": len(activities)}
+
+
+def _non_negative(params, name, default):
+    """Private function used to validate an optional non negative integer parameter
+
+    Args:
+        params (dict of (str, any)): The parameters
+        name (str): The name of the parameter
+        default (int): The value of a missing parameter
+
+    Raises:
+        ValueError: If the parameter is not a non negative integer
+
+    Returns:
+        int: The parameter
+    """
+    value = params.get(name, default)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+        raise ValueError(f"{name} should be a non negative integer")
+    return value
+
+
+def validate_rebalance(params):
+    """Validates the parameters of a week rebalancing
+
+    Args:
+        params (dict of (str, any)): The parameters: week, max_moves (optional), tolerance (optional)
+            and apply (optional)
+
+    Raises:
+        ValueError: If a parameter is not valid
+
+    Returns:
+        dict of (str, any): The validated parameters
+    """
+    apply = params.get("apply", False)
+    if not isinstance(apply, bool):
+        raise ValueError("Apply should be a boolean")
+    return {"week": _week(params.get("week")), "max_moves": _non_negative(params, "max_moves", None),
+            "tolerance": _non_negative(params, "tolerance", 30), "apply": apply}
+
+
+def _apply_moves(week, moves):
+    """Private function used to assign the moved activities to their new slots, in a single transaction.
+    Fails if an activity has been changed since the week was loaded, or if a changed agenda is not valid anymore.
+
+    Args:
+        week (int): The nth week of the year
+        moves (list of (dict of (str, any))): The moves of the rebalancing diff
+
+    Raises:
+        ValueError: If an activity or a maintainer has changed since the week was loaded
+        InvalidAgendaError: If a maintainer does not have enough time for the activities moved to one of their days
+    """
+    activities = {activity.activity_id: activity for activity in
+                  MaintenanceActivityModel.find_by_ids([move["activity_id"] for move in moves])}
+    keys, slots = set(), []
+    for move in moves:
+        activity = activities.get(move["activity_id"])
+        if activity is None or (activity.week, activity.maintainer_username, activity.week_day,
+                                activity.start_time) != (week, *move["from"].values()):
+            raise ValueError(
+                f"Activity {move['activity_id']} has changed since the week was loaded, rebalance it again")
+        activity.update(move["to"])
+        keys.update(activity.version_keys())
+        slots.append((activity.activity_id, *activity.agenda_slots()))
+    db.session.flush()
+    for maintainer, week_day in {(move["to"]["maintainer_username"], move["to"]["week_day"]) for move in moves}:
+        user = UserModel.find_by_username(maintainer)
+        if user is None or user.role != "maintainer":
+            raise ValueError(
+                f"Maintainer {maintainer} has changed since the week was loaded, rebalance it again")
+        user.get_daily_agenda(week, week_day)
+    VersionModel.bump(sorted(keys))
+    for activity_id, before, after in slots:
+        agenda_feed.record(activity_id, before, after)
+    db.session.commit()
+
+
+@job_kind("rebalance_week", validate=validate_rebalance)
+def rebalance_week(context, params):
+    """Proposes the moves of the assigned activities of a week that balance the daily loads of the maintainers
+    (see common.rebalancer.rebalance), and applies them if asked to
+
+    Args:
+        context (JobContext): The job context
+        params (dict of (str, any)): The validated parameters
+
+    Returns:
+        dict of (str, any): The diff of the activity slots, with the variance of the daily loads before and after
+    """
+    maintainers = [user.username for user in UserModel.find_all_maintainers()]
+    state = WeekState(maintainers, [
+        (activity.activity_id, activity.maintainer_username, activity.week_day, activity.start_time,
+         activity.estimated_time)
+        for activity in MaintenanceActivityModel.find_assigned_in_week(params["week"])])
+    db.session.expunge_all()
+    context.progress(0.1, f"Loaded {len(state.slots)} activities")
+
+    def on_move(moves):
+        # the number of moves is not known in advance without a limit
+        fraction = 0.1 + 0.8 * moves / params["max_moves"] if params["max_moves"] else 0.5
+        context.progress(fraction, f"Searched {moves} moves")
+
+    result = rebalance(state, params["max_moves"],
+                       params["tolerance"], on_move)
+    result["week"] = params["week"]
+    result["applied"] = False
+    if params["apply"] and result["moves"]:
+        context.progress(0.9, f"Applying {len(result['moves'])} moves")
+        _apply_moves(params["week"], result["moves"])
+        result["applied"] = True
+    return result
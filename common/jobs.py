@@ -0,0 +1,307 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from common.json_representation import dumps
+from exceptions.job_cancelled_error import JobCancelledError
+from models.job import JobModel
+from models.job_result_chunk import JobResultChunkModel
+import os
+import socket
+import time
+
+# The handler of a job kind and the role of the users allowed to queue it
+JobKind = namedtuple("JobKind", ("name", "handler", "role", "validate"))
+# A job result to be downloaded as a file, whose data is None if the job has written it with JobContext.write
+JobResult = namedtuple("JobResult", ("data", "content_type", "filename"),
+                       defaults=("application/octet-stream", None))
+
+_kinds = {}
+
+
+def job_kind(name, role="planner", validate=None):
+    """Registers the decorated function as the handler of a job kind.
+    The handler is called with the JobContext of the job and its parameters, on a job thread in an app context
+    of its own, and returns the job result: a JobResult, any json serializable value or None.
+
+    Args:
+        name (str): The name of the job kind
+        role (str, optional): The role of the users allowed to queue the jobs. Defaults to "planner".
+        validate (callable, optional): Function that takes the parameters of a new job and returns them
+            normalized, raising a ValueError if they are not valid. Defaults to None.
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(fn):
+        _kinds[name] = JobKind(name, fn, role, validate)
+        return fn
+    return decorator
+
+
+def find_job_kind(name):
+    """Finds a registered job kind
+
+    Args:
+        name (str): The name of the job kind
+
+    Returns:
+        JobKind: The job kind, None if it is not registered
+    """
+    return _kinds.get(name)
+
+
+def _encode_result(result):
+    """Private function used to encode the value returned by a job handler
+
+    Args:
+        result (any): The returned value
+
+    Returns:
+        (bytes, str, str): The data, media type and file name of the result, all None if there is no result
+    """
+    if result is None:
+        return None, None, None
+    if isinstance(result, JobResult):
+        data = result.data.encode() if isinstance(
+            result.data, str) else result.data
+        return data, result.content_type, result.filename
+    return dumps(result), "application/json", None
+
+
+class JobContext:
+    """The handle a job handler reports its progress through, and notices its cancellation"""
+    # Seconds between two progress reports written to the database, unless they carry a checkpoint
+    report_interval = 0.5
+
+    def __init__(self, runner, job):
+        """JobContext constructor.
+
+        Args:
+            runner (JobRunner): The runner of the job
+            job (JobModel): The claimed job
+        """
+        self.job_id = job.id
+        self.created_by = job.created_by
+        self.checkpoint = job.get_checkpoint()
+        self._runner = runner
+        self._reported_at = 0
+        self._chunks = 0
+
+    def progress(self, fraction, message=None, checkpoint=None):
+        """Reports the progress of the job, committing the current transaction together with it.
+        A job queued again after its worker stopped resumes from the last checkpoint (see the checkpoint attribute).
+
+        Args:
+            fraction (float): The completed fraction, between 0 and 1
+            message (str, optional): The description of the current step. Defaults to None.
+            checkpoint (any, optional): The json serializable state to resume from. Defaults to None.
+
+        Raises:
+            JobCancelledError: If the job has been cancelled or its runner is stopping
+        """
+        if self._runner.stopping:
+            raise JobCancelledError()
+        now = time.time()
+        if checkpoint is None and fraction < 1 and now - self._reported_at < self.report_interval:
+            return
+        self._reported_at = now
+        if JobModel.report_progress(self.job_id, self._runner.owner, min(max(fraction, 0), 1), message, now,
+                                    checkpoint):
+            raise JobCancelledError()
+
+    def write(self, data):
+        """Appends a chunk to the file the job returns as its result, within the current transaction: it is committed
+        with the next progress report. The chunks of a previous run of the job are discarded by its first chunk,
+        so a job writing its result starts it over rather than resuming from a checkpoint.
+
+        Args:
+            data (bytes or str): The chunk
+        """
+        if not self._chunks:
+            JobResultChunkModel.discard(self.job_id)
+        JobResultChunkModel.append(self.job_id, self._chunks,
+                                   data.encode() if isinstance(data, str) else data)
+        self._chunks += 1
+
+
+class JobRunner:
+    """Runs the queued jobs on a pool of JOBS_WORKERS threads of every worker process, without an external broker.
+
+    The jobs are rows of the jobs table: a supervisor thread polls it every JOBS_POLL_INTERVAL seconds, or as soon as
+    a job is queued by this process, and claims as many queued jobs as there are idle threads. Only one runner can
+    claim a job. The claimed jobs get a heartbeat every third of JOBS_LEASE seconds: the running jobs whose heartbeat
+    is older than JOBS_LEASE, because their worker has been killed, are queued again for any runner to pick up.
+    When a runner stops, its running jobs are interrupted at their next progress report and queued again.
+    A job interrupted JOBS_MAX_ATTEMPTS times, i.e. one that kills its worker, fails instead of being queued again.
+    With JOBS_WORKERS set to 0 the process only queues jobs, leaving them to the other workers.
+    """
+
+    def __init__(self, workers=2, poll_interval=1, lease=60, max_attempts=3):
+        """JobRunner constructor.
+
+        Args:
+            workers (int, optional): The number of job threads. Defaults to 2.
+            poll_interval (float, optional): The seconds between two polls of the jobs table. Defaults to 1.
+            lease (float, optional): The seconds after which a job without heartbeats is queued again. Defaults to 60.
+            max_attempts (int, optional): The number of runs after which an interrupted job fails. Defaults to 3.
+        """
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.app = None
+        self.owner = None
+        self._pid = None
+        self._executor = None
+        self._supervisor = None
+        self._running = set()
+        self._lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a runner from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            JobRunner: The configured runner
+        """
+        return cls(config.get("JOBS_WORKERS", 2), config.get("JOBS_POLL_INTERVAL", 1), config.get("JOBS_LEASE", 60),
+                   config.get("JOBS_MAX_ATTEMPTS", 3))
+
+    def init_app(self, app):
+        """Registers the runner in the app extensions, starting it on the first request of every worker process
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["job_runner"] = self
+        self.app = app
+        if self.workers > 0:
+            app.before_request(self.start)
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    def start(self):
+        """Starts the supervisor of the current process, once. The threads are not started in the server master
+        process, whose threads would not be forked with the workers."""
+        if self.workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.owner = f"{socket.gethostname()}:{self._pid}:{os.urandom(4).hex()}"
+            self._running = set()
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="job")
+            self._supervisor = Thread(
+                target=self._supervise, name="job-supervisor", daemon=True)
+            self._supervisor.start()
+
+    def stop(self):
+        """Stops the supervisor and waits for the running jobs, which are interrupted and queued again"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._stop.set()
+            self._wake.set()
+            self._supervisor.join()
+            self._executor.shutdown(wait=True)
+            self._pid = None
+
+    def submit(self, kind, params, created_by):
+        """Queues a job
+
+        Args:
+            kind (str): The name of the job kind
+            params (dict of (str, any)): The validated parameters
+            created_by (str): The username of the user queueing the job
+
+        Returns:
+            JobModel: The queued job
+        """
+        job = JobModel(kind, params, created_by, time.time())
+        job.save_to_db()
+        # loaded as queued, before a job thread claims it
+        db.session.refresh(job)
+        self._wake.set()
+        return job
+
+    def _supervise(self):
+        """Private method used to claim the queued jobs, keep the running ones alive and queue again the stale ones"""
+        last_heartbeat = last_requeue = 0
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    now = time.time()
+                    running = list(self._running)
+                    if running and now - last_heartbeat >= self.lease / 3:
+                        JobModel.heartbeat(running, self.owner, now)
+                        last_heartbeat = now
+                    if now - last_requeue >= self.lease / 2:
+                        JobModel.requeue_stale(
+                            now - self.lease, self.max_attempts, now)
+                        last_requeue = now
+                    idle = self.workers - len(running)
+                    if idle > 0:
+                        for id in JobModel.find_queued_ids(idle):
+                            if not self._stop.is_set() and JobModel.claim(id, self.owner, time.time()):
+                                self._running.add(id)
+                                self._executor.submit(self._run, id)
+                except SQLAlchemyError as e:
+                    # i.e.: the jobs table has not been created yet, see the bootstrap command
+                    self.app.logger.warning("Jobs not polled: %s", e)
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.poll_interval)
+
+    def _run(self, id):
+        """Private method used to run a claimed job and store its outcome
+
+        Args:
+            id (int): The identifier of the job
+        """
+        with self.app.app_context():
+            try:
+                job = JobModel.find_by_id(id)
+                kind = find_job_kind(job.kind)
+                if kind is None:
+                    JobModel.finish(id, self.owner, "failed", time.time(),
+                                    error=f"Unknown job kind '{job.kind}'")
+                    return
+                try:
+                    result = kind.handler(
+                        JobContext(self, job), job.get_params())
+                except JobCancelledError:
+                    db.session.rollback()
+                    if self.stopping and not JobModel.find_by_id(id).cancel_requested:
+                        JobModel.requeue(
+                            id, self.owner, self.max_attempts, time.time())
+                    else:
+                        JobModel.finish(id, self.owner,
+                                        "cancelled", time.time())
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception("Job %s failed", id)
+                    JobModel.finish(id, self.owner, "failed",
+                                    time.time(), error=str(e))
+                else:
+                    data, content_type, filename = _encode_result(result)
+                    JobModel.finish(id, self.owner, "succeeded", time.time(), result=data,
+                                    result_type=content_type, result_name=filename)
+            except SQLAlchemyError:
+                self.app.logger.exception("Job %s outcome not stored", id)
+            finally:
+                db.session.remove()
+                self._running.discard(id)
+                self._wake.set()
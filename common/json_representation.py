@@ -0,0 +1,70 @@
+from flask import make_response, current_app
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library encoder is used without it
+    orjson = None
+
+
+def _default(obj):
+    """Private function used to encode the objects that are not natively serializable,
+    such as models exposing their public representation through json()
+
+    Args:
+        obj (any): The object to encode
+
+    Raises:
+        TypeError: If the object cannot be encoded
+
+    Returns:
+        any: A serializable representation of the object
+    """
+    if hasattr(obj, "json"):
+        return obj.json()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data, debug=False, settings=None):
+    """Encodes data as JSON, using orjson when it is installed and no custom encoder settings are required.
+    Non string dictionary keys are encoded as strings, as the standard library does.
+
+    Args:
+        data (any): The data to encode
+        debug (bool, optional): Whether to indent the output. Defaults to False.
+        settings (dict of (str, any), optional): Custom json.dumps settings (RESTFUL_JSON). Defaults to None.
+
+    Returns:
+        bytes: The encoded data, ending with a new line
+    """
+    if orjson is not None and not settings:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if debug:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+    settings = dict(settings or {})
+    if debug:
+        settings.setdefault("indent", 4)
+    settings.setdefault("default", _default)
+    return (json.dumps(data, **settings) + "\n").encode()
+
+
+def output_json(data, code, headers=None):
+    """Makes a Flask response with a JSON encoded body. Replaces the Flask-RESTful default representation.
+
+    Args:
+        data (any): The response data
+        code (int): The response status code
+        headers (dict of (str, str), optional): The response headers. Defaults to None.
+
+    Returns:
+        Response: The Flask response
+    """
+    body = dumps(data, current_app.debug,
+                 current_app.config.get("RESTFUL_JSON"))
+    resp = make_response(body, code)
+    resp.headers.extend(headers or {})
+    return resp
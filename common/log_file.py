@@ -0,0 +1,31 @@
+from logging.handlers import RotatingFileHandler, WatchedFileHandler
+import logging
+
+
+def file_logger(path, max_bytes=0, backups=5):
+    """Gets the logger appending its records, as they are, to a file.
+
+    Without max_bytes the file is reopened whenever it has been moved or removed, so that the worker processes of the
+    server can all append to it while an external tool (i.e.: logrotate) rotates it. With max_bytes the logger rotates
+    the file by itself, which only works when a single process writes to it.
+
+    Args:
+        path (str): The file path
+        max_bytes (int, optional): The size from which the file is rotated by the logger, 0 for an external rotation.
+            Defaults to 0.
+        backups (int, optional): The number of files kept by the rotation of the logger. Defaults to 5.
+
+    Returns:
+        Logger: The logger, configured once per path
+    """
+    logger = logging.getLogger(f"{__name__}.{path}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        if max_bytes:
+            handler = RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        else:
+            handler = WatchedFileHandler(path, delay=True)
+        logger.addHandler(handler)
+    return logger
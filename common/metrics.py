@@ -0,0 +1,573 @@
+from bisect import bisect_left
+from threading import Lock, Thread, local
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+import glob
+import json
+import os
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# The WSGI environ key of the tally of a request
+_TALLY_ENVIRON_KEY = "metrics.tally"
+
+
+def _format_labels(names, values, extra=""):
+    """Private function used to format the labels of a sample in the Prometheus text format
+
+    Args:
+        names (tuple of (str)): The label names
+        values (tuple of (str)): The label values
+        extra (str, optional): An already formatted label to append. Defaults to "".
+
+    Returns:
+        str: The formatted labels, empty if there are none
+    """
+    pairs = [f'{name}="{str(value)}"' for name,
+             value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing value for every combination of label values"""
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        """Counter constructor.
+
+        Args:
+            name (str): The metric name
+            documentation (str): The metric description
+            labels (tuple of (str), optional): The label names. Defaults to ().
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, label_values=(), amount=1):
+        """Increments the counter
+
+        Args:
+            label_values (tuple of (str), optional): The label values. Defaults to ().
+            amount (float, optional): The increment. Defaults to 1.
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(
+                label_values, 0) + amount
+
+    def value(self, label_values=()):
+        """Gets the current value of the counter
+
+        Args:
+            label_values (tuple of (str), optional): The label values. Defaults to ().
+
+        Returns:
+            float: The value
+        """
+        return self._values.get(label_values, 0)
+
+    def values(self):
+        """Gets a copy of the current values
+
+        Returns:
+            dict of (tuple of (str), float): The value for every combination of label values
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self, values=None):
+        """Gets the samples of the metric in the Prometheus text format
+
+        Args:
+            values (dict of (tuple of (str), float), optional): The values to format. Defaults to the current ones.
+
+        Returns:
+            list of (str): The samples
+        """
+        if values is None:
+            values = self.values()
+        return [f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+                for label_values, value in values.items()]
+
+
+class Histogram:
+    """The distribution of the observed values in cumulative buckets, for every combination of label values"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        """Histogram constructor.
+
+        Args:
+            name (str): The metric name
+            documentation (str): The metric description
+            labels (tuple of (str), optional): The label names. Defaults to ().
+            buckets (tuple of (float), optional): The upper bounds of the buckets. Defaults to LATENCY_BUCKETS.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = Lock()
+
+    def observe(self, value, label_values=()):
+        """Records an observation
+
+        Args:
+            value (float): The observed value
+            label_values (tuple of (str), optional): The label values. Defaults to ().
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                # one count for every bucket plus +Inf, then the sum
+                counts = self._values[label_values] = [0] * \
+                    (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, label_values=()):
+        """Gets the number of observations
+
+        Args:
+            label_values (tuple of (str), optional): The label values. Defaults to ().
+
+        Returns:
+            int: The number of observations
+        """
+        counts = self._values.get(label_values)
+        return sum(counts[:-1]) if counts else 0
+
+    def sum(self, label_values=()):
+        """Gets the sum of the observations
+
+        Args:
+            label_values (tuple of (str), optional): The label values. Defaults to ().
+
+        Returns:
+            float: The sum of the observations
+        """
+        counts = self._values.get(label_values)
+        return counts[-1] if counts else 0
+
+    def values(self):
+        """Gets a copy of the current bucket counts
+
+        Returns:
+            dict of (tuple of (str), list of (float)): The count of every bucket, then the sum of the observations,
+            for every combination of label values
+        """
+        with self._lock:
+            return {label_values: list(counts) for label_values, counts in self._values.items()}
+
+    def samples(self, values=None):
+        """Gets the samples of the metric in the Prometheus text format
+
+        Args:
+            values (dict of (tuple of (str), list of (float)), optional): The bucket counts to format.
+                Defaults to the current ones.
+
+        Returns:
+            list of (str): The samples
+        """
+        if values is None:
+            values = self.values()
+        samples = []
+        for label_values, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                samples.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            samples.append(f"{self.name}_sum{labels} {counts[-1]}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class Gauge:
+    """A value read when the metrics are collected"""
+
+    def __init__(self, name, documentation, labels=(), collect=None, type="gauge"):
+        """Gauge constructor.
+
+        Args:
+            name (str): The metric name
+            documentation (str): The metric description
+            labels (tuple of (str), optional): The label names. Defaults to ().
+            collect (callable, optional): Function returning a dictionary of label values and values. Defaults to None.
+            type (str, optional): The exposed metric type, counter for values that only increase. Defaults to gauge.
+        """
+        self.type = type
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def values(self):
+        """Collects the current values
+
+        Returns:
+            dict of (tuple of (str), float): The value for every combination of label values
+        """
+        values = self.collect() if self.collect else {}
+        return {label_values: value for label_values, value in values.items() if value is not None}
+
+    def samples(self, values=None):
+        """Gets the samples of the metric in the Prometheus text format
+
+        Args:
+            values (dict of (tuple of (str), float), optional): The values to format. Defaults to the collected ones.
+
+        Returns:
+            list of (str): The samples
+        """
+        if values is None:
+            values = self.values()
+        return [f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+                for label_values, value in values.items()]
+
+
+def pool_status():
+    """Gets the state of the database pool of the current app
+
+    Returns:
+        dict of (str, int): The number of connections for every state, empty if the pool is not a QueuePool
+    """
+    from db import db
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {"size": pool.size(), "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(), "idle": pool.checkedin()}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long every connection checkout waits"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+class Metrics:
+    """In-process registry of the application metrics, exposed in the Prometheus text format.
+
+    Every request records its latency, the number of SQL statements it has run with their total time and
+    the number of agenda computations it has made, labelled by resource and method. The per-request counts
+    are kept in the request globals, so threads serving other requests never contend for them.
+
+    The metrics are kept per worker process. With METRICS_DIR set, every worker writes a snapshot of its metrics
+    to that directory every METRICS_SNAPSHOT_INTERVAL seconds, and /metrics exposes the sum of the snapshots of
+    every worker: the counters and histograms of the workers that have exited included, so that they never
+    decrease, the gauges of the running workers only.
+    """
+
+    def __init__(self):
+        """Metrics constructor."""
+        resource = ("resource", "method")
+        self.requests = Counter("http_requests_total", "Number of handled requests",
+                                resource + ("status",))
+        self.request_duration = Histogram("http_request_duration_seconds",
+                                          "Time spent handling a request", resource)
+        self.request_queries = Histogram("http_request_db_queries", "Number of SQL statements run by a request",
+                                         resource, COUNT_BUCKETS)
+        self.request_query_duration = Histogram("http_request_db_query_duration_seconds",
+                                                "Total time spent running the SQL statements of a request", resource)
+        self.request_agenda_computations = Histogram("http_request_agenda_computations",
+                                                     "Number of agenda computations made by a request", resource, COUNT_BUCKETS)
+        self.queries = Counter("db_queries_total", "Number of SQL statements run")
+        self.query_duration = Counter("db_query_duration_seconds_total",
+                                      "Total time spent running SQL statements")
+        self.agenda_computations = Counter("agenda_computations_total", "Number of agenda computations",
+                                           ("kind",))
+        self.pool_checkout_wait = Histogram("db_pool_checkout_wait_seconds",
+                                            "Time spent waiting for a database connection")
+        self.pool = Gauge("db_pool_connections", "Connections of the database pool",
+                          ("state",), self._collect_pool)
+        self.cache_lookups = Gauge("cache_lookups_total", "Lookups made by the in-memory caches",
+                                   ("cache", "result"), self._collect_caches, "counter")
+        self.registry = [self.requests, self.request_duration, self.request_queries, self.request_query_duration,
+                         self.request_agenda_computations, self.queries, self.query_duration,
+                         self.agenda_computations, self.pool_checkout_wait, self.pool, self.cache_lookups]
+        self.directory = None
+        self.snapshot_interval = 1
+        self.app = None
+        self._dirty = False
+        self._flusher_pid = None
+        self._flusher_lock = Lock()
+        self._engine_hooked = False
+        self._active = local()
+
+    def init_app(self, app):
+        """Registers the request hooks on the app and the SQL statement hooks on the engines.
+        When the database is not sqlite its connections are pooled by a TimedQueuePool.
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.config.setdefault("METRICS_ENABLED", True)
+        if not app.config["METRICS_ENABLED"]:
+            return
+        app.extensions["metrics"] = self
+        self.app = app
+        self.directory = app.config.get("METRICS_DIR") or None
+        self.snapshot_interval = app.config.get(
+            "METRICS_SNAPSHOT_INTERVAL", self.snapshot_interval)
+        if not app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite"):
+            options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+            options.setdefault("poolclass", TimedQueuePool)
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.teardown_request(self._teardown_request)
+        if not self._engine_hooked:
+            event.listen(Engine, "before_cursor_execute",
+                         self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute",
+                         self._after_cursor_execute)
+            self._engine_hooked = True
+
+    @staticmethod
+    def _labels():
+        """Private method used to get the labels of the current request: the resource class name and the method
+
+        Returns:
+            tuple of (str): The label values
+        """
+        view = current_app.view_functions.get(request.endpoint)
+        resource = getattr(getattr(view, "view_class", None), "__name__", None) or \
+            (request.endpoint or "unmatched")
+        return resource, request.method
+
+    def _tallies(self):
+        """Private method used to get the tallies of the requests being handled by the current thread: a batch
+        and the sub-request it runs on the same thread, which share g, have a tally each, kept in their WSGI environ
+
+        Returns:
+            list of (dict of (str, any)): The start time, statements, statement time and agenda computations
+            of every request, outermost first
+        """
+        tallies = getattr(self._active, "tallies", None)
+        if tallies is None:
+            tallies = self._active.tallies = []
+        return tallies
+
+    def _start_request(self):
+        tally = {"started_at": time.perf_counter(), "queries": 0,
+                 "query_duration": 0.0, "agenda_computations": 0}
+        request.environ[_TALLY_ENVIRON_KEY] = tally
+        self._tallies().append(tally)
+
+    def _stop_request(self):
+        """Private method used to stop tallying the current request
+
+        Returns:
+            dict of (str, any): The tally of the request, None if it is not tallied
+        """
+        tally = request.environ.pop(_TALLY_ENVIRON_KEY, None)
+        tallies = self._tallies()
+        if tally is not None and any(item is tally for item in tallies):
+            tallies.remove(tally)
+        return tally
+
+    def _end_request(self, response):
+        tally = self._stop_request()
+        if tally is None:
+            return response
+        labels = self._labels()
+        self.requests.inc(labels + (str(response.status_code),))
+        self.request_duration.observe(
+            time.perf_counter() - tally["started_at"], labels)
+        self.request_queries.observe(tally["queries"], labels)
+        self.request_query_duration.observe(
+            tally["query_duration"], labels)
+        self.request_agenda_computations.observe(
+            tally["agenda_computations"], labels)
+        if self.directory:
+            self._dirty = True
+            self._start_flusher()
+        return response
+
+    def _teardown_request(self, error=None):
+        self._stop_request()
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started_at"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info.pop("metrics_started_at", None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        self.queries.inc()
+        self.query_duration.inc(amount=elapsed)
+        # the statements of a sub-request count for its batch as well
+        for tally in self._tallies():
+            tally["queries"] += 1
+            tally["query_duration"] += elapsed
+
+    def observe_agenda_computation(self, kind):
+        """Records an agenda computation
+
+        Args:
+            kind (str): The computed agenda (i.e.: daily_agenda, daily_percentage)
+        """
+        self.agenda_computations.inc((kind,))
+        for tally in self._tallies():
+            tally["agenda_computations"] += 1
+
+    @staticmethod
+    def _collect_pool():
+        """Private method used to read the state of the database pool of the current app
+
+        Returns:
+            dict of (tuple of (str), int): The number of connections for every state
+        """
+        return {(state,): count for state, count in pool_status().items()}
+
+    @staticmethod
+    def _collect_caches():
+        """Private method used to read the statistics of the caches of the current app
+
+        Returns:
+            dict of (tuple of (str), int): The number of lookups for every cache and result
+        """
+        values = {}
+        for name in ("response_cache", "verified_token_cache"):
+            cache = current_app.extensions.get(name)
+            if cache is None:
+                continue
+            status = cache.status()
+            for result in ("hits", "stale_hits", "misses"):
+                if result in status:
+                    values[(name, result)] = status[result]
+        return values
+
+    def _start_flusher(self):
+        """Private method used to start the thread writing the snapshots of the current process, once"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            Thread(target=self._flush, name="metrics-flusher",
+                   daemon=True).start()
+
+    def _flush(self):
+        """Private method used to write the snapshot of the current process whenever a request has been recorded"""
+        while True:
+            time.sleep(self.snapshot_interval)
+            if not self._dirty or not self.directory:
+                continue
+            self._dirty = False
+            with self.app.app_context():
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    self.app.logger.warning(
+                        "Metrics snapshot not written: %s", e)
+
+    def write_snapshot(self):
+        """Writes the metrics of the current process to METRICS_DIR, replacing its previous snapshot"""
+        snapshot = {metric.name: [[list(label_values), value] for label_values, value in metric.values().items()]
+                    for metric in self.registry}
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(snapshot, file)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _is_running(pid):
+        """Private method used to check if a worker process is still running
+
+        Args:
+            pid (int): The process id
+
+        Returns:
+            bool: True if the process exists
+        """
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def clear_snapshots(self):
+        """Removes the snapshots left in METRICS_DIR by a previous run of the server, creating the directory if needed"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            os.remove(path)
+
+    def _merge_snapshots(self):
+        """Private method used to sum the snapshots of every worker
+
+        Returns:
+            dict of (str, dict of (tuple of (str), any)): The summed values of every metric
+        """
+        types = {metric.name: metric.type for metric in self.registry}
+        merged = {name: {} for name in types}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+                pid = int(os.path.basename(path)[:-len(".json")])
+            except (OSError, ValueError):
+                continue
+            running = self._is_running(pid)
+            for name, values in snapshot.items():
+                if name not in merged or (types[name] == "gauge" and not running):
+                    continue
+                for label_values, value in values:
+                    label_values = tuple(label_values)
+                    current = merged[name].get(label_values)
+                    if current is None:
+                        merged[name][label_values] = value
+                    elif isinstance(value, list):
+                        merged[name][label_values] = [
+                            a + b for a, b in zip(current, value)]
+                    else:
+                        merged[name][label_values] = current + value
+        return merged
+
+    def exposition(self):
+        """Gets every metric in the Prometheus text format: the metrics of every worker with METRICS_DIR set,
+        otherwise the ones of the current process
+
+        Returns:
+            str: The metrics
+        """
+        merged = None
+        if self.directory:
+            self.write_snapshot()
+            merged = self._merge_snapshots()
+        lines = []
+        for metric in self.registry:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples(
+                merged[metric.name] if merged is not None else None))
+        return "\n".join(lines) + "\n"
+
+
+# The metrics of the application
+metrics = Metrics()
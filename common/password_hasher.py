@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+from werkzeug.security import generate_password_hash, check_password_hash
+from exceptions.hashing_busy_error import HashingBusyError
+
+
+@lru_cache(maxsize=None)
+def _stored_method(method):
+    """Private function used to get the method werkzeug stores in the hashes made with a configured method,
+    which carries the default cost when the configured one does not (i.e.: pbkdf2:sha256:150000 for pbkdf2:sha256)
+
+    Args:
+        method (str): The configured hashing method
+
+    Returns:
+        str: The method prefix of the hashes
+    """
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool of worker processes,
+    so that expensive hashes do not hold the request threads and the GIL.
+
+    At most PASSWORD_HASH_MAX_PENDING hashes can be running or queued at the same time:
+    callers that cannot get a slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds get a HashingBusyError.
+    With PASSWORD_HASH_WORKERS set to 0 hashes are computed on the calling thread.
+    """
+
+    def __init__(self):
+        """PasswordHasher constructor."""
+        self.method = "pbkdf2:sha256:150000"
+        self.stored_method = self.method
+        self.workers = 0
+        self.max_pending = 32
+        self.queue_timeout = 0.5
+        self._executor = None
+        self._slots = BoundedSemaphore(self.max_pending)
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """Configures the hasher with the app configuration.
+
+        Args:
+            app: The main app, configured but not started
+        """
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.stored_method = _stored_method(self.method)
+        self.queue_timeout = app.config.get(
+            "PASSWORD_HASH_QUEUE_TIMEOUT", self.queue_timeout)
+        workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        max_pending = app.config.get(
+            "PASSWORD_HASH_MAX_PENDING", self.max_pending)
+        if max_pending != self.max_pending:
+            self.max_pending = max_pending
+            self._slots = BoundedSemaphore(max_pending)
+        if workers != self.workers:
+            self.shutdown()
+            self.workers = workers
+
+    def shutdown(self):
+        """Stops the worker processes, they are started again on the next hash"""
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self):
+        """Private method used to lazily start the worker processes, so that they are not forked
+        together with the server master process
+
+        Returns:
+            ProcessPoolExecutor: The pool of worker processes
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._executor
+
+    def warm_up(self):
+        """Starts every worker process ahead of the first hash, hashing once on each of them"""
+        if not self.workers:
+            return
+        executor = self._get_executor()
+        futures = [executor.submit(generate_password_hash, "warm-up", self.method)
+                   for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def _run(self, fn, *args):
+        """Private method used to run a hashing function within the pending hashes bound
+
+        Args:
+            fn (callable): The hashing function
+            args: The hashing function arguments
+
+        Raises:
+            HashingBusyError: If there are already too many pending hashes
+
+        Returns:
+            any: The hashing function result
+        """
+        # released on the semaphore it was acquired on, even if init_app replaces it meanwhile
+        slots = self._slots
+        if not slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusyError()
+        try:
+            if not self.workers:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        """Hashes a password with the configured method and cost.
+
+        Args:
+            password (str): The plain text password
+
+        Raises:
+            HashingBusyError: If there are already too many pending hashes
+
+        Returns:
+            str: The salted password hash
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Checks a password against a stored hash.
+
+        Args:
+            password_hash (str): The stored password hash
+            password (str): The plain text password
+
+        Raises:
+            HashingBusyError: If there are already too many pending hashes
+
+        Returns:
+            bool: True if the password matches
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Checks if a stored hash was computed with a method or a cost other than the configured ones.
+
+        Args:
+            password_hash (str): The stored password hash
+
+        Returns:
+            bool: True if the password should be hashed again
+        """
+        return password_hash.split("$", 1)[0] != self.stored_method
+
+
+hasher = PasswordHasher()
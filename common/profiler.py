@@ -0,0 +1,179 @@
+from cProfile import Profile
+from os import listdir, makedirs, path, remove
+from threading import local
+from urllib.parse import quote, unquote
+from flask import request
+from flask_jwt_extended import get_jwt_claims
+import random
+import time
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_EXTENSION = ".pstats"
+
+
+def profile_name(started_at, method, route, duration):
+    """Gets the file name of a profile, tagged with the request route and duration
+
+    Args:
+        started_at (float): The unix timestamp of the request
+        method (str): The request method
+        route (str): The request route (i.e.: /activity/<int:id>)
+        duration (float): The seconds the request took
+
+    Returns:
+        str: The file name
+    """
+    # the route is percent-encoded with ~ in place of %, which would be decoded in the download url
+    route = quote(route, safe="").replace("%", "~")
+    return f"{int(started_at * 1000)}_{method}_{route}_{round(duration * 1000)}ms{PROFILE_EXTENSION}"
+
+
+def parse_profile_name(name):
+    """Parses the file name of a profile
+
+    Args:
+        name (str): The file name
+
+    Returns:
+        dict of (str, any): The profile name, creation timestamp, request method, route and duration in milliseconds,
+        or None if the name is not the one of a profile
+    """
+    if not name.endswith(PROFILE_EXTENSION):
+        return None
+    # the quoted route can contain underscores, the other parts cannot
+    parts = name[:-len(PROFILE_EXTENSION)].split("_", 2)
+    if len(parts) != 3 or "_" not in parts[2]:
+        return None
+    started_at, method, rest = parts
+    route, duration = rest.rsplit("_", 1)
+    if not started_at.isdigit() or not duration.endswith("ms") or not duration[:-2].isdigit():
+        return None
+    return {"name": name, "created_at": int(started_at) / 1000, "method": method,
+            "route": unquote(route.replace("~", "%")), "duration_milliseconds": int(duration[:-2])}
+
+
+class RequestProfiler:
+    """Runs requests under cProfile when PROFILING_ENABLED is set: the requests of admins carrying an X-Profile header
+    and a PROFILING_SAMPLE_RATE fraction of every request. Each profile is saved in PROFILING_DIR as a .pstats file
+    named after the request route and duration, which is returned in the X-Profile response header.
+    Only the most recent PROFILING_MAX_FILES profiles are kept.
+    """
+    # Sub-requests of a batch run on the thread and in the app context of their batch, which may be already profiled
+    _active = local()
+
+    def __init__(self, directory="profiles", sample_rate=0, max_files=50):
+        """RequestProfiler constructor.
+
+        Args:
+            directory (str, optional): The folder the profiles are saved to. Defaults to "profiles".
+            sample_rate (float, optional): The fraction of requests profiled without the header. Defaults to 0.
+            max_files (int, optional): The maximum number of profiles kept. Defaults to 50.
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a profiler from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            RequestProfiler: The configured profiler
+        """
+        return cls(config.get("PROFILING_DIR", "profiles"), config.get("PROFILING_SAMPLE_RATE", 0),
+                   config.get("PROFILING_MAX_FILES", 50))
+
+    def init_app(self, app):
+        """Registers the profiler in the app extensions and its request hooks, if profiling is enabled
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.config.setdefault("PROFILING_ENABLED", False)
+        if not app.config["PROFILING_ENABLED"]:
+            return
+        app.extensions["request_profiler"] = self
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def _requested_by_admin():
+        """Private method used to check whether an admin asked to profile the current request
+
+        Returns:
+            bool: Whether the request carries the header and the access token of an admin
+        """
+        if PROFILE_HEADER not in request.headers:
+            return False
+        from jwt_utils import verify_jwt_in_request_cached
+        try:
+            verify_jwt_in_request_cached()
+            return get_jwt_claims().get("role") == "admin"
+        except Exception:
+            # the resource reports the invalid tokens
+            return False
+
+    def _start_request(self):
+        if getattr(self._active, "request", None) is not None:
+            return
+        if not (self._requested_by_admin() or random.random() < self.sample_rate):
+            return
+        self._active.request = request._get_current_object()
+        self._active.started_at = time.time()
+        self._active.profile = Profile()
+        self._active.profile.enable()
+
+    def _stop(self):
+        """Private method used to stop profiling the current request
+
+        Returns:
+            Profile: The profile, or None if the current request is not profiled by this thread
+        """
+        if getattr(self._active, "request", None) is not request._get_current_object():
+            return None
+        profile = self._active.profile
+        profile.disable()
+        self._active.request = self._active.profile = None
+        return profile
+
+    def _end_request(self, response):
+        profile = self._stop()
+        if profile is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else request.path
+        started_at = self._active.started_at
+        name = profile_name(started_at, request.method,
+                            route, time.time() - started_at)
+        makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(path.join(self.directory, name))
+        self._prune()
+        response.headers[PROFILE_HEADER] = name
+        return response
+
+    def _teardown_request(self, error=None):
+        self._stop()
+
+    def profiles(self):
+        """Gets the saved profiles, most recent first
+
+        Returns:
+            list of (dict of (str, any)): The profiles, as parsed by parse_profile_name
+        """
+        if not path.isdir(self.directory):
+            return []
+        profiles = [parse_profile_name(name) for name in listdir(self.directory)]
+        return sorted((profile for profile in profiles if profile is not None),
+                      key=lambda profile: profile["created_at"], reverse=True)
+
+    def _prune(self):
+        """Private method used to remove the oldest profiles beyond max_files"""
+        for profile in self.profiles()[self.max_files:]:
+            try:
+                remove(path.join(self.directory, profile["name"]))
+            except OSError:
+                # another worker has already removed it
+                pass
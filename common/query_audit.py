@@ -0,0 +1,230 @@
+from collections import Counter
+from os import path
+from threading import local
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import re
+import sys
+
+# Statements issued from these folders are attributed to their call sites
+_ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+_ATTRIBUTED_FOLDERS = tuple(path.join(_ROOT, folder) + path.sep
+                            for folder in ("models", "resources"))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+# The WSGI environ key of the audit of a request, not kept in g, which the sub-requests of a batch share with it
+_AUDIT_ENVIRON_KEY = "query_audit.audit"
+
+
+def fingerprint(statement):
+    """Normalizes a SQL statement so that statements differing only by their values are equal
+
+    Args:
+        statement (str): The SQL statement
+
+    Returns:
+        str: The fingerprint of the statement
+    """
+    statement = _LITERALS.sub("?", statement)
+    statement = re.sub(r"%\(\w+\)s|:\w+|%s", "?", statement)
+    statement = _LISTS.sub("(?...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+def call_sites():
+    """Gets the frames of models and resources that lead to the current call, innermost first
+
+    Returns:
+        tuple of (str): The call sites, as relative path, line number and function name
+    """
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_ATTRIBUTED_FOLDERS):
+            sites.append(
+                f"{path.relpath(filename, _ROOT)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return tuple(sites)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when the statements run within a QueryAudit exceed its budget"""
+
+
+class QueryAudit:
+    """Records the SQL statements run by the current thread while it is active, by fingerprint and call site.
+
+    It can be used as a context manager, i.e. in tests, to enforce a query budget:
+
+        with QueryAudit(max_queries=5, max_repeats=1):
+            client.get("/activities")
+    """
+    _active = local()
+
+    def __init__(self, max_queries=None, max_repeats=None):
+        """QueryAudit constructor.
+
+        Args:
+            max_queries (int, optional): The maximum number of statements. Defaults to None, that is unlimited.
+            max_repeats (int, optional): The maximum number of statements with the same fingerprint. Defaults to None, that is unlimited.
+        """
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.counts = Counter()
+        self.sites = {}
+
+    @classmethod
+    def _audits(cls):
+        """Private method used to get the audits active on the current thread
+
+        Returns:
+            list of (QueryAudit): The active audits
+        """
+        audits = getattr(cls._active, "audits", None)
+        if audits is None:
+            audits = cls._active.audits = []
+        return audits
+
+    def start(self):
+        """Starts recording the statements of the current thread"""
+        _hook_engines()
+        self._audits().append(self)
+
+    def stop(self):
+        """Stops recording the statements of the current thread"""
+        audits = self._audits()
+        if self in audits:
+            audits.remove(self)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        if exc_type is None:
+            self.check()
+
+    def record(self, statement):
+        """Records a statement
+
+        Args:
+            statement (str): The SQL statement
+        """
+        key = fingerprint(statement)
+        self.counts[key] += 1
+        if key not in self.sites or self.counts[key] == 2:
+            # the call sites of the first repetition are the ones worth reporting
+            self.sites[key] = call_sites()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def repeated(self, threshold=2):
+        """Gets the fingerprints run at least threshold times, most repeated first
+
+        Args:
+            threshold (int, optional): The minimum number of runs. Defaults to 2.
+
+        Returns:
+            list of (str, int, tuple of (str)): The fingerprint, its number of runs and its call sites
+        """
+        return [(key, count, self.sites[key]) for key, count in self.counts.most_common() if count >= threshold]
+
+    def report(self, threshold=2):
+        """Describes the repeated statements
+
+        Args:
+            threshold (int, optional): The minimum number of runs of a reported statement. Defaults to 2.
+
+        Returns:
+            str: The report, empty if no statement has been repeated
+        """
+        lines = []
+        for key, count, sites in self.repeated(threshold):
+            lines.append(f"{count}x {key}")
+            lines.extend(f"    at {site}" for site in sites)
+        return "\n".join(lines)
+
+    def check(self):
+        """Checks that the recorded statements are within the budget
+
+        Raises:
+            QueryBudgetExceeded: If there are too many statements or too many repetitions of the same one
+        """
+        if self.max_queries is not None and self.total > self.max_queries:
+            raise QueryBudgetExceeded(
+                f"{self.total} statements run, the budget is {self.max_queries}\n{self.report()}")
+        if self.max_repeats is not None and self.repeated(self.max_repeats + 1):
+            raise QueryBudgetExceeded(
+                f"Statements repeated more than {self.max_repeats} times\n{self.report(self.max_repeats + 1)}")
+
+
+_hooked = False
+
+
+def _hook_engines():
+    """Private function used to listen to the statements of every engine, once"""
+    global _hooked
+    if not _hooked:
+        event.listen(Engine, "before_cursor_execute", _record_statement)
+        _hooked = True
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for audit in QueryAudit._audits():
+        audit.record(statement)
+
+
+class QueryAuditor:
+    """Audits the statements of the requests when QUERY_AUDIT_ENABLED is set or, if QUERY_AUDIT_HEADER_ENABLED is set,
+    when the request has an X-Query-Audit header. Statements repeated at least QUERY_AUDIT_THRESHOLD times
+    in a request, the typical N+1 pattern, are logged as warnings together with the models and resources
+    call sites that issued them. Audited responses get an X-Query-Audit header with the statement counts.
+    """
+
+    def init_app(self, app):
+        """Registers the request hooks on the app
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.config.setdefault("QUERY_AUDIT_ENABLED", False)
+        app.config.setdefault("QUERY_AUDIT_HEADER_ENABLED", False)
+        app.config.setdefault("QUERY_AUDIT_THRESHOLD", 5)
+        if app.config["QUERY_AUDIT_ENABLED"] or app.config["QUERY_AUDIT_HEADER_ENABLED"]:
+            app.before_request(self._start_request)
+            app.after_request(self._end_request)
+            app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def _start_request():
+        config = current_app.config
+        if config["QUERY_AUDIT_ENABLED"] or "X-Query-Audit" in request.headers:
+            audit = request.environ[_AUDIT_ENVIRON_KEY] = QueryAudit()
+            audit.start()
+
+    @staticmethod
+    def _end_request(response):
+        audit = request.environ.pop(_AUDIT_ENVIRON_KEY, None)
+        if audit is None:
+            return response
+        audit.stop()
+        threshold = current_app.config["QUERY_AUDIT_THRESHOLD"]
+        repeated = audit.repeated(threshold)
+        if repeated:
+            current_app.logger.warning("Repeated statements in %s %s:\n%s",
+                                       request.method, request.path, audit.report(threshold))
+        response.headers["X-Query-Audit"] = f"queries={audit.total}; repeated={len(repeated)}"
+        return response
+
+    @staticmethod
+    def _teardown_request(error=None):
+        audit = request.environ.pop(_AUDIT_ENVIRON_KEY, None)
+        if audit is not None:
+            audit.stop()
@@ -0,0 +1,130 @@
+from threading import BoundedSemaphore, Lock
+import time
+
+
+class TokenBucketLimiter:
+    """A set of token buckets, one per key. Every attempt consumes a token and
+    every bucket refills at a constant rate up to its capacity.
+    """
+
+    def __init__(self, capacity, refill_rate, max_keys=10000):
+        """TokenBucketLimiter constructor.
+
+        Args:
+            capacity (int): The maximum number of tokens of a bucket, i.e. the allowed burst
+            refill_rate (float): The number of tokens added to a bucket every second
+            max_keys (int, optional): The maximum number of tracked keys. Defaults to 10000.
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = Lock()
+
+    def consume(self, key, now=None):
+        """Consumes a token from the bucket of the given key.
+
+        Args:
+            key (str): The key of the bucket
+            now (float, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            float: 0 if the token has been consumed, otherwise the seconds to wait for the next token
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens +
+                         (now - updated_at) * self.refill_rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.refill_rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        """Private method used to forget the buckets that are full again, or the oldest ones if every bucket is in use
+
+        Args:
+            now (float): The current monotonic time
+        """
+        full_after = self.capacity / self.refill_rate
+        for key, (_, updated_at) in list(self._buckets.items()):
+            if now - updated_at >= full_after:
+                del self._buckets[key]
+        if len(self._buckets) > self.max_keys:
+            oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])
+            for key, _ in oldest[:len(self._buckets) - self.max_keys]:
+                del self._buckets[key]
+
+
+class LoginThrottle:
+    """Admission control for the login endpoint: a token bucket per username and per client address,
+    and a cap on the number of password verifications in flight.
+    The buckets are kept in the memory of the worker process, so the limits apply to every worker separately.
+    """
+
+    def __init__(self, username_burst=10, username_rate=0.2, address_burst=60, address_rate=2, max_concurrent=8):
+        """LoginThrottle constructor.
+
+        Args:
+            username_burst (int, optional): Login attempts allowed in a burst for the same username. Defaults to 10.
+            username_rate (float, optional): Login attempts per second allowed for the same username. Defaults to 0.2.
+            address_burst (int, optional): Login attempts allowed in a burst from the same address. Defaults to 60.
+            address_rate (float, optional): Login attempts per second allowed from the same address. Defaults to 2.
+            max_concurrent (int, optional): Maximum number of logins in flight. Defaults to 8.
+        """
+        self.usernames = TokenBucketLimiter(username_burst, username_rate)
+        self.addresses = TokenBucketLimiter(address_burst, address_rate)
+        self._slots = BoundedSemaphore(max_concurrent)
+
+    def init_app(self, app):
+        """Binds the throttle to the app
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["login_throttle"] = self
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a LoginThrottle from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            LoginThrottle: The login throttle
+        """
+        return cls(config.get("LOGIN_USERNAME_BURST", 10), config.get("LOGIN_USERNAME_RATE", 0.2),
+                   config.get("LOGIN_ADDRESS_BURST", 60), config.get(
+                       "LOGIN_ADDRESS_RATE", 2),
+                   config.get("LOGIN_MAX_CONCURRENT", 8))
+
+    def check(self, username, address):
+        """Consumes a login attempt for the address and, if the address is not throttled, for the username,
+        so that a throttled client cannot lock the username out for everyone else.
+
+        Args:
+            username (str): The username that is trying to log in
+            address (str): The client address
+
+        Returns:
+            float: 0 if the attempt is allowed, otherwise the seconds to wait before the next attempt
+        """
+        return self.addresses.consume(address) or self.usernames.consume(username)
+
+    def acquire(self):
+        """Takes a slot for a password verification without waiting.
+
+        Returns:
+            bool: True if the slot has been taken, False if there are already too many logins in flight
+        """
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        """Gives back a slot taken by acquire"""
+        self._slots.release()
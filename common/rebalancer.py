@@ -0,0 +1,187 @@
+from common.agenda import calculate_agenda
+from config import MAINTAINER_WORK_HOURS, MAINTAINER_WORK_START_HOUR
+from exceptions.invalid_agenda_error import InvalidAgendaError
+
+WEEK_DAYS = ("monday", "tuesday", "wednesday",
+             "thursday", "friday", "saturday", "sunday")
+
+
+class WeekState:
+    """The in-memory agendas of the maintainers in a week: the activities assigned to every maintainer's day
+    and the minutes they take, which is the day's load"""
+
+    def __init__(self, maintainers, activities, work_start_hour=MAINTAINER_WORK_START_HOUR,
+                 work_hours=MAINTAINER_WORK_HOURS):
+        """WeekState constructor. The activities of users that are not among the maintainers are left out.
+
+        Args:
+            maintainers (list of (str)): The usernames of the maintainers
+            activities (iterable of (int, str, str, int, int)): The identifier, maintainer username, week day,
+                start time and estimated time of every assigned activity of the week
+            work_start_hour (int, optional): The first work hour. Defaults to MAINTAINER_WORK_START_HOUR.
+            work_hours (int, optional): The number of work hours. Defaults to MAINTAINER_WORK_HOURS.
+        """
+        self.work_start_hour = work_start_hour
+        self.work_hours = work_hours
+        self.days = {(maintainer, week_day): {}
+                     for maintainer in maintainers for week_day in WEEK_DAYS}
+        self.loads = dict.fromkeys(self.days, 0)
+        self.slots = {}
+        self.estimated_times = {}
+        for activity_id, maintainer, week_day, start_time, estimated_time in activities:
+            day = (maintainer, week_day)
+            if day not in self.days:
+                continue
+            self.days[day][activity_id] = start_time
+            self.loads[day] += estimated_time
+            self.slots[activity_id] = (maintainer, week_day, start_time)
+            self.estimated_times[activity_id] = estimated_time
+        self.initial_slots = dict(self.slots)
+
+    def variance(self):
+        """Calculates the variance of the daily loads
+
+        Returns:
+            float: The variance, in squared minutes
+        """
+        if not self.loads:
+            return 0.0
+        mean = sum(self.loads.values()) / len(self.loads)
+        return sum((load - mean) ** 2 for load in self.loads.values()) / len(self.loads)
+
+    def find_start_time(self, activity_id, day):
+        """Finds a start time for an activity in a day of another agenda, keeping the day's agenda valid.
+        The activity's current start time is tried first, then the hours with the most free minutes.
+
+        Args:
+            activity_id (int): The identifier of the activity
+            day ((str, str)): The maintainer username and week day
+
+        Returns:
+            int: The start time, None if the activity does not fit in the day
+        """
+        activities = [(start_time, self.estimated_times[id])
+                      for id, start_time in self.days[day].items()]
+        try:
+            agenda = calculate_agenda(
+                activities, self.work_start_hour, self.work_hours)
+        except InvalidAgendaError:
+            return None
+        current = self.slots[activity_id][2]
+        candidates = sorted(agenda, key=lambda hour: (
+            hour != current, -agenda[hour], hour))
+        activities.append(None)
+        for start_time in candidates:
+            activities[-1] = (start_time, self.estimated_times[activity_id])
+            try:
+                calculate_agenda(activities, self.work_start_hour,
+                                 self.work_hours)
+                return start_time
+            except InvalidAgendaError:
+                continue
+        return None
+
+    def move(self, activity_id, day, start_time):
+        """Moves an activity to a day of another agenda
+
+        Args:
+            activity_id (int): The identifier of the activity
+            day ((str, str)): The maintainer username and week day
+            start_time (int): The start time
+        """
+        maintainer, week_day, _ = self.slots[activity_id]
+        estimated_time = self.estimated_times[activity_id]
+        del self.days[(maintainer, week_day)][activity_id]
+        self.loads[(maintainer, week_day)] -= estimated_time
+        self.days[day][activity_id] = start_time
+        self.loads[day] += estimated_time
+        self.slots[activity_id] = (day[0], day[1], start_time)
+
+    def best_move(self, tolerance=0):
+        """Finds the move reducing the load variance the most. Moving t minutes from a day loaded la minutes to one
+        loaded lb minutes reduces the sum of the squared loads by 2t(la - lb - t), so the most loaded days are
+        searched first, each against the least loaded ones.
+
+        Args:
+            tolerance (int, optional): The minutes of difference between two loads not worth a move: the source day
+                must stay at least this much busier than the destination was. Defaults to 0.
+
+        Returns:
+            (int, (str, str), int): The identifier of the activity, its new day and start time, None if no move
+            reduces the variance
+        """
+        order = sorted(self.loads, key=self.loads.get)
+        if not order:
+            return None
+        lowest = self.loads[order[0]]
+        min_gap = max(tolerance, 1)
+        best, best_gain = None, 0
+        for source in reversed(order):
+            la = self.loads[source]
+            # no move out of this day can gain more than halving its gap with the least loaded day
+            if (la - lowest) ** 2 / 2 <= best_gain:
+                break
+            for activity_id in self.days[source]:
+                t = self.estimated_times[activity_id]
+                for target in order:
+                    lb = self.loads[target]
+                    gain = 2 * t * (la - lb - t)
+                    if la - lb - t < min_gap or gain <= best_gain:
+                        break
+                    start_time = self.find_start_time(activity_id, target)
+                    if start_time is not None:
+                        best, best_gain = (
+                            activity_id, target, start_time), gain
+                        break
+        return best
+
+    def diff(self):
+        """Gets the activities whose slot changed since the state was loaded
+
+        Returns:
+            list of (dict of (str, any)): The activity identifier, estimated time and slots before and after
+            the moves, by activity identifier
+        """
+        moves = []
+        for activity_id in sorted(self.slots):
+            before, after = self.initial_slots[activity_id], self.slots[activity_id]
+            if before == after:
+                continue
+            moves.append({
+                "activity_id": activity_id,
+                "estimated_time": self.estimated_times[activity_id],
+                "from": dict(zip(("maintainer_username", "week_day", "start_time"), before)),
+                "to": dict(zip(("maintainer_username", "week_day", "start_time"), after)),
+            })
+        return moves
+
+
+def rebalance(state, max_moves=None, tolerance=30, on_move=None):
+    """Moves the assigned activities between the maintainers and days of a week to minimize the variance of the
+    daily loads, by steepest descent: every move is the one reducing the variance the most, until none does
+    or max_moves is reached. Every day stays within the agenda rules.
+
+    Args:
+        state (WeekState): The week, changed in place
+        max_moves (int, optional): The maximum number of moves. Defaults to None, no limit.
+        tolerance (int, optional): The minutes of difference between two loads not worth a move. Defaults to 30.
+        on_move (callable, optional): Function called with the number of moves after every move. Defaults to None.
+
+    Returns:
+        dict of (str, any): The diff of the activity slots, with the variance of the daily loads before and after
+    """
+    variance_before = state.variance()
+    moves = 0
+    while max_moves is None or moves < max_moves:
+        move = state.best_move(tolerance)
+        if move is None:
+            break
+        state.move(*move)
+        moves += 1
+        if on_move:
+            on_move(moves)
+    return {
+        "moves": state.diff(),
+        "variance_before": round(variance_before, 2),
+        "variance_after": round(state.variance(), 2),
+    }
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app, has_app_context
+from models.version import VersionModel
+import time
+
+
+class _Entry:
+    """Private cached response, together with the versions of the data it was built from"""
+    __slots__ = ("data", "versions", "stored_at", "revalidating")
+
+    def __init__(self, data, versions, stored_at):
+        self.data = data
+        self.versions = versions
+        self.stored_at = stored_at
+        self.revalidating = False
+
+
+class ResponseCache:
+    """A bounded LRU cache of read responses, keyed by the request fingerprint.
+
+    Every entry is tagged with the keys of the versioned data (see VersionModel) it depends on, i.e.: a week,
+    an activity or an user. An entry is fresh as long as those versions are unchanged, so writes made by any
+    worker are seen at the next read. Writes committed by this worker also purge the entries of their tags
+    right away. Within RESPONSE_CACHE_STALE_TTL seconds from its creation an outdated entry can still be
+    served while it is rebuilt in background.
+    """
+
+    def __init__(self, max_size=2048, ttl=300, stale_ttl=0):
+        """ResponseCache constructor.
+
+        Args:
+            max_size (int, optional): The maximum number of cached responses, 0 disables the cache. Defaults to 2048.
+            ttl (float, optional): The seconds after which an entry is dropped even if it is fresh. Defaults to 300.
+            stale_ttl (float, optional): The seconds from creation during which an outdated entry can be served. Defaults to 0.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.purged = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a cache from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            ResponseCache: The configured cache
+        """
+        return cls(config.get("RESPONSE_CACHE_SIZE", 2048), config.get("RESPONSE_CACHE_TTL", 300),
+                   config.get("RESPONSE_CACHE_STALE_TTL", 0))
+
+    def init_app(self, app):
+        """Registers the cache in the app extensions
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["response_cache"] = self
+        VersionModel.on_commit(_purge_current_app_cache)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key, versions, now=None):
+        """Finds the cached response for a request.
+
+        Args:
+            key (str): The request fingerprint
+            versions (dict of (str, int)): The current versions of the data the response depends on
+            now (float, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            (_Entry, bool): The entry and whether it is fresh, or (None, False) if there is no usable entry
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.stored_at >= self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, False
+            if entry.versions == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, True
+            if now - entry.stored_at < self.stale_ttl:
+                self.stale_hits += 1
+                return entry, False
+            self._remove(key)
+            self.misses += 1
+            return None, False
+
+    def put(self, key, data, versions, now=None):
+        """Caches a response, evicting the least recently used one when the cache is full.
+
+        Args:
+            key (str): The request fingerprint
+            data (any): The response data
+            versions (dict of (str, int)): The versions of the data the response has been built from
+            now (float, optional): The current monotonic time. Defaults to time.monotonic().
+        """
+        if not self.enabled:
+            return
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(data, versions, now)
+            for tag in versions:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def start_revalidation(self, entry):
+        """Marks an outdated entry as being rebuilt, so that a single request rebuilds it
+
+        Args:
+            entry (_Entry): The outdated entry
+
+        Returns:
+            bool: True if the caller has to rebuild the entry
+        """
+        with self._lock:
+            if entry.revalidating:
+                return False
+            entry.revalidating = True
+            return True
+
+    def purge(self, tags):
+        """Removes every response tagged with some of the given tags
+
+        Args:
+            tags (iterable of (str)): The keys of the changed data
+
+        Returns:
+            int: The number of removed responses
+        """
+        if self.stale_ttl > 0:
+            # Outdated entries are kept to be served while they are rebuilt
+            return 0
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.purged += len(keys)
+            return len(keys)
+
+    def _remove(self, key):
+        """Private method used to remove an entry and its tags, with the lock held
+
+        Args:
+            key (str): The request fingerprint
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.versions:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def status(self):
+        """Public representation of the cache state.
+
+        Returns:
+            dict of (str, any): The cache size and hit ratio
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "purged": self.purged,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+        }
+
+
+def _purge_current_app_cache(keys):
+    """Private function used to purge the responses depending on the data changed by a committed transaction
+
+    Args:
+        keys (set of (str)): The bumped version keys
+    """
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get("response_cache")
+    if cache is not None:
+        cache.purge(keys)
@@ -0,0 +1,158 @@
+from flask import request
+from flask_restful import abort
+from inspect import Parameter, signature
+
+_friendly_location = {
+    "json": "the JSON body",
+    "form": "the post body",
+    "args": "the query string",
+    "values": "the post body or the query string",
+    "headers": "the HTTP headers",
+    "cookies": "the request's cookies",
+    "files": "an uploaded file",
+}
+
+
+def _compile_converter(type_, name):
+    """Private function used to bind once the call that flask_restful's reqparse figures out on every value,
+    by trying type(value, name, operator), then type(value, name) and finally type(value).
+    Builtin types are called with the value only, any other callable with as many of
+    (value, name, operator) as its required positional parameters.
+
+    Args:
+        type_ (callable): The type of the field
+        name (str): The name of the field
+
+    Returns:
+        callable: A function that converts a single value
+    """
+    if isinstance(type_, type) and type_.__module__ == "builtins":
+        return type_
+    try:
+        parameters = signature(type_).parameters.values()
+    except (TypeError, ValueError):
+        return type_
+    if any(parameter.kind == Parameter.VAR_POSITIONAL for parameter in parameters):
+        return lambda value: type_(value, name, "=")
+    required = sum(1 for parameter in parameters
+                   if parameter.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+                   and parameter.default is Parameter.empty)
+    if required >= 3:
+        return lambda value: type_(value, name, "=")
+    if required == 2:
+        return lambda value: type_(value, name)
+    return type_
+
+
+class Field:
+    """A request argument, declared like a reqparse argument."""
+
+    def __init__(self, name, type=str, required=False, default=None, help=None, location=("json", "values")):
+        """Field constructor.
+
+        Args:
+            name (str): The name of the argument
+            type (callable, optional): The function used to convert the raw value. Defaults to str.
+            required (bool, optional): Whether the argument must be in the request. Defaults to False.
+            default (any, optional): The value used when the argument is missing, called if callable. Defaults to None.
+            help (str, optional): The error message, that can contain the "{error_msg}" token. Defaults to the conversion error.
+            location (str or tuple of (str), optional): The request attributes to read. Defaults to ("json", "values").
+        """
+        self.name = name
+        self.type = type
+        self.required = required
+        self.default = default
+        self.help = help
+        self.location = location
+        self.locations = (location,) if isinstance(
+            location, str) else tuple(location)
+        self.convert = _compile_converter(type, name)
+        self.missing_message = "Missing required parameter in {}".format(
+            " or ".join(_friendly_location.get(location, location) for location in self.locations))
+
+    def error(self, error):
+        """Aborts the request with the same 400 response that reqparse gives for this argument
+
+        Args:
+            error (Exception or str): The conversion error
+
+        Raises:
+            HTTPException: Always
+        """
+        error_msg = str(error)
+        abort(400, message={self.name: self.help.format(
+            error_msg=error_msg) if self.help else error_msg})
+
+
+class Schema:
+    """A set of request arguments compiled once, when the resource is defined, into a single pass parser.
+    It is a drop-in replacement for reqparse.RequestParser: messages and results are the same, but the request
+    locations are read once per parse instead of once per argument and no converter call has to be guessed.
+    """
+
+    def __init__(self, *fields):
+        """Schema constructor.
+
+        Args:
+            fields (tuple of (Field)): The arguments of the schema
+        """
+        self.fields = fields
+        self.locations = tuple(dict.fromkeys(
+            location for field in fields for location in field.locations))
+        self._plan = tuple((field, field.name, field.locations, isinstance(field.location, str), field.convert)
+                           for field in fields)
+
+    def _sources(self):
+        """Private method used to read the request locations needed by the schema
+
+        Returns:
+            dict of (str, any): The content of every location, None if missing
+        """
+        sources = {}
+        for location in self.locations:
+            value = getattr(request, location, None)
+            sources[location] = value() if callable(value) else value
+        return sources
+
+    def parse_args(self):
+        """Parses the arguments of the current request.
+
+        Raises:
+            HTTPException: 400 if an argument is missing or cannot be converted
+
+        Returns:
+            dict of (str, any): The converted arguments, with their default value if missing
+        """
+        sources = self._sources()
+        data = {}
+        for field, name, locations, single_location, convert in self._plan:
+            values = []
+            for location in locations:
+                source = sources[location]
+                if source is None or name not in source:
+                    continue
+                if hasattr(source, "getlist"):
+                    values.extend(source.getlist(name))
+                elif not single_location and isinstance(source[name], (list, tuple)):
+                    values.extend(source[name])
+                else:
+                    values.append(source[name])
+
+            if not values:
+                if field.required:
+                    field.error(field.missing_message)
+                default = field.default
+                data[name] = default() if callable(default) else default
+                continue
+
+            results = []
+            for value in values:
+                if value is None:
+                    results.append(None)
+                    continue
+                try:
+                    results.append(convert(value))
+                except Exception as e:
+                    field.error(e)
+            data[name] = results[0]
+        return data
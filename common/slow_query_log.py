@@ -0,0 +1,292 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from common.json_representation import dumps
+from common.log_file import file_logger
+from common.query_audit import call_sites, fingerprint
+import os
+import re
+import time
+
+_EXPLAINABLE = ("SELECT", "WITH")
+_MAX_PARAMETER_LENGTH = 200
+_REDACTED = "<redacted>"
+# The tables whose statements carry password hashes and token ids
+_SENSITIVE_TABLES = re.compile(r"\b(users|revoked_tokens)\b", re.IGNORECASE)
+
+
+def _format_parameters(statement, parameters):
+    """Private function used to make the parameters of a statement loggable, truncating the long ones.
+    The parameters of the writes and of the statements on the users and revoked tokens tables are redacted.
+
+    Args:
+        statement (str): The SQL statement
+        parameters (tuple or dict): The DBAPI parameters
+
+    Returns:
+        list or dict of (str, str): The parameters representations
+    """
+    redact = not statement.lstrip().upper().startswith(
+        _EXPLAINABLE) or _SENSITIVE_TABLES.search(statement)
+
+    def shorten(value):
+        if redact:
+            return _REDACTED
+        text = repr(value)
+        return text if len(text) <= _MAX_PARAMETER_LENGTH else text[:_MAX_PARAMETER_LENGTH] + "..."
+    if isinstance(parameters, dict):
+        return {key: shorten(value) for key, value in parameters.items()}
+    return [shorten(value) for value in parameters or ()]
+
+
+class _Offender:
+    """Private aggregate of the slow runs of the statements sharing a fingerprint"""
+    __slots__ = ("fingerprint", "count", "total", "max", "last")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def json(self):
+        return {"fingerprint": self.fingerprint, "count": self.count, "total_seconds": self.total,
+                "max_seconds": self.max, "last": self.last}
+
+
+class SlowQueryLog:
+    """Records the SQL statements that take at least SLOW_QUERY_THRESHOLD seconds, with their parameters,
+    the model method and the request route that issued them and the plan the database chose for them.
+
+    The plan is captured by a background thread, on a connection of its own, so that the request neither waits for it
+    nor sees its transaction aborted by a failing EXPLAIN: with EXPLAIN QUERY PLAN on sqlite and EXPLAIN on the
+    other databases; when SLOW_QUERY_EXPLAIN_ANALYZE is set the latter becomes EXPLAIN ANALYZE, which runs the
+    statement once more. Only SELECT statements are explained, at most max_pending at a time.
+    Every slow statement is appended as a json line to SLOW_QUERY_LOG_PATH once explained, and aggregated by
+    fingerprint in memory, so that the worst offenders of this process can be listed.
+    """
+    # Statements waiting to be explained, over which the plans of the new slow statements are skipped
+    max_pending = 100
+
+    def __init__(self, threshold=0.2, analyze=False, path="", max_bytes=0, backups=5, max_offenders=100):
+        """SlowQueryLog constructor.
+
+        Args:
+            threshold (float, optional): The seconds from which a statement is slow, a negative value disables the log. Defaults to 0.2.
+            analyze (bool, optional): Whether the plans are captured with EXPLAIN ANALYZE. Defaults to False.
+            path (str, optional): The file the slow statements are appended to, empty for none. Defaults to "".
+            max_bytes (int, optional): The size from which the file is rotated, 0 to leave the rotation to an
+                external tool (see common.log_file.file_logger). Defaults to 0.
+            backups (int, optional): The number of rotated files kept. Defaults to 5.
+            max_offenders (int, optional): The maximum number of fingerprints aggregated in memory. Defaults to 100.
+        """
+        self.threshold = threshold
+        self.analyze = analyze
+        self.max_offenders = max_offenders
+        self._offenders = {}
+        self._lock = Lock()
+        self._pending = 0
+        self._explainer = None
+        self._explainer_pid = None
+        self._logger = file_logger(path, max_bytes, backups) if path else None
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a slow query log from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            SlowQueryLog: The configured log
+        """
+        return cls(config.get("SLOW_QUERY_THRESHOLD", 0.2), config.get("SLOW_QUERY_EXPLAIN_ANALYZE", False),
+                   config.get("SLOW_QUERY_LOG_PATH", ""), config.get(
+                       "SLOW_QUERY_LOG_MAX_BYTES", 0),
+                   config.get("SLOW_QUERY_LOG_BACKUPS", 5), config.get("SLOW_QUERY_MAX_OFFENDERS", 100))
+
+    def init_app(self, app):
+        """Registers the log in the app extensions and the SQL statement hooks on the engines
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.extensions["slow_query_log"] = self
+        _hook_engines()
+
+    @property
+    def enabled(self):
+        return self.threshold >= 0
+
+    def explain(self, engine, statement, parameters):
+        """Gets the plan of a statement, running EXPLAIN on a pooled connection of the engine that ran it,
+        in a transaction of its own
+
+        Args:
+            engine (Engine): The SQLAlchemy engine
+            statement (str): The SQL statement, as sent to the DBAPI
+            parameters (tuple or dict): The DBAPI parameters
+
+        Returns:
+            str: The plan, one line per step, or None if the statement cannot be explained
+        """
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        sqlite = engine.dialect.name == "sqlite"
+        if sqlite:
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            prefix = "EXPLAIN ANALYZE " if self.analyze else "EXPLAIN "
+        try:
+            # rolled back when the connection goes back to the pool
+            with engine.connect() as connection:
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.execute(prefix + statement, parameters)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+        if sqlite:
+            # the rows are (id, parent, notused, detail)
+            return "\n".join(str(row[-1]) for row in rows)
+        return "\n".join(" | ".join(str(value) for value in row) for row in rows)
+
+    def record(self, connection, statement, parameters, duration):
+        """Records a slow statement
+
+        Args:
+            connection: The SQLAlchemy connection that ran the statement
+            statement (str): The SQL statement
+            parameters (tuple or dict): The DBAPI parameters
+            duration (float): The seconds the statement took
+        """
+        sites = call_sites()
+        entry = {
+            "at": time.time(),
+            "duration_seconds": duration,
+            "statement": statement,
+            "parameters": _format_parameters(statement, parameters),
+            "caller": next((site for site in sites if site.startswith("models")), sites[0] if sites else None),
+            "route": f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+            if has_request_context() else None,
+            "plan": None,
+        }
+        key = fingerprint(statement)
+        with self._lock:
+            offender = self._offenders.get(key)
+            if offender is None:
+                if len(self._offenders) >= self.max_offenders:
+                    # the offender with the least total time makes room for the new one
+                    del self._offenders[min(self._offenders.values(),
+                                            key=lambda offender: offender.total).fingerprint]
+                offender = self._offenders[key] = _Offender(key)
+            offender.count += 1
+            offender.total += duration
+            offender.max = max(offender.max, duration)
+            offender.last = entry
+            explain = statement.lstrip().upper().startswith(_EXPLAINABLE)
+            if explain and self._pending >= self.max_pending:
+                entry["plan"] = "EXPLAIN skipped: too many statements waiting to be explained"
+                explain = False
+            if explain:
+                self._pending += 1
+        if explain:
+            self._get_explainer().submit(self._explain, connection.engine,
+                                         statement, parameters, entry)
+        else:
+            self._write(entry)
+
+    def _get_explainer(self):
+        """Private method used to get the thread explaining the statements of the current process
+
+        Returns:
+            ThreadPoolExecutor: The single thread executor
+        """
+        if self._explainer_pid != os.getpid():
+            with self._lock:
+                if self._explainer_pid != os.getpid():
+                    self._explainer = ThreadPoolExecutor(
+                        1, thread_name_prefix="slow-query-explain")
+                    self._explainer_pid = os.getpid()
+        return self._explainer
+
+    def _explain(self, engine, statement, parameters, entry):
+        """Private method used to add the plan to the entry of a slow statement, then write the entry
+
+        Args:
+            engine (Engine): The SQLAlchemy engine that ran the statement
+            statement (str): The SQL statement
+            parameters (tuple or dict): The DBAPI parameters
+            entry (dict of (str, any)): The entry of the slow statement
+        """
+        try:
+            entry["plan"] = self.explain(engine, statement, parameters)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self._write(entry)
+
+    def _write(self, entry):
+        """Private method used to append the entry of a slow statement to the log file
+
+        Args:
+            entry (dict of (str, any)): The entry of the slow statement
+        """
+        if self._logger is not None:
+            self._logger.info(dumps(entry).decode().rstrip("\n"))
+
+    def wait(self):
+        """Waits until the statements recorded so far have been explained"""
+        if self._explainer_pid == os.getpid():
+            self._explainer.submit(lambda: None).result()
+
+    def top(self, limit=10, order="total"):
+        """Gets the worst offenders of this process
+
+        Args:
+            limit (int, optional): The maximum number of offenders. Defaults to 10.
+            order (str, optional): The sort key: total, max or count. Defaults to total.
+
+        Returns:
+            list of (dict of (str, any)): The offenders, worst first, with their last slow run
+        """
+        with self._lock:
+            offenders = sorted(self._offenders.values(),
+                               key=lambda offender: getattr(offender, order), reverse=True)
+            return [offender.json() for offender in offenders[:limit]]
+
+    def clear(self):
+        """Forgets every offender"""
+        with self._lock:
+            self._offenders.clear()
+
+
+_hooked = False
+
+
+def _hook_engines():
+    """Private function used to time the statements of every engine, once"""
+    global _hooked
+    if not _hooked:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _hooked = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["slow_query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("slow_query_started_at", None)
+    if started_at is None or executemany or not has_app_context():
+        return
+    duration = time.perf_counter() - started_at
+    log = current_app.extensions.get("slow_query_log")
+    if log is not None and log.enabled and duration >= log.threshold:
+        log.record(conn, statement, parameters, duration)
@@ -0,0 +1,363 @@
+from contextlib import contextmanager
+from functools import wraps
+from threading import local
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from common.json_representation import dumps
+from common.log_file import file_logger
+import os
+import random
+import time
+
+TRACE_HEADER = "X-Trace-Id"
+# W3C trace context header, whose sampled flag makes a request traced whatever the sample rate
+TRACEPARENT_HEADER = "traceparent"
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_ERROR = 2
+_MAX_STATEMENT_LENGTH = 2000
+_SPAN_ENVIRON_KEY = "tracing.span"
+
+# The open spans of the trace of the current thread, innermost last, and its ended spans
+_active = local()
+
+
+def _attribute(key, value):
+    """Private function used to encode an attribute as OTLP JSON
+
+    Args:
+        key (str): The attribute name
+        value (any): The attribute value
+
+    Returns:
+        dict of (str, any): The OTLP key-value pair
+    """
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    """A timed operation of a trace"""
+
+    def __init__(self, name, trace_id, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        """Span constructor.
+
+        Args:
+            name (str): The operation name (i.e.: UserModel.get_weekly_percentage_availability)
+            trace_id (str): The 32 hex digits identifier of the trace
+            parent_id (str, optional): The identifier of the parent span, None for the root. Defaults to None.
+            kind (int, optional): The OTLP span kind. Defaults to SPAN_KIND_INTERNAL.
+            attributes (dict of (str, any), optional): The span attributes. Defaults to None.
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.error = None
+        self.start = time.time_ns()
+        self.end = None
+
+    def json(self):
+        """Public representation for the Span, in the OTLP JSON encoding.
+
+        Returns:
+            dict of (str, any): The OTLP span
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": STATUS_CODE_ERROR, "message": self.error} if self.error is not None else {},
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def current_span():
+    """Gets the innermost open span of the current thread
+
+    Returns:
+        Span: The span, or None if the current thread is not tracing
+    """
+    spans = getattr(_active, "spans", None)
+    return spans[-1] if spans else None
+
+
+def current_traceparent():
+    """Gets the W3C traceparent header continuing the trace of the current thread in another thread or process
+
+    Returns:
+        str: The header value, or None if the current thread is not tracing
+    """
+    parent = current_span()
+    return f"00-{parent.trace_id}-{parent.span_id}-01" if parent is not None else None
+
+
+def start_span(name, kind=SPAN_KIND_INTERNAL, attributes=None, trace_id=None, parent_id=None):
+    """Opens a span, child of the current one, or the root of a new trace if the current thread is not tracing
+
+    Args:
+        name (str): The operation name
+        kind (int, optional): The OTLP span kind. Defaults to SPAN_KIND_INTERNAL.
+        attributes (dict of (str, any), optional): The span attributes. Defaults to None.
+        trace_id (str, optional): The trace identifier of a new trace, random if None. Defaults to None.
+        parent_id (str, optional): The remote parent of a new trace. Defaults to None.
+
+    Returns:
+        Span: The open span
+    """
+    parent = current_span()
+    if parent is None:
+        _active.spans, _active.ended = [], []
+        span = Span(name, trace_id or os.urandom(16).hex(),
+                    parent_id, kind, attributes)
+    else:
+        span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    _active.spans.append(span)
+    return span
+
+
+def end_span(span, error=None):
+    """Ends a span of the current thread, with the spans still open inside it (i.e.: statements that failed),
+    exporting the whole trace when the root span ends
+
+    Args:
+        span (Span): The span
+        error (str, optional): The error the operation failed with. Defaults to None.
+    """
+    spans = getattr(_active, "spans", None)
+    if not spans or span not in spans:
+        return
+    while True:
+        ended = spans.pop()
+        ended.end = time.time_ns()
+        if ended is span and error is not None:
+            ended.error = error
+        _active.ended.append(ended)
+        if ended is span:
+            break
+    if not spans:
+        trace, _active.ended = _active.ended, []
+        tracer = _active.__dict__.pop("tracer", None)
+        if tracer is not None:
+            tracer.export(trace)
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, attributes=None):
+    """Runs the block in a span, if the current thread is tracing
+
+    Args:
+        name (str): The operation name
+        kind (int, optional): The OTLP span kind. Defaults to SPAN_KIND_INTERNAL.
+        attributes (dict of (str, any), optional): The span attributes. Defaults to None.
+
+    Yields:
+        Span: The open span, or None if the current thread is not tracing
+    """
+    if current_span() is None:
+        yield None
+        return
+    opened = start_span(name, kind, attributes)
+    try:
+        yield opened
+    except Exception as e:
+        end_span(opened, f"{type(e).__name__}: {e}")
+        raise
+    end_span(opened)
+
+
+def traced(name=None):
+    """Runs every call of the decorated function in a span, when the current thread is tracing
+
+    Args:
+        name (str, optional): The span name. Defaults to the qualified name of the function.
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_span() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _parse_traceparent(value):
+    """Private function used to parse a W3C traceparent header
+
+    Args:
+        value (str): The header value (i.e.: 00-<trace id>-<parent id>-01)
+
+    Returns:
+        (str, str, bool): The trace identifier, the parent span identifier and whether the caller samples the trace,
+        or None if the header is malformed
+    """
+    parts = value.strip().lower().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Tracer:
+    """Traces a TRACING_SAMPLE_RATE fraction of the requests when TRACING_ENABLED is set, together with the requests
+    whose W3C traceparent header is sampled: a span for the request, one for every function decorated with traced
+    (i.e.: the resource methods and the agenda computations) and one for every SQL statement.
+    Every trace is appended to TRACING_PATH as a line of OTLP JSON (an ExportTraceServiceRequest), the format of the
+    OpenTelemetry collector file exporter, and its identifier returned in the X-Trace-Id response header.
+    """
+
+    def __init__(self, sample_rate=0.01, path="traces.jsonl", service_name="backend", max_bytes=0,
+                 backups=5):
+        """Tracer constructor.
+
+        Args:
+            sample_rate (float, optional): The fraction of requests traced. Defaults to 0.01.
+            path (str, optional): The file the traces are appended to. Defaults to "traces.jsonl".
+            service_name (str, optional): The service.name resource attribute of the traces. Defaults to "backend".
+            max_bytes (int, optional): The size from which the file is rotated, 0 to leave the rotation to an
+                external tool (see common.log_file.file_logger). Defaults to 0.
+            backups (int, optional): The number of rotated files kept. Defaults to 5.
+        """
+        self.sample_rate = sample_rate
+        self.path = path
+        self.service_name = service_name
+        self._logger = file_logger(path, max_bytes, backups)
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a tracer from the app configuration
+
+        Args:
+            config (dict of (str, any)): The app configuration
+
+        Returns:
+            Tracer: The configured tracer
+        """
+        return cls(config.get("TRACING_SAMPLE_RATE", 0.01), config.get("TRACING_PATH", "traces.jsonl"),
+                   config.get("TRACING_SERVICE_NAME", "backend"), config.get(
+                       "TRACING_MAX_BYTES", 0),
+                   config.get("TRACING_BACKUPS", 5))
+
+    def init_app(self, app):
+        """Registers the tracer in the app extensions, its request hooks and the SQL statement hooks on the engines,
+        if tracing is enabled
+
+        Args:
+            app: The main app, configured but not started
+        """
+        app.config.setdefault("TRACING_ENABLED", False)
+        if not app.config["TRACING_ENABLED"]:
+            return
+        app.extensions["tracer"] = self
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.teardown_request(self._teardown_request)
+        _hook_engines()
+
+    def _start_request(self):
+        # Sub-requests of a batch run on the thread of their batch, which may be already traced
+        attributes = {"http.method": request.method, "http.target": request.full_path.rstrip("?")}
+        name = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        if current_span() is not None:
+            request.environ[_SPAN_ENVIRON_KEY] = start_span(
+                name, SPAN_KIND_SERVER, attributes)
+            return
+        parent = _parse_traceparent(request.headers.get(TRACEPARENT_HEADER, ""))
+        if not (parent and parent[2]) and not random.random() < self.sample_rate:
+            return
+        _active.tracer = self
+        request.environ[_SPAN_ENVIRON_KEY] = start_span(name, SPAN_KIND_SERVER, attributes,
+                                                        *(parent[:2] if parent else ()))
+
+    def _end_request(self, response):
+        opened = request.environ.get(_SPAN_ENVIRON_KEY)
+        if opened is not None:
+            opened.attributes["http.status_code"] = response.status_code
+            response.headers[TRACE_HEADER] = opened.trace_id
+        return response
+
+    def _teardown_request(self, error=None):
+        opened = request.environ.pop(_SPAN_ENVIRON_KEY, None)
+        if opened is not None:
+            end_span(opened, f"{type(error).__name__}: {error}" if error is not None else None)
+
+    def export(self, spans):
+        """Appends a trace to the file
+
+        Args:
+            spans (list of (Span)): The ended spans of the trace
+        """
+        self._logger.info(dumps({"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": __name__},
+                            "spans": [ended.json() for ended in spans]}],
+        }]}).decode().rstrip("\n"))
+
+
+_hooked = False
+
+
+def _hook_engines():
+    """Private function used to trace the statements of every engine, once"""
+    global _hooked
+    if not _hooked:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _hooked = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_span() is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    conn.info["tracing_span"] = start_span(operation, SPAN_KIND_CLIENT, {
+        "db.system": conn.engine.dialect.name,
+        "db.statement": statement[:_MAX_STATEMENT_LENGTH],
+        "db.executemany": executemany,
+    })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    opened = conn.info.pop("tracing_span", None)
+    if opened is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            opened.attributes["db.rowcount"] = cursor.rowcount
+        end_span(opened)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    opened = connection.info.pop(
+        "tracing_span", None) if connection is not None else None
+    if opened is not None:
+        error = exception_context.original_exception
+        end_span(opened, f"{type(error).__name__}: {error}")
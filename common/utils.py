@@ -1,3 +1,7 @@
+from flask import abort
+from flask_sqlalchemy import Pagination
+
+
 def get_metadata(pagination):
     """Gets formatted metadata from pagination object in order to allow the frontend to handle pages properly
 
@@ -13,3 +17,48 @@ def get_metadata(pagination):
         "page_count": pagination.pages,
         "page_size": pagination.per_page
     }
+
+
+def count_pages(query, page, per_page):
+    """Paginates a query counting its rows only, for models methods that load the page rows by themselves.
+        Unlike Query.paginate it does not load the page a second time.
+        Fails with 404 if page does not exist, like Query.paginate.
+
+    Args:
+        query (BaseQuery): The query to paginate
+        page (int): The desired page number, starting from 1
+        per_page (int): The desired page size
+
+    Returns:
+        Pagination: Pagination object without items
+    """
+    if page < 1 or per_page < 0:
+        abort(404)
+    total = query.order_by(None).count()
+    if page != 1 and (per_page == 0 or total <= (page - 1) * per_page):
+        abort(404)
+    return Pagination(query, page, per_page, total, [])
+
+
+def id_list(value, max_size=100):
+    """Parses a comma separated list of integer identifiers (i.e.: 1,2,3)
+
+    Args:
+        value (str): The comma separated identifiers
+        max_size (int, optional): The maximum number of identifiers. Defaults to 100.
+
+    Raises:
+        ValueError: If some identifier is not an integer or there are too many identifiers
+
+    Returns:
+        list of (int): The list of identifiers, without duplicates
+    """
+    try:
+        ids = list(dict.fromkeys(int(id) for id in value.split(",") if id.strip()))
+    except ValueError:
+        raise ValueError(
+            "Ids should be a comma separated list of integers")
+    if not ids or len(ids) > max_size:
+        raise ValueError(
+            f"Ids should be a comma separated list of at most {max_size} integers")
+    return ids
@@ -1,4 +1,4 @@
-from os import getenv
+from os import cpu_count, getenv
 from dotenv import load_dotenv
 from pathlib import Path
 env_path = Path('.') / '.env'
@@ -17,6 +17,120 @@ ENVIRONMENT = "development" if getenv(
     "DEVELOPMENT") == "TRUE" else "production"
 JWT_SECRET_KEY = getenv("JWT_SECRET_KEY")
 JWT_TOKEN_EXPIRES = int(getenv("JWT_TOKEN_EXPIRES", "3600"))
+JWT_REFRESH_TOKEN_EXPIRES = int(getenv("JWT_REFRESH_TOKEN_EXPIRES", "604800"))
+# Number of verified access tokens kept in memory to skip their signature verification, 0 disables the cache
+JWT_VERIFIED_TOKEN_CACHE_SIZE = int(
+    getenv("JWT_VERIFIED_TOKEN_CACHE_SIZE", "1024"))
+# Where revoked tokens are stored (database or memory)
+REVOCATION_STORE = getenv("REVOCATION_STORE", "database")
+# Seconds between two pulls of the revocations made by other workers
+REVOCATION_SYNC_INTERVAL = float(getenv("REVOCATION_SYNC_INTERVAL", "1"))
+# Seconds between two purges of the revocations of expired tokens
+REVOCATION_PURGE_INTERVAL = int(getenv("REVOCATION_PURGE_INTERVAL", "300"))
+# Revoked tokens the Bloom filter is sized for, it grows at the next purge if there are more
+REVOCATION_BLOOM_CAPACITY = int(getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+# Password hashing method and cost, hashes made with other parameters are updated on login
+PASSWORD_HASH_METHOD = getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:150000")
+# Number of processes computing password hashes, 0 hashes on the request thread
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", "2"))
+# Maximum number of password hashes running or waiting for a process
+PASSWORD_HASH_MAX_PENDING = int(getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+# Seconds a request waits for a free hashing slot before being rejected
+PASSWORD_HASH_QUEUE_TIMEOUT = float(
+    getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "0.5"))
+# Login attempts allowed in a burst and per second for the same username and from the same address.
+# The buckets are kept per worker process, so every SERVER_WORKERS process allows as many attempts
+LOGIN_USERNAME_BURST = int(getenv("LOGIN_USERNAME_BURST", "10"))
+LOGIN_USERNAME_RATE = float(getenv("LOGIN_USERNAME_RATE", "0.2"))
+LOGIN_ADDRESS_BURST = int(getenv("LOGIN_ADDRESS_BURST", "60"))
+LOGIN_ADDRESS_RATE = float(getenv("LOGIN_ADDRESS_RATE", "2"))
+# Maximum number of logins verifying a password at the same time
+LOGIN_MAX_CONCURRENT = int(getenv("LOGIN_MAX_CONCURRENT", "8"))
+# Number of reverse proxies in front of the app (i.e.: 1 behind nginx) whose X-Forwarded-For header gives the client
+# address, 0 when clients connect directly and the header cannot be trusted
+TRUSTED_PROXY_HOPS = int(getenv("TRUSTED_PROXY_HOPS", "0"))
+# Responses larger than COMPRESSION_MIN_SIZE bytes are compressed when the client accepts it
+COMPRESSION_ENABLED = getenv("COMPRESSION_ENABLED", "TRUE") == "TRUE"
+COMPRESSION_MIN_SIZE = int(getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(getenv("COMPRESSION_LEVEL", "6"))
+# Maximum number of sub-requests of a batch and number of threads running their reads
+BATCH_MAX_REQUESTS = int(getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_WORKERS = int(getenv("BATCH_WORKERS", "4"))
+# Number of read responses kept in memory (0 disables the cache), seconds they are kept and
+# seconds from their creation during which outdated responses are served while they are rebuilt
+RESPONSE_CACHE_SIZE = int(getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_STALE_TTL = float(getenv("RESPONSE_CACHE_STALE_TTL", "0"))
+# Maximum number of agenda events waiting for a slow subscriber before it is dropped,
+# seconds between two heartbeats of an idle event stream, seconds between two polls of the agenda changes
+# committed by every worker and event streams served by every worker process, each holding one of its
+# SERVER_THREADS threads (0 for all of them but one)
+EVENTS_QUEUE_SIZE = int(getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_INTERVAL = float(getenv("EVENTS_HEARTBEAT_INTERVAL", "15"))
+EVENTS_POLL_INTERVAL = float(getenv("EVENTS_POLL_INTERVAL", "1"))
+EVENTS_MAX_STREAMS = int(getenv("EVENTS_MAX_STREAMS", "0"))
+# Whether request, database and agenda metrics are collected and exposed at /metrics
+METRICS_ENABLED = getenv("METRICS_ENABLED", "TRUE") == "TRUE"
+# Bearer token the scrapers of /metrics authenticate with, admins can scrape it with their access token too
+METRICS_TOKEN = getenv("METRICS_TOKEN")
+# Directory where every worker process writes a snapshot of its metrics every METRICS_SNAPSHOT_INTERVAL seconds,
+# so that /metrics exposes the metrics of every worker; unset, /metrics exposes the ones of the worker that answers
+METRICS_DIR = getenv("METRICS_DIR", "")
+METRICS_SNAPSHOT_INTERVAL = float(getenv("METRICS_SNAPSHOT_INTERVAL", "1"))
+# Whether the SQL statements of every request, or of the requests with an X-Query-Audit header,
+# are audited and the ones repeated at least QUERY_AUDIT_THRESHOLD times logged with their call sites
+QUERY_AUDIT_ENABLED = getenv("QUERY_AUDIT_ENABLED") == "TRUE"
+QUERY_AUDIT_HEADER_ENABLED = getenv("QUERY_AUDIT_HEADER_ENABLED") == "TRUE"
+QUERY_AUDIT_THRESHOLD = int(getenv("QUERY_AUDIT_THRESHOLD", "5"))
+# Seconds from which a SQL statement is logged together with its plan (negative disables the log),
+# whether the plan is captured with EXPLAIN ANALYZE, which runs the statement again, the log file
+# (empty for none), its rotation size (0 to leave the rotation to logrotate, the only safe choice with several
+# worker processes) and rotated files and the statements listed at /slow_queries
+SLOW_QUERY_THRESHOLD = float(getenv("SLOW_QUERY_THRESHOLD", "0.2"))
+SLOW_QUERY_EXPLAIN_ANALYZE = getenv("SLOW_QUERY_EXPLAIN_ANALYZE") == "TRUE"
+SLOW_QUERY_LOG_PATH = getenv("SLOW_QUERY_LOG_PATH", "")
+SLOW_QUERY_LOG_MAX_BYTES = int(getenv("SLOW_QUERY_LOG_MAX_BYTES", "0"))
+SLOW_QUERY_LOG_BACKUPS = int(getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+SLOW_QUERY_MAX_OFFENDERS = int(getenv("SLOW_QUERY_MAX_OFFENDERS", "100"))
+# Whether the requests of admins with an X-Profile header, and a PROFILING_SAMPLE_RATE fraction of every request,
+# are profiled; the folder the profiles are saved to and the number of profiles kept
+PROFILING_ENABLED = getenv("PROFILING_ENABLED") == "TRUE"
+PROFILING_SAMPLE_RATE = float(getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_FILES = int(getenv("PROFILING_MAX_FILES", "50"))
+# Whether a TRACING_SAMPLE_RATE fraction of the requests, and the ones with a sampled traceparent header, are traced,
+# the file the traces are appended to as OTLP JSON, its rotation size (0 to leave the rotation to logrotate, the only
+# safe choice with several worker processes) and rotated files and the service name
+TRACING_ENABLED = getenv("TRACING_ENABLED") == "TRUE"
+TRACING_SAMPLE_RATE = float(getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_PATH = getenv("TRACING_PATH", "traces.jsonl")
+TRACING_MAX_BYTES = int(getenv("TRACING_MAX_BYTES", "0"))
+TRACING_BACKUPS = int(getenv("TRACING_BACKUPS", "5"))
+TRACING_SERVICE_NAME = getenv("TRACING_SERVICE_NAME", "backend")
+# Threads running the background jobs in every worker process (0 to only queue them), seconds between two polls
+# of the jobs table, seconds after which a running job without heartbeats (i.e.: of a killed worker) is queued again
+# and runs after which an interrupted job fails instead
+JOBS_WORKERS = int(getenv("JOBS_WORKERS", "2"))
+JOBS_POLL_INTERVAL = float(getenv("JOBS_POLL_INTERVAL", "1"))
+JOBS_LEASE = float(getenv("JOBS_LEASE", "60"))
+JOBS_MAX_ATTEMPTS = int(getenv("JOBS_MAX_ATTEMPTS", "3"))
+# Whether a worker opens WARMUP_CONNECTIONS database connections, runs the hottest statements and starts
+# the password hashing processes before serving its first request
+WARMUP_ENABLED = getenv("WARMUP_ENABLED", "TRUE") == "TRUE"
+WARMUP_CONNECTIONS = int(getenv("WARMUP_CONNECTIONS", "5"))
+# Seconds the result of the database ping of the readiness check (/readyz) is reused for
+READINESS_PING_INTERVAL = float(getenv("READINESS_PING_INTERVAL", "1"))
+# Address, worker processes and threads per worker of the production server (see serve.py), seconds after which
+# a silent worker is killed and seconds the workers have to finish their in-flight requests on reload,
+# seconds a keep-alive connection is held, requests and megabytes (0 for no limit) after which a worker is replaced
+SERVER_BIND = getenv("SERVER_BIND", "0.0.0.0:5000")
+SERVER_WORKERS = int(getenv("SERVER_WORKERS", str(2 * (cpu_count() or 1) + 1)))
+SERVER_THREADS = int(getenv("SERVER_THREADS", "4"))
+SERVER_TIMEOUT = int(getenv("SERVER_TIMEOUT", "30"))
+SERVER_GRACEFUL_TIMEOUT = int(getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_KEEPALIVE = int(getenv("SERVER_KEEPALIVE", "5"))
+SERVER_MAX_REQUESTS = int(getenv("SERVER_MAX_REQUESTS", "10000"))
+SERVER_MAX_WORKER_MEMORY = int(getenv("SERVER_MAX_WORKER_MEMORY", "512"))
 
 # Configurable maintainer constants
 MAINTAINER_WORK_START_HOUR = int(getenv("MAINTAINER_WORK_START_HOUR", "8"))
@@ -33,11 +147,110 @@ class Config:
     # jwt configs
     JWT_BLACKLIST_ENABLED = True  # enable blacklist feature
     # allow blacklisting for access and refresh tokens
-    JWT_BLACKLIST_TOKEN_CHECKS = ["access"]
+    JWT_BLACKLIST_TOKEN_CHECKS = ["access", "refresh"]
     # secret key to check jwt validity
     JWT_SECRET_KEY = JWT_SECRET_KEY
     # token expire time in seconds
     JWT_ACCESS_TOKEN_EXPIRES = JWT_TOKEN_EXPIRES
+    JWT_REFRESH_TOKEN_EXPIRES = JWT_REFRESH_TOKEN_EXPIRES
+    # verified tokens cache size
+    JWT_VERIFIED_TOKEN_CACHE_SIZE = JWT_VERIFIED_TOKEN_CACHE_SIZE
+
+    # revoked tokens store configs
+    REVOCATION_STORE = REVOCATION_STORE
+    REVOCATION_SYNC_INTERVAL = REVOCATION_SYNC_INTERVAL
+    REVOCATION_PURGE_INTERVAL = REVOCATION_PURGE_INTERVAL
+    REVOCATION_BLOOM_CAPACITY = REVOCATION_BLOOM_CAPACITY
+
+    # password hashing configs
+    PASSWORD_HASH_METHOD = PASSWORD_HASH_METHOD
+    PASSWORD_HASH_WORKERS = PASSWORD_HASH_WORKERS
+    PASSWORD_HASH_MAX_PENDING = PASSWORD_HASH_MAX_PENDING
+    PASSWORD_HASH_QUEUE_TIMEOUT = PASSWORD_HASH_QUEUE_TIMEOUT
+
+    # login throttling configs
+    LOGIN_USERNAME_BURST = LOGIN_USERNAME_BURST
+    LOGIN_USERNAME_RATE = LOGIN_USERNAME_RATE
+    LOGIN_ADDRESS_BURST = LOGIN_ADDRESS_BURST
+    LOGIN_ADDRESS_RATE = LOGIN_ADDRESS_RATE
+    LOGIN_MAX_CONCURRENT = LOGIN_MAX_CONCURRENT
+    TRUSTED_PROXY_HOPS = TRUSTED_PROXY_HOPS
+
+    # response compression configs
+    COMPRESSION_ENABLED = COMPRESSION_ENABLED
+    COMPRESSION_MIN_SIZE = COMPRESSION_MIN_SIZE
+    COMPRESSION_LEVEL = COMPRESSION_LEVEL
+
+    # batch requests configs
+    BATCH_MAX_REQUESTS = BATCH_MAX_REQUESTS
+    BATCH_WORKERS = BATCH_WORKERS
+
+    # response cache configs
+    RESPONSE_CACHE_SIZE = RESPONSE_CACHE_SIZE
+    RESPONSE_CACHE_TTL = RESPONSE_CACHE_TTL
+    RESPONSE_CACHE_STALE_TTL = RESPONSE_CACHE_STALE_TTL
+
+    # agenda events configs
+    EVENTS_QUEUE_SIZE = EVENTS_QUEUE_SIZE
+    EVENTS_HEARTBEAT_INTERVAL = EVENTS_HEARTBEAT_INTERVAL
+    EVENTS_POLL_INTERVAL = EVENTS_POLL_INTERVAL
+    EVENTS_MAX_STREAMS = EVENTS_MAX_STREAMS
+
+    # metrics configs
+    METRICS_ENABLED = METRICS_ENABLED
+    METRICS_TOKEN = METRICS_TOKEN
+    METRICS_DIR = METRICS_DIR
+    METRICS_SNAPSHOT_INTERVAL = METRICS_SNAPSHOT_INTERVAL
+
+    # query audit configs
+    QUERY_AUDIT_ENABLED = QUERY_AUDIT_ENABLED
+    QUERY_AUDIT_HEADER_ENABLED = QUERY_AUDIT_HEADER_ENABLED
+    QUERY_AUDIT_THRESHOLD = QUERY_AUDIT_THRESHOLD
+
+    # slow query log configs
+    SLOW_QUERY_THRESHOLD = SLOW_QUERY_THRESHOLD
+    SLOW_QUERY_EXPLAIN_ANALYZE = SLOW_QUERY_EXPLAIN_ANALYZE
+    SLOW_QUERY_LOG_PATH = SLOW_QUERY_LOG_PATH
+    SLOW_QUERY_LOG_MAX_BYTES = SLOW_QUERY_LOG_MAX_BYTES
+    SLOW_QUERY_LOG_BACKUPS = SLOW_QUERY_LOG_BACKUPS
+    SLOW_QUERY_MAX_OFFENDERS = SLOW_QUERY_MAX_OFFENDERS
+
+    # request profiling configs
+    PROFILING_ENABLED = PROFILING_ENABLED
+    PROFILING_SAMPLE_RATE = PROFILING_SAMPLE_RATE
+    PROFILING_DIR = PROFILING_DIR
+    PROFILING_MAX_FILES = PROFILING_MAX_FILES
+
+    # tracing configs
+    TRACING_ENABLED = TRACING_ENABLED
+    TRACING_SAMPLE_RATE = TRACING_SAMPLE_RATE
+    TRACING_PATH = TRACING_PATH
+    TRACING_MAX_BYTES = TRACING_MAX_BYTES
+    TRACING_BACKUPS = TRACING_BACKUPS
+    TRACING_SERVICE_NAME = TRACING_SERVICE_NAME
+
+    # background jobs configs
+    JOBS_WORKERS = JOBS_WORKERS
+    JOBS_POLL_INTERVAL = JOBS_POLL_INTERVAL
+    JOBS_LEASE = JOBS_LEASE
+    JOBS_MAX_ATTEMPTS = JOBS_MAX_ATTEMPTS
+
+    # warm-up configs
+    WARMUP_ENABLED = WARMUP_ENABLED
+    WARMUP_CONNECTIONS = WARMUP_CONNECTIONS
+
+    # readiness check configs
+    READINESS_PING_INTERVAL = READINESS_PING_INTERVAL
+
+    # production server configs
+    SERVER_BIND = SERVER_BIND
+    SERVER_WORKERS = SERVER_WORKERS
+    SERVER_THREADS = SERVER_THREADS
+    SERVER_TIMEOUT = SERVER_TIMEOUT
+    SERVER_GRACEFUL_TIMEOUT = SERVER_GRACEFUL_TIMEOUT
+    SERVER_KEEPALIVE = SERVER_KEEPALIVE
+    SERVER_MAX_REQUESTS = SERVER_MAX_REQUESTS
+    SERVER_MAX_WORKER_MEMORY = SERVER_MAX_WORKER_MEMORY
 
     # Enable testing mode. Exceptions are propagated rather than handled by the the app’s error handlers.
     TESTING = TESTING
@@ -55,3 +268,14 @@ class TestConfig(Config):
     # Enable testing mode. Exceptions are propagated rather than handled by the the app’s error handlers.
     TESTING = True
     ENV = 'development'
+
+    # cheap hashes keep the test suite fast
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
+    # the job tests start their own runner
+    JOBS_WORKERS = 0
+
+    # query budgets can be checked on any request
+    QUERY_AUDIT_HEADER_ENABLED = True
+
+    # every test creates its own app and tables
+    WARMUP_ENABLED = False
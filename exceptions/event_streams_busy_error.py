@@ -0,0 +1,10 @@
+from exceptions.error import Error
+
+
+class EventStreamsBusyError(Error):
+    """Raised when a worker already serves as many event streams as it can, or is stopping"""
+
+    message = "Too many event streams are open, please try again later"
+
+    def __init__(self):
+        super().__init__(self.message)
@@ -0,0 +1,10 @@
+from exceptions.error import Error
+
+
+class HashingBusyError(Error):
+    """Raised when too many password hashes are already waiting for the hashing pool"""
+
+    message = "The server is busy, please try again later"
+
+    def __init__(self):
+        super().__init__(self.message)
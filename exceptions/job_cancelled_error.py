@@ -0,0 +1,10 @@
+from exceptions.error import Error
+
+
+class JobCancelledError(Error):
+    """Raised by a running job that has been cancelled or whose runner is stopping"""
+
+    message = "The job has been cancelled"
+
+    def __init__(self):
+        super().__init__(self.message)
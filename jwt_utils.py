@@ -1,6 +1,94 @@
-from flask import jsonify
+from collections import OrderedDict
+from threading import Lock
+from hashlib import blake2b
+from flask import jsonify, request, current_app, _app_ctx_stack as ctx_stack
 from blacklist import BLACKLIST
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_claims
+from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_claims, get_raw_jwt
+from flask_jwt_extended.config import config
+from flask_jwt_extended.exceptions import RevokedTokenError
+from flask_jwt_extended.utils import get_raw_jwt_header, has_user_loader, verify_token_not_blacklisted
+import time
+
+
+class VerifiedTokenCache:
+    """A bounded LRU cache of decoded access tokens, keyed by the digest of the encoded token.
+    Tokens whose signature has already been verified are not decoded and verified again until they expire.
+    """
+
+    def __init__(self, max_size=1024):
+        """VerifiedTokenCache constructor.
+
+        Args:
+            max_size (int, optional): The maximum number of cached tokens. Defaults to 1024.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, digest, now):
+        """Finds a verified token that has not expired yet.
+
+        Args:
+            digest (bytes): The digest of the encoded token
+            now (float): The current unix timestamp
+
+        Returns:
+            (dict, dict): The decoded token and its header, or None if the token is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0].get("exp", now + 1) <= now:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry
+
+    def put(self, digest, decoded_token, header):
+        """Caches a verified token, evicting the least recently used one when the cache is full.
+
+        Args:
+            digest (bytes): The digest of the encoded token
+            decoded_token (dict): The decoded token
+            header (dict): The decoded token header
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (decoded_token, header)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        """Removes a token from the cache
+
+        Args:
+            digest (bytes): The digest of the encoded token
+        """
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def status(self):
+        """Public representation of the cache state.
+
+        Returns:
+            dict of (str, any): The cache size and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
 
 
 def bind_jwt_messages(app):
@@ -13,6 +101,8 @@ def bind_jwt_messages(app):
         JWTManager: The jwt manager bound to the app
     """
     jwt = JWTManager(app)
+    app.extensions["verified_token_cache"] = VerifiedTokenCache(
+        app.config.get("JWT_VERIFIED_TOKEN_CACHE_SIZE", 1024))
 
     @jwt.expired_token_loader
     def expired_token_callback():
@@ -56,6 +146,55 @@ def bind_jwt_messages(app):
     return jwt
 
 
+def _get_encoded_token_from_header():
+    """Private function used to read the encoded access token from the authorization header
+
+    Returns:
+        str: The encoded token, or None if the header is missing or malformed
+    """
+    auth_header = request.headers.get(config.header_name)
+    if not auth_header:
+        return None
+    parts = auth_header.split()
+    if not config.header_type:
+        return parts[0] if len(parts) == 1 else None
+    if len(parts) != 2 or parts[0] != config.header_type:
+        return None
+    return parts[1]
+
+
+def verify_jwt_in_request_cached():
+    """Ensures that the requester has a valid access token like verify_jwt_in_request does,
+    but skips decoding and signature verification for tokens found in the verified token cache.
+    Cached tokens are still checked against expiration and revocation.
+    """
+    if request.method in config.exempt_methods:
+        return
+    cache = current_app.extensions["verified_token_cache"]
+    encoded_token = None
+    if tuple(config.token_location) == ("headers",) and not has_user_loader():
+        encoded_token = _get_encoded_token_from_header()
+    if encoded_token is None:
+        verify_jwt_in_request()
+        return
+
+    digest = blake2b(encoded_token.encode(), digest_size=16).digest()
+    entry = cache.get(digest, time.time() - config.leeway)
+    if entry is None:
+        verify_jwt_in_request()
+        cache.put(digest, get_raw_jwt(), get_raw_jwt_header())
+        return
+
+    jwt_data, jwt_header = entry
+    try:
+        verify_token_not_blacklisted(jwt_data, "access")
+    except RevokedTokenError:
+        cache.discard(digest)
+        raise
+    ctx_stack.top.jwt = jwt_data
+    ctx_stack.top.jwt_header = jwt_header
+
+
 def role_required(role="admin"):
     """Custom decorator factory that produces a decorator that verifies if
         the JWT is present in the request, as well as insuring that this
@@ -63,7 +202,7 @@ def role_required(role="admin"):
     """
     def decorator(fn):
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
+            verify_jwt_in_request_cached()
             claims = get_jwt_claims()
             if claims['role'] != role:
                 return {"error": "role_mismatch", "message": f"Wanted '{role}', but got '{claims['role']}'."}, 403
@@ -0,0 +1,71 @@
+from db import db
+
+
+class AgendaChangeModel(db.Model):
+    """Agenda change class for database interaction.
+    Every row is an activity scheduled in or removed from an hour of a maintainer's day, recorded in the transaction
+    of the change together with the version it gave to the week, so that the agenda feed of every worker process
+    can push it to its subscribers (see AgendaFeed). The rows are only kept for a few minutes."""
+    __tablename__ = "agenda_changes"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    week = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    activity_id = db.Column(db.Integer, nullable=True)
+    assigned = db.Column(db.Boolean, nullable=False)
+    maintainer = db.Column(db.String(80), nullable=False)
+    week_day = db.Column(db.String(10), nullable=False)
+    start_time = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.Float, nullable=False, index=True)
+
+    __table_args__ = (db.Index("ix_agenda_changes_week_version", "week", "version"),)
+
+    def __init__(self, week, version, activity_id, assigned, maintainer, week_day, start_time, created_at):
+        """AgendaChangeModel constructor.
+
+        Args:
+            week (int): The nth week of the year
+            version (int): The version of the week once the change is committed
+            activity_id (int): The identifier of the changed activity
+            assigned (bool): True if the activity has been scheduled in the hour, False if it has been removed from it
+            maintainer (str): The username of the maintainer
+            week_day (str): The day of the week (i.e.: monday, tuesday, ...)
+            start_time (int): The hour
+            created_at (float): The unix timestamp of the change
+        """
+        self.week = week
+        self.version = version
+        self.activity_id = activity_id
+        self.assigned = assigned
+        self.maintainer = maintainer
+        self.week_day = week_day
+        self.start_time = start_time
+        self.created_at = created_at
+
+    @classmethod
+    def find_since(cls, week, version):
+        """Finds the changes of a week committed after one of its versions
+
+        Args:
+            week (int): The nth week of the year
+            version (int): The version of the week
+
+        Returns:
+            list of (AgendaChangeModel): The changes, in the order they have been committed
+        """
+        return cls.query.filter(cls.week == week, cls.version > version).order_by(cls.version, cls.id).all()
+
+    @classmethod
+    def prune(cls, before):
+        """Deletes the changes recorded before a time, which every worker has already pushed
+
+        Args:
+            before (float): The unix timestamp
+
+        Returns:
+            int: The number of deleted changes
+        """
+        deleted = cls.query.filter(cls.created_at < before).delete(
+            synchronize_session=False)
+        db.session.commit()
+        return deleted
@@ -0,0 +1,296 @@
+from db import db
+from models.job_result_chunk import JobResultChunkModel
+import json
+
+
+class JobModel(db.Model):
+    """Job class for database interaction.
+    Every row is a background job (i.e.: an import or an export), queued by a request and run by the job runner
+    of one of the workers (see JobRunner), which claims it, keeps its heartbeat fresh and stores its outcome"""
+    __tablename__ = "jobs"
+
+    statuses = ("queued", "running", "succeeded", "failed", "cancelled")
+    finished_statuses = ("succeeded", "failed", "cancelled")
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(64), nullable=False)
+    params = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(16), nullable=False,
+                       default="queued", index=True)
+    progress = db.Column(db.Float, nullable=False, default=0)
+    message = db.Column(db.String(256), nullable=True)
+    checkpoint = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    owner = db.Column(db.String(128), nullable=True)
+    created_by = db.Column(db.String(128), nullable=True)
+    created_at = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float, nullable=True)
+    finished_at = db.Column(db.Float, nullable=True)
+    heartbeat_at = db.Column(db.Float, nullable=True)
+    result = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    result_type = db.Column(db.String(128), nullable=True)
+    result_name = db.Column(db.String(128), nullable=True)
+
+    def __init__(self, kind, params, created_by, created_at):
+        """JobModel constructor.
+
+        Args:
+            kind (str): The name of the job kind (i.e.: export_activities)
+            params (dict of (str, any)): The validated parameters of the job
+            created_by (str): The username of the user who queued the job
+            created_at (float): The unix timestamp of the creation
+        """
+        self.kind = kind
+        self.params = json.dumps(params)
+        self.status = "queued"
+        self.progress = 0
+        self.cancel_requested = False
+        self.attempts = 0
+        self.created_by = created_by
+        self.created_at = created_at
+
+    def json(self):
+        """Public representation for JobModel instance.
+
+        Returns:
+            dict of (str, any): The dictionary representation of the job, without its result
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.summarize_params(),
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "attempts": self.attempts,
+            "created_by": self.created_by,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "has_result": self.result_type is not None,
+        }
+
+    def get_params(self):
+        """Gets the parameters of the job
+
+        Returns:
+            dict of (str, any): The parameters
+        """
+        return json.loads(self.params)
+
+    def summarize_params(self):
+        """Gets the parameters of the job, with every list replaced by its length (i.e.: the activities of an import),
+        so that polling the job does not send its whole input back
+
+        Returns:
+            dict of (str, any): The summarized parameters
+        """
+        return {name: len(value) if isinstance(value, list) else value
+                for name, value in self.get_params().items()}
+
+    def get_checkpoint(self):
+        """Gets the checkpoint stored by the last run of the job, from which a queued again job resumes
+
+        Returns:
+            any: The checkpoint, None if there is none
+        """
+        return json.loads(self.checkpoint) if self.checkpoint is not None else None
+
+    @property
+    def finished(self):
+        return self.status in self.finished_statuses
+
+    def save_to_db(self):
+        """Saves job instance to the database"""
+        db.session.add(self)
+        db.session.commit()
+
+    @classmethod
+    def find_by_id(cls, id):
+        """Finds a job by its identifier, bypassing the jobs already loaded by the session
+
+        Args:
+            id (int): The identifier of the job
+
+        Returns:
+            JobModel: The found job, None if it does not exist
+        """
+        return cls.query.populate_existing().filter_by(id=id).first()
+
+    @classmethod
+    def find_queued_ids(cls, limit):
+        """Finds the oldest queued jobs
+
+        Args:
+            limit (int): The maximum number of jobs
+
+        Returns:
+            list of (int): The job identifiers, oldest first
+        """
+        rows = (db.session.query(cls.id)
+                .filter_by(status="queued")
+                .order_by(cls.id)
+                .limit(limit)
+                .all())
+        return [row.id for row in rows]
+
+    @classmethod
+    def claim(cls, id, owner, now):
+        """Marks a queued job as running on behalf of a runner. Only one of the runners claiming the same job succeeds.
+
+        Args:
+            id (int): The identifier of the job
+            owner (str): The identifier of the runner
+            now (float): The current unix timestamp
+
+        Returns:
+            bool: True if the job has been claimed
+        """
+        claimed = cls.query.filter_by(id=id, status="queued").update(
+            {cls.status: "running", cls.owner: owner, cls.started_at: now, cls.heartbeat_at: now,
+             cls.attempts: cls.attempts + 1}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    @classmethod
+    def heartbeat(cls, ids, owner, now):
+        """Keeps alive the running jobs of a runner
+
+        Args:
+            ids (iterable of (int)): The identifiers of the jobs
+            owner (str): The identifier of the runner
+            now (float): The current unix timestamp
+        """
+        cls.query.filter(cls.id.in_(list(ids))).filter_by(status="running", owner=owner).update(
+            {cls.heartbeat_at: now}, synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def requeue_stale(cls, before, max_attempts, now):
+        """Queues again the running jobs whose runner stopped sending heartbeats (i.e.: its worker was killed).
+        The jobs that have already been run max_attempts times fail instead.
+
+        Args:
+            before (float): The unix timestamp before which a heartbeat is stale
+            max_attempts (int): The number of runs after which a job is not queued again
+            now (float): The current unix timestamp
+
+        Returns:
+            int: The number of queued jobs
+        """
+        stale = cls.query.filter_by(status="running").filter(
+            cls.heartbeat_at < before)
+        stale.filter(cls.attempts >= max_attempts).update(
+            cls._exhausted(max_attempts, now), synchronize_session=False)
+        requeued = stale.filter(cls.attempts < max_attempts).update(
+            {cls.status: "queued", cls.owner: None}, synchronize_session=False)
+        db.session.commit()
+        return requeued
+
+    @classmethod
+    def requeue(cls, id, owner, max_attempts, now):
+        """Queues again a running job of a runner that is stopping, unless it has already been run max_attempts times:
+        then it fails
+
+        Args:
+            id (int): The identifier of the job
+            owner (str): The identifier of the runner
+            max_attempts (int): The number of runs after which a job is not queued again
+            now (float): The current unix timestamp
+        """
+        job = cls.query.filter_by(id=id, status="running", owner=owner)
+        job.filter(cls.attempts >= max_attempts).update(
+            cls._exhausted(max_attempts, now), synchronize_session=False)
+        job.filter(cls.attempts < max_attempts).update(
+            {cls.status: "queued", cls.owner: None}, synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def _exhausted(cls, max_attempts, now):
+        """Private method used to get the values of a job interrupted too many times
+
+        Args:
+            max_attempts (int): The number of runs of the job
+            now (float): The current unix timestamp
+
+        Returns:
+            dict of (Column, any): The values of the failed job
+        """
+        return {cls.status: "failed", cls.finished_at: now,
+                cls.error: f"Interrupted after {max_attempts} attempts"}
+
+    @classmethod
+    def report_progress(cls, id, owner, progress, message, now, checkpoint=None):
+        """Stores the progress of a running job, committing the current transaction together with it,
+        and tells whether the job has been asked to stop.
+        If the job does not belong to the runner anymore the transaction is rolled back instead.
+
+        Args:
+            id (int): The identifier of the job
+            owner (str): The identifier of the runner
+            progress (float): The completed fraction, between 0 and 1
+            message (str): The description of the current step, None to keep the previous one
+            now (float): The current unix timestamp
+            checkpoint (any, optional): The json serializable state the job resumes from if queued again. Defaults to None.
+
+        Returns:
+            bool: True if the job has been cancelled or does not belong to the runner anymore
+        """
+        values = {cls.progress: progress, cls.heartbeat_at: now}
+        if message is not None:
+            values[cls.message] = message[:256]
+        if checkpoint is not None:
+            values[cls.checkpoint] = json.dumps(checkpoint)
+        if not cls.query.filter_by(id=id, status="running", owner=owner).update(values, synchronize_session=False):
+            db.session.rollback()
+            return True
+        db.session.commit()
+        return db.session.query(cls.cancel_requested).filter_by(id=id).scalar()
+
+    @classmethod
+    def finish(cls, id, owner, status, now, error=None, result=None, result_type=None, result_name=None):
+        """Stores the outcome of a running job
+
+        Args:
+            id (int): The identifier of the job
+            owner (str): The identifier of the runner
+            status (str): succeeded, failed or cancelled
+            now (float): The current unix timestamp
+            error (str, optional): The error the job failed with. Defaults to None.
+            result (bytes, optional): The result of the job. Defaults to None.
+            result_type (str, optional): The media type of the result. Defaults to None.
+            result_name (str, optional): The file name of the result. Defaults to None.
+        """
+        values = {cls.status: status, cls.finished_at: now, cls.error: error,
+                  cls.result: result, cls.result_type: result_type, cls.result_name: result_name}
+        if status == "succeeded":
+            values[cls.progress] = 1
+        finished = cls.query.filter_by(id=id, status="running", owner=owner).update(
+            values, synchronize_session=False)
+        if finished and status != "succeeded":
+            # the chunks the job has written of its result (see JobContext.write)
+            JobResultChunkModel.discard(id)
+        db.session.commit()
+
+    @classmethod
+    def cancel(cls, id, now):
+        """Cancels a queued job right away, or asks a running job to stop at its next progress report
+
+        Args:
+            id (int): The identifier of the job
+            now (float): The current unix timestamp
+
+        Returns:
+            bool: False if the job has already finished
+        """
+        cancelled = cls.query.filter_by(id=id, status="queued").update(
+            {cls.status: "cancelled", cls.cancel_requested: True, cls.finished_at: now}, synchronize_session=False)
+        if not cancelled:
+            cancelled = cls.query.filter_by(id=id, status="running").update(
+                {cls.cancel_requested: True}, synchronize_session=False)
+        db.session.commit()
+        return cancelled == 1
@@ -0,0 +1,54 @@
+from db import db
+
+
+class JobResultChunkModel(db.Model):
+    """Job result chunk class for database interaction.
+    Every row is a piece of the file a job writes as it goes (see JobContext.write), so that neither the job
+    nor the download of the result hold the whole file in memory"""
+    __tablename__ = "job_result_chunks"
+
+    job_id = db.Column(db.Integer, db.ForeignKey("jobs.id"), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    @classmethod
+    def append(cls, job_id, seq, data):
+        """Inserts a chunk within the current transaction, without keeping it in the session
+
+        Args:
+            job_id (int): The identifier of the job
+            seq (int): The position of the chunk in the file
+            data (bytes): The chunk
+        """
+        db.session.execute(cls.__table__.insert().values(
+            job_id=job_id, seq=seq, data=data))
+
+    @classmethod
+    def discard(cls, job_id):
+        """Deletes the chunks of a job within the current transaction (i.e.: the ones written by a previous run)
+
+        Args:
+            job_id (int): The identifier of the job
+        """
+        cls.query.filter_by(job_id=job_id).delete(synchronize_session=False)
+
+    @classmethod
+    def iter_data(cls, job_id):
+        """Reads the chunks of a job one at a time
+
+        Args:
+            job_id (int): The identifier of the job
+
+        Returns:
+            generator of (bytes): The chunks, in the order they have been written
+        """
+        seq = -1
+        while True:
+            row = (db.session.query(cls.seq, cls.data)
+                   .filter(cls.job_id == job_id, cls.seq > seq)
+                   .order_by(cls.seq)
+                   .first())
+            if row is None:
+                return
+            seq = row.seq
+            yield row.data
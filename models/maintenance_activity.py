@@ -1,8 +1,17 @@
 from db import db
-from common.utils import get_metadata
+from common.utils import count_pages, get_metadata
+from models.version import VersionModel
+from common.agenda_feed import agenda_feed
+from common.tracing import traced
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
 from config import MAINTAINER_WORK_HOURS, MAINTAINER_WORK_START_HOUR
 from functools import reduce
 
+# The skills are not stored yet, every activity shares the same immutable list
+SKILLS_NEEDED = ("PAV certification", "Electrical Maintenance", "Knowledge of cable types",
+                 "XYZ-type robot knowledge", "Knowledge of robot workstation 23")
+
 
 class MaintenanceActivityModel(db.Model):
     """Maintenance Activity class for database interaction"""
@@ -19,15 +28,15 @@ class MaintenanceActivityModel(db.Model):
     workspace_notes = db.Column(db.String(128), nullable=True)
     estimated_time = db.Column(db.Integer)
     week = db.Column(db.Integer, db.CheckConstraint(
-        "week >= 1 AND week <= 52"))
+        "week >= 1 AND week <= 52"), index=True)
     week_day = db.Column(db.Enum("monday", "tuesday", "wednesday", "thursday",
-                                 "friday", "saturday", "sunday", name="week_day_enum", create_type=False), nullable=True)
+                                 "friday", "saturday", "sunday", name="week_day_enum", create_type=False), nullable=True, index=True)
     start_time = db.Column(db.Integer,  db.CheckConstraint(
         f"start_time >= {MAINTAINER_WORK_START_HOUR} AND start_time <= {MAINTAINER_WORK_START_HOUR + MAINTAINER_WORK_HOURS}"), nullable=True)
 
     maintainer_username = db.Column(db.String(128),
                                     db.ForeignKey("users.username"),
-                                    nullable=True)
+                                    nullable=True, index=True)
     maintainer = db.relationship("UserModel")
 
     def __init__(self, activity_type, site, typology, description, estimated_time,
@@ -58,11 +67,59 @@ class MaintenanceActivityModel(db.Model):
         self.week = week
         self.workspace_notes = workspace_notes
 
-    def json(self):
+    # Keys of the public representation, in order
+    fields = ("activity_id", "activity_type", "site", "typology", "description", "estimated_time",
+              "interruptible", "materials", "week", "workspace_notes", "skills_needed")
+
+    @classmethod
+    def parse_fields(cls, value):
+        """Parses a comma separated list of public representation keys (i.e.: activity_id,week,estimated_time)
+
+        Args:
+            value (str): The comma separated keys
+
+        Raises:
+            ValueError: If some key is not part of the public representation
+
+        Returns:
+            list of (str): The list of keys, without duplicates
+        """
+        fields = list(dict.fromkeys(
+            field.strip() for field in value.split(",") if field.strip()))
+        unknown = [field for field in fields if field not in cls.fields]
+        if unknown or not fields:
+            raise ValueError(
+                f"Fields should be a comma separated list of {', '.join(cls.fields)}")
+        return fields
+
+    @classmethod
+    def _select(cls, fields=None):
+        """Private method used to build a query loading only the columns needed by the given public representation keys
+
+        Args:
+            fields (list of (str), optional): The public representation keys. Defaults to every key.
+
+        Returns:
+            Query: The query builder
+        """
+        if not fields:
+            return cls.query
+        columns = [getattr(cls, field) for field in fields
+                   if field != "skills_needed"]
+        return cls.query.options(load_only(cls.activity_id, *columns))
+
+    def json(self, fields=None):
         """Public representation for MaintenanceActivityModel instance.
+
+        Args:
+            fields (list of (str), optional): The keys to include. Defaults to every key.
+
         Returns:
             dict of (str, str): The dictionary representation of Maintenance Activity.
         """
+        if fields:
+            return {field: SKILLS_NEEDED if field == "skills_needed" else getattr(self, field)
+                    for field in fields}
         return {
             "activity_id": self.activity_id,
             "activity_type": self.activity_type,
@@ -74,13 +131,53 @@ class MaintenanceActivityModel(db.Model):
             "materials": self.materials,
             "week": self.week,
             "workspace_notes": self.workspace_notes,
-            "skills_needed": ["PAV certification", "Electrical Maintenance", "Knowledge of cable types",
-                              "XYZ-type robot knowledge", "Knowledge of robot workstation 23"]
+            "skills_needed": SKILLS_NEEDED
         }
 
+    def version_keys(self):
+        """Gets the keys of the versioned data (see VersionModel) that change when this activity changes:
+        every activity, the activity itself and the activities of its week, before and after the change.
+
+        Returns:
+            list of (str): The version keys
+        """
+        history = inspect(self).attrs.week.history
+        weeks = set(history.added or ()) | set(
+            history.unchanged or ()) | set(history.deleted or ())
+        keys = ["activities"] + \
+            [f"week:{int(week)}" for week in weeks if week is not None]
+        if self.activity_id is not None:
+            keys.append(f"activity:{int(self.activity_id)}")
+        return keys
+
+    def agenda_slots(self):
+        """Gets the agenda slot the activity was scheduled to before the pending change and the one it is scheduled to after it.
+
+        Returns:
+            (tuple, tuple): The maintainer username, week, week day and start time before and after the change,
+            None if the activity is not assigned
+        """
+        state = inspect(self)
+        before, after = [], []
+        for name in ("maintainer_username", "week", "week_day", "start_time"):
+            history = state.attrs[name].history
+            after.append((history.added or history.unchanged or (None,))[0])
+            before.append(
+                (history.deleted or history.unchanged or (None,))[0])
+        before = None if None in before else (
+            before[0], int(before[1]), before[2], int(before[3]))
+        after = None if None in after else (
+            after[0], int(after[1]), after[2], int(after[3]))
+        return before, after
+
     def save_to_db(self):
-        """Saves user instance to the database"""
+        """Saves activity instance to the database"""
+        before, after = self.agenda_slots()
         db.session.add(self)
+        VersionModel.bump(self.version_keys())
+        # the identifier of a new activity is known once it is inserted
+        db.session.flush()
+        agenda_feed.record(self.activity_id, before, after)
         db.session.commit()
 
     def update(self, data):
@@ -102,18 +199,37 @@ class MaintenanceActivityModel(db.Model):
 
     def delete_from_db(self):
         """Deletes MaintenanceActivityModel instance from database"""
+        before, _ = self.agenda_slots()
+        VersionModel.bump(self.version_keys())
+        agenda_feed.record(self.activity_id, before, None)
         db.session.delete(self)
         db.session.commit()
 
     @classmethod
-    def find_by_id(cls, activity_id):
+    def find_by_id(cls, activity_id, fields=None):
         """Finds a Maintenance Activity in the database based on given id.
         Args:
             activity_id (int): The identifier of the Maintenance Activity to retrieve.
+            fields (list of (str), optional): The public representation keys to load. Defaults to every key.
         Returns:
             MaintenanceActivityModel: The found activity
         """
-        return cls.query.filter_by(activity_id=activity_id).first()
+        return cls._select(fields).filter_by(activity_id=activity_id).first()
+
+    @classmethod
+    def find_by_ids(cls, activity_ids, fields=None):
+        """Finds many Maintenance Activities in the database with a single query.
+
+        Args:
+            activity_ids (list of (int)): The identifiers of the Maintenance Activities to retrieve.
+            fields (list of (str), optional): The public representation keys to load. Defaults to every key.
+
+        Returns:
+            list of (MaintenanceActivityModel): The found activities, in the order of the given identifiers
+        """
+        activities = {activity.activity_id: activity for activity in
+                      cls._select(fields).filter(cls.activity_id.in_(activity_ids)).all()}
+        return [activities[activity_id] for activity_id in activity_ids if activity_id in activities]
 
     @classmethod
     def find_all(cls):
@@ -124,25 +240,26 @@ class MaintenanceActivityModel(db.Model):
         return cls.query.all()
 
     @classmethod
-    def find_some(cls, current_page=1, page_size=10):
+    def find_some(cls, current_page=1, page_size=10, fields=None):
         """Finds the selected page of Maintenance Activitis by means of given current_page and page_size.
             Fails if current_page does not exist.
 
         Args:
             current_page (int, optional): The desired page number, starting from 1. Defaults to 1.
             page_size (int, optional): The desired page size. Defaults to 10.
+            fields (list of (str), optional): The public representation keys to load. Defaults to every key.
 
         Returns:
             ( list of (MaintenanceActivityModel), dict of (str, int) ): 
             The first tuple element is a list of paginated MaintenanceActivityModel instances; 
             The second tuple element is the pagination metadata;
             """
-        rows = cls.query.offset(
+        rows = cls._select(fields).offset(
             page_size*(current_page-1)).limit(page_size).all()
 
-        meta = get_metadata(
-            cls.query.paginate(page=current_page, per_page=page_size)
-        )
+        meta = get_metadata(count_pages(
+            cls.query,
+            current_page, page_size))
         return rows, meta
 
     @classmethod
@@ -181,15 +298,15 @@ class MaintenanceActivityModel(db.Model):
                 .limit(page_size)
                 .all())
 
-        meta = get_metadata(
+        meta = get_metadata(count_pages(
             cls.query
             .filter_by(week=week)
-            .filter_by(week_day=week_day)
-            .paginate(page=current_page, per_page=page_size)
-        )
+            .filter_by(week_day=week_day),
+            current_page, page_size))
         return rows, meta
 
     @classmethod
+    @traced()
     def find_all_in_day_for_user(cls, username, week, week_day, exclude=None):
         """Finds every Maintenance Activity for a given day and a given user
 
@@ -235,13 +352,12 @@ class MaintenanceActivityModel(db.Model):
                 .limit(page_size)
                 .all())
 
-        meta = get_metadata(
+        meta = get_metadata(count_pages(
             cls.query
             .filter_by(maintainer_username=username)
             .filter_by(week=week)
-            .filter_by(week_day=week_day)
-            .paginate(page=current_page, per_page=page_size)
-        )
+            .filter_by(week_day=week_day),
+            current_page, page_size))
         return rows, meta
 
     @classmethod
@@ -257,7 +373,23 @@ class MaintenanceActivityModel(db.Model):
         return cls.query.filter_by(week=week).all()
 
     @classmethod
-    def find_some_in_week(cls, week, current_page=1, page_size=10):
+    def find_assigned_in_week(cls, week):
+        """Finds every Maintenance Activity assigned to a maintainer for a given week, loading only its agenda slot
+
+        Args:
+            week (int): The nth week of the year
+
+        Returns:
+            list of (MaintenanceActivityModel): List of found Maintenance Activities, ordered by identifier
+        """
+        return (cls._select(["maintainer_username", "week", "week_day", "start_time", "estimated_time"])
+                .filter_by(week=week)
+                .filter(cls.maintainer_username.isnot(None))
+                .order_by(cls.activity_id)
+                .all())
+
+    @classmethod
+    def find_some_in_week(cls, week, current_page=1, page_size=10, fields=None):
         """Finds the selected page of Maintenance Activitis for a given week by means of given current_page and page_size.
             Fails if current_page does not exist.
 
@@ -265,23 +397,23 @@ class MaintenanceActivityModel(db.Model):
             week (int): The nth week of the year
             current_page (int, optional): The desired page number, starting from 1. Defaults to 1.
             page_size (int, optional): The desired page size. Defaults to 10.
+            fields (list of (str), optional): The public representation keys to load. Defaults to every key.
 
         Returns:
             ( list of (MaintenanceActivityModel), dict of (str, int) ): 
             The first tuple element is a list of paginated MaintenanceActivityModel instances; 
             The second tuple element is the pagination metadata;
         """
-        rows = (cls.query
+        rows = (cls._select(fields)
                 .filter_by(week=week)
                 .offset(page_size*(current_page-1))
                 .limit(page_size)
                 .all())
 
-        meta = get_metadata(
+        meta = get_metadata(count_pages(
             cls.query
-            .filter_by(week=week)
-            .paginate(page=current_page, per_page=page_size)
-        )
+            .filter_by(week=week),
+            current_page, page_size))
         return rows, meta
 
     @classmethod
@@ -0,0 +1,74 @@
+from db import db
+
+
+class RevokedTokenModel(db.Model):
+    """Revoked Token class for database interaction.
+    Every row is a revoked jwt id that can be removed once the token itself has expired"""
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.Integer, index=True)
+    revoked_at = db.Column(db.Float, index=True)
+
+    def __init__(self, jti, expires_at, revoked_at):
+        """RevokedTokenModel constructor.
+
+        Args:
+            jti (str): The unique identifier of the revoked jwt
+            expires_at (int): The unix timestamp after which the token is no longer valid anyway
+            revoked_at (float): The unix timestamp of the revocation
+        """
+        self.jti = jti
+        self.expires_at = expires_at
+        self.revoked_at = revoked_at
+
+    def save_to_db(self):
+        """Saves revoked token instance to the database"""
+        db.session.merge(self)
+        db.session.commit()
+
+    @classmethod
+    def is_revoked(cls, jti, now):
+        """Checks if a jwt id has been revoked and its token has not expired yet.
+
+        Args:
+            jti (str): The unique identifier of the jwt
+            now (float): The current unix timestamp
+
+        Returns:
+            bool: True if the token is revoked
+        """
+        return db.session.query(
+            cls.query.filter_by(jti=jti).filter(cls.expires_at > now).exists()).scalar()
+
+    @classmethod
+    def find_jtis_revoked_since(cls, since, now):
+        """Finds the identifiers of the not expired tokens revoked after a given instant.
+
+        Args:
+            since (float): The unix timestamp to start from
+            now (float): The current unix timestamp
+
+        Returns:
+            list of (str): List of revoked jwt ids
+        """
+        rows = (db.session.query(cls.jti)
+                .filter(cls.revoked_at >= since)
+                .filter(cls.expires_at > now)
+                .all())
+        return [row.jti for row in rows]
+
+    @classmethod
+    def delete_expired(cls, now):
+        """Deletes every revoked token whose jwt has already expired, in a transaction of its own
+        so that the session of the current request is not committed.
+
+        Args:
+            now (float): The current unix timestamp
+
+        Returns:
+            int: The number of deleted rows
+        """
+        with db.engine.begin() as connection:
+            return connection.execute(
+                cls.__table__.delete().where(cls.__table__.c.expires_at <= now)).rowcount
@@ -1,7 +1,12 @@
 from models.maintenance_activity import MaintenanceActivityModel
 from db import db
-from common.utils import get_metadata
-from werkzeug.security import generate_password_hash
+from sqlalchemy import inspect
+from models.version import VersionModel
+from common.utils import count_pages, get_metadata
+from common.password_hasher import hasher
+from common.metrics import metrics
+from common.tracing import traced
+from common.agenda import calculate_agenda
 from config import MAINTAINER_WORK_HOURS, MAINTAINER_WORK_START_HOUR
 from exceptions.role_error import RoleError
 from exceptions.invalid_agenda_error import InvalidAgendaError
@@ -30,9 +35,12 @@ class UserModel(db.Model):
             username (str): The user username
             password (str): The user password
             role (str): The user role (admin, maintainer or planner)
+
+        Raises:
+            HashingBusyError: If there are already too many pending password hashes
         """
         self.username = username
-        self.password = generate_password_hash(password)
+        self.password = hasher.hash(password)
         self.role = role
 
     def json(self):
@@ -47,9 +55,22 @@ class UserModel(db.Model):
             "role": self.role
         }
 
+    def version_keys(self):
+        """Gets the keys of the versioned data (see VersionModel) that change when this user changes:
+        every user and the user itself, before and after the change.
+
+        Returns:
+            list of (str): The version keys
+        """
+        history = inspect(self).attrs.username.history
+        usernames = set(history.added or ()) | set(
+            history.unchanged or ()) | set(history.deleted or ())
+        return ["users"] + [f"user:{username}" for username in usernames if username is not None]
+
     def save_to_db(self):
         """Saves user instance to the database"""
         db.session.add(self)
+        VersionModel.bump(self.version_keys())
         db.session.commit()
 
     def update(self, data):
@@ -62,8 +83,7 @@ class UserModel(db.Model):
             if(data[k] and k != "password"):
                 setattr(self, k, data[k])
             elif(k == "password"):
-                setattr(self, "password",
-                        generate_password_hash(data["password"]))
+                setattr(self, "password", hasher.hash(data["password"]))
 
     def update_and_save(self, data):
         """Updates user instance with passed data and saves it to the database. 
@@ -76,6 +96,7 @@ class UserModel(db.Model):
 
     def delete_from_db(self):
         """Deletes user instance from database"""
+        VersionModel.bump(self.version_keys())
         db.session.delete(self)
         db.session.commit()
 
@@ -116,9 +137,9 @@ class UserModel(db.Model):
         rows = cls.query.offset(
             page_size*(current_page-1)).limit(page_size).all()
 
-        meta = get_metadata(
-            cls.query.paginate(page=current_page, per_page=page_size)
-        )
+        meta = get_metadata(count_pages(
+            cls.query,
+            current_page, page_size))
         return rows, meta
 
     @classmethod
@@ -146,10 +167,9 @@ class UserModel(db.Model):
         rows = cls.query.filter_by(role="maintainer").offset(
             page_size*(current_page-1)).limit(page_size).all()
 
-        meta = get_metadata(
-            cls.query.filter_by(role="maintainer").paginate(
-                page=current_page, per_page=page_size)
-        )
+        meta = get_metadata(count_pages(
+            cls.query.filter_by(role="maintainer"),
+            current_page, page_size))
         return rows, meta
 
     def get_daily_activities(self, week, week_day, exclude=None):
@@ -214,6 +234,7 @@ class UserModel(db.Model):
             """
             return self.agenda
 
+        @traced()
         def _calculate_agenda_dictionary(self, append=None):
             """Private method used to calculate the dictionary of user's daily availabilities
 
@@ -226,31 +247,13 @@ class UserModel(db.Model):
             Returns:
                 dict of (str, int): The dictionary with the work hour as key and the minutes left free for the user in that hour
             """
+            metrics.observe_agenda_computation("daily_agenda")
             activities = self.user.get_daily_activities(
                 self.week, self.week_day, self.exclude)
             if append:
                 activities.append(append)
-            d = {}
-
-            for hour in range(self.user.work_start_hour, self.user.work_start_hour+self.user.work_hours):
-                d[hour] = 60
-            for activity in activities:
-                d[activity.start_time] -= activity.estimated_time
-
-            visited_hours = []
-            for hour in sorted(d.keys(), reverse=True):
-                if d[hour] < 0:
-                    for visited_hour in reversed(visited_hours):
-                        m = min(d[visited_hour], -d[hour])
-                        d[visited_hour] -= m
-                        d[hour] += m
-                        if d[hour] >= 0:
-                            break
-                    if d[hour] != 0:
-                        raise InvalidAgendaError()
-
-                visited_hours.append(hour)
-            return d
+            return calculate_agenda(((activity.start_time, activity.estimated_time) for activity in activities),
+                                    self.user.work_start_hour, self.user.work_hours)
 
         def is_activity_insertable(self, activity_id, start_time):
             """Checks if a new activity can be inserted in the user's schedule given his time left in the DailyAgenda
@@ -363,6 +366,7 @@ class UserModel(db.Model):
             Returns:
                 (str): A string representing the percentage availability for an user in a whole day.
             """
+            metrics.observe_agenda_computation("daily_percentage")
             activities = self.user.get_daily_activities(
                 self.week, self.week_day, self.exclude)
             busy_minutes = MaintenanceActivityModel.get_total_estimated_time(
@@ -424,6 +428,7 @@ class UserModel(db.Model):
             Returns:
                 dict of (str, str): The dictionary with the day of the week as key and the percentage left free for the user in that day
             """
+            metrics.observe_agenda_computation("weekly_percentage")
             d = {}
             for week_day in self._week_days:
                 d[week_day] = self.user.get_daily_percentage_availability(
@@ -438,6 +443,7 @@ class UserModel(db.Model):
             """
             return self.d
 
+    @traced()
     def get_weekly_percentage_availability(self, week, exclude=None):
         """Returns a WeeklyPercentageAvailability for the user instance
 
@@ -0,0 +1,85 @@
+from db import db
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class VersionModel(db.Model):
+    """Version class for database interaction.
+    Every row is a counter bumped whenever the data it stands for changes (i.e.: every user, every activity in a week),
+    so that readers can tell if their copy of the data is still up to date with a single lookup"""
+    __tablename__ = "versions"
+
+    key = db.Column(db.String(160), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    _upserts = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+    _commit_listeners = []
+
+    def __init__(self, key, version=0):
+        """VersionModel constructor.
+
+        Args:
+            key (str): The name of the versioned data (i.e.: users, week:12)
+            version (int, optional): The current version. Defaults to 0.
+        """
+        self.key = key
+        self.version = version
+
+    @classmethod
+    def bump(cls, keys):
+        """Increments the counters for the given keys within the current transaction, creating the missing ones.
+        The caller is responsible for committing the transaction, together with the change that caused the bump.
+        Once the transaction is committed the keys are passed to the on_commit listeners.
+
+        Args:
+            keys (iterable of (str)): The names of the changed data
+        """
+        keys = set(keys)
+        db.session.info.setdefault("bumped_version_keys", set()).update(keys)
+        connection = db.session.connection()
+        upsert = cls._upserts.get(connection.dialect.name)
+        for key in sorted(keys):
+            if upsert:
+                statement = upsert(cls.__table__).values(key=key, version=1)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[cls.key], set_={"version": cls.version + 1}))
+            elif not cls.query.filter_by(key=key).update({cls.version: cls.version + 1}, synchronize_session=False):
+                db.session.add(cls(key, 1))
+
+    @classmethod
+    def on_commit(cls, listener):
+        """Registers a function called with the keys bumped by a transaction once it has been committed
+
+        Args:
+            listener (callable): Function that takes the set of bumped keys
+        """
+        if listener not in cls._commit_listeners:
+            cls._commit_listeners.append(listener)
+
+    @classmethod
+    def find_versions(cls, keys):
+        """Finds the current counters for the given keys
+
+        Args:
+            keys (list of (str)): The names of the data
+
+        Returns:
+            dict of (str, int): The version for every key, 0 for data that has never changed
+        """
+        versions = dict.fromkeys(keys, 0)
+        versions.update(db.session.query(cls.key, cls.version)
+                        .filter(cls.key.in_(keys)).all())
+        return versions
+
+
+@event.listens_for(db.session, "after_commit")
+def _notify_commit(session):
+    keys = session.info.pop("bumped_version_keys", None)
+    if keys:
+        for listener in VersionModel._commit_listeners:
+            listener(keys)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_bumps(session):
+    session.info.pop("bumped_version_keys", None)
@@ -0,0 +1,90 @@
+from flask import Response, stream_with_context
+from flask_restful import Resource
+from jwt_utils import role_required
+from common.agenda_feed import agenda_feed
+from common.json_representation import dumps
+from common.schema import Field, Schema
+from db import db
+from exceptions.event_streams_busy_error import EventStreamsBusyError
+
+
+def _event(name, data):
+    """Private function used to format a server-sent event
+
+    Args:
+        name (str): The event name
+        data (any): The event data, sent as json
+
+    Returns:
+        bytes: The event
+    """
+    return b"event: " + name.encode() + b"\ndata: " + dumps(data).rstrip(b"\n") + b"\n\n"
+
+
+class AgendaEvents(Resource):
+    """AgendaEvents API to follow the changes of the maintainers' agendas in a week as server-sent events"""
+    # Events must reach the client as soon as they are sent
+    compression = False
+
+    _events_parser = Schema(
+        Field("week",
+              type=int,
+              required=True,
+              location="args",
+              help="Week should be an integer between 1 and 52")
+    )
+
+    @classmethod
+    @role_required("planner")
+    def get(cls):
+        """Opens a text/event-stream response that sends an 'agenda' event with the delta of every committed
+        assignment, edit or deletion of an activity of the week.
+        The changes committed by every worker are sent within EVENTS_POLL_INTERVAL seconds.
+        A heartbeat comment is sent every EVENTS_HEARTBEAT_INTERVAL seconds; if the week has been changed
+        without a delta meanwhile (i.e.: an activity that is not assigned), a 'resync' event is sent instead,
+        after which the client should reload the agendas. A 'dropped' event closes the stream of clients that do not keep up with the events, a 'closing'
+        event the streams of a stopping worker: the client should open a new stream.
+        A worker serves at most EVENTS_MAX_STREAMS streams, the others are refused with a 503.
+
+        Args:
+            week (int): Query param indicating the nth week of the year
+
+        Returns:
+            Response: The event stream, or dict of (str, str): error message
+        """
+        week = cls._events_parser.parse_args()["week"]
+        version = agenda_feed.week_version(week)
+        try:
+            subscription = agenda_feed.subscribe(week, version)
+        except EventStreamsBusyError as e:
+            return {"message": e.message}, 503
+        # The stream can last for hours, its connection goes back to the pool until the next heartbeat
+        db.session.remove()
+
+        def stream(version):
+            try:
+                yield _event("ready", {"week": week, "version": version})
+                while True:
+                    event = subscription.get(agenda_feed.heartbeat_interval)
+                    if subscription.closed:
+                        yield _event("closing", {"week": week})
+                        return
+                    if subscription.dropped:
+                        yield _event("dropped", {"week": week})
+                        return
+                    if event is not None:
+                        version = max(version, event["version"])
+                        yield _event("agenda", event)
+                        continue
+                    current_version = agenda_feed.week_version(week)
+                    db.session.remove()
+                    if current_version != version:
+                        version = current_version
+                        yield _event("resync", {"week": week, "version": version})
+                    else:
+                        yield b": heartbeat\n\n"
+            finally:
+                agenda_feed.unsubscribe(subscription)
+
+        return Response(stream_with_context(stream(version)), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,46 @@
+from flask import current_app, request
+from flask_restful import Resource
+from jwt_utils import verify_jwt_in_request_cached
+from common.schema import Field, Schema
+
+
+def _sub_requests(value):
+    """Private function used to validate the sub-requests with the dispatcher of the current app
+
+    Args:
+        value (any): The requests body param
+
+    Returns:
+        list of (dict of (str, any)): The validated sub-requests
+    """
+    return current_app.extensions["batch_dispatcher"].validate(value)
+
+
+class Batch(Resource):
+    """Batch API to run several API calls in a single round trip"""
+    _batch_parser = Schema(
+        Field("requests",
+              type=_sub_requests,
+              required=True,
+              location="json")
+    )
+
+    @classmethod
+    def post(cls):
+        """Runs a list of sub-requests through the other resources, with the access token of the batch.
+            The token is verified once for the whole batch. Consecutive GET sub-requests run concurrently,
+            any other sub-request runs after the previous ones have completed.
+            Fails if there are too many sub-requests or a sub-request is a batch itself.
+
+        Args:
+            requests (list of (dict of (str, any))): Body param indicating the sub-requests, every one with
+                method (defaults to GET), path, query (optional query string arguments) and body (optional json body).
+
+        Returns:
+            dict of (str, any): Json of responses, the list of status and body of every sub-request, in the same order
+        """
+        verify_jwt_in_request_cached()
+        data = cls._batch_parser.parse_args()
+        responses = current_app.extensions["batch_dispatcher"].dispatch(
+            data["requests"], request.headers.get("Authorization"), request.remote_addr)
+        return {"responses": responses}, 200
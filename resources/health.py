@@ -0,0 +1,49 @@
+from flask import current_app, request
+from flask_restful import Resource
+from blacklist import BLACKLIST
+from jwt_utils import role_required
+from common.metrics import pool_status
+
+
+class Health(Resource):
+    """Health API for the liveness checks"""
+    @classmethod
+    def get(cls):
+        """Checks that the process serves requests, without touching the database
+
+        Returns:
+            dict of (str, str): Json of status.
+        """
+        return {"status": "ok"}, 200
+
+
+class Readiness(Resource):
+    """Readiness API for the load balancer checks"""
+    @classmethod
+    def get(cls):
+        """Checks that the process can serve traffic: the database answers a ping, made at most once every
+        READINESS_PING_INTERVAL seconds. Requests with an access token get the details of the ping, the database
+        pool state, the size and hit ratio of the caches and the state of the revoked tokens store as well,
+        if the token is an admin's.
+
+        Returns:
+            dict of (str, any): Json of status and database, with pool, caches and revocation_store for admins,
+            with status code 503 if the database does not answer.
+        """
+        database = current_app.extensions["readiness_probe"].database()
+        status = "ok" if database["ok"] else "unavailable"
+        status_code = 200 if database["ok"] else 503
+        if not request.headers.get("Authorization"):
+            return {"status": status, "database": {"ok": database["ok"]}}, status_code
+        return cls._details(status, database, status_code)
+
+    @staticmethod
+    @role_required()
+    def _details(status, database, status_code):
+        caches = {name: current_app.extensions[name].status()
+                  for name in ("response_cache", "verified_token_cache") if name in current_app.extensions}
+        return {"status": status,
+                "database": database,
+                "pool": pool_status(),
+                "caches": caches,
+                "revocation_store": BLACKLIST.status()}, status_code
@@ -0,0 +1,137 @@
+from flask import Response, current_app, stream_with_context
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt_claims, get_jwt_identity
+from jwt_utils import verify_jwt_in_request_cached
+from common.schema import Field, Schema
+from common.jobs import find_job_kind
+from models.job import JobModel
+from models.job_result_chunk import JobResultChunkModel
+import time
+
+
+def _find_own_job(id):
+    """Private function used to find a job queued by the current user. Admins can see every job.
+
+    Args:
+        id (int): The identifier of the job
+
+    Returns:
+        JobModel: The found job, None if it does not exist or it belongs to another user
+    """
+    job = JobModel.find_by_id(id)
+    if job is None or (job.created_by != get_jwt_identity() and get_jwt_claims().get("role") != "admin"):
+        return None
+    return job
+
+
+class JobCreate(Resource):
+    """Job API to queue background jobs"""
+    _job_parser = Schema(
+        Field("kind",
+              type=str,
+              required=True,
+              location="json",
+              help="Kind should be the name of a job kind"),
+        Field("params",
+              type=dict,
+              default=dict,
+              location="json",
+              help="Params should be an object")
+    )
+
+    @classmethod
+    def post(cls):
+        """Queues a job, run in the background by one of the workers.
+            Fails if the kind does not exist, the user's role cannot queue it or the params are not valid.
+
+        Args:
+            kind (str): Body param indicating the job kind (i.e.: export_activities, import_activities).
+            params (dict of (str, any), optional): Body param indicating the parameters of the job. Defaults to {}.
+
+        Returns:
+            dict of (str, any): Jsonified job or error message, with the job url in the Location header.
+        """
+        verify_jwt_in_request_cached()
+        data = cls._job_parser.parse_args()
+        kind = find_job_kind(data["kind"])
+        if kind is None:
+            return {"message": f"Unknown job kind '{data['kind']}'"}, 400
+        role = get_jwt_claims().get("role")
+        if role != kind.role:
+            return {"error": "role_mismatch", "message": f"Wanted '{kind.role}', but got '{role}'."}, 403
+        try:
+            params = kind.validate(
+                data["params"]) if kind.validate else data["params"]
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        job = current_app.extensions["job_runner"].submit(
+            kind.name, params, get_jwt_identity())
+        return job.json(), 202, {"Location": f"/jobs/{job.id}"}
+
+
+class Job(Resource):
+    """Job API for get (status and progress) and delete (cancellation) operations"""
+    @classmethod
+    def get(cls, id):
+        """Gets the status and progress of a job of the current user.
+            Fails if there is no such job.
+
+        Args:
+            id (int): The identifier of the job.
+
+        Returns:
+            dict of (str, any): Jsonified job or error message.
+        """
+        verify_jwt_in_request_cached()
+        job = _find_own_job(id)
+        if not job:
+            return {"message": "Job not found"}, 404
+        return job.json(), 200
+
+    @classmethod
+    def delete(cls, id):
+        """Cancels a job of the current user: a queued job right away, a running job at its next progress report.
+            Fails if there is no such job or it has already finished.
+
+        Args:
+            id (int): The identifier of the job.
+
+        Returns:
+            dict of (str, any): Jsonified job or error message.
+        """
+        verify_jwt_in_request_cached()
+        job = _find_own_job(id)
+        if not job:
+            return {"message": "Job not found"}, 404
+        if not JobModel.cancel(id, time.time()):
+            return {"message": "Job already finished"}, 400
+        return JobModel.find_by_id(id).json(), 200
+
+
+class JobResultDownload(Resource):
+    """Job API to download the result of a job"""
+    @classmethod
+    def get(cls, id):
+        """Downloads the result of a succeeded job of the current user, as a file if the job produced one.
+            A file the job has written chunk by chunk is streamed one chunk at a time.
+            Fails if there is no such job or it has no result.
+
+        Args:
+            id (int): The identifier of the job.
+
+        Returns:
+            Response: The result, or an error message.
+        """
+        verify_jwt_in_request_cached()
+        job = _find_own_job(id)
+        if not job:
+            return {"message": "Job not found"}, 404
+        if job.status != "succeeded" or job.result_type is None:
+            return {"message": "Job result not available"}, 404
+        headers = {"Content-Disposition": f'attachment; filename="{job.result_name}"'} if job.result_name else {}
+        if job.result is not None:
+            return Response(job.result, content_type=job.result_type, headers=headers)
+        # compressed chunk by chunk as well, see Compression
+        return Response(stream_with_context(JobResultChunkModel.iter_data(id)), content_type=job.result_type,
+                        headers=headers)
@@ -1,23 +1,42 @@
-from flask_restful import Resource, reqparse
+from flask_restful import Resource
+from werkzeug.exceptions import HTTPException
 from jwt_utils import role_required
+from common.schema import Field, Schema
+from common.etag import conditional
+from common.tracing import traced
 from models.user import UserModel
 from models.maintenance_activity import MaintenanceActivityModel
 
 
 class MaintainerWeeklyAvailabilityList(Resource):
     """MaintainerAvailability API to get the maintainer's weekly availabilities"""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("current_page",
-                                  type=int,
-                                  default=1
-                                  )
-    _activity_parser.add_argument("page_size",
-                                  type=int,
-                                  default=10
-                                  )
+    _activity_parser = Schema(
+        Field("current_page",
+              type=int,
+              default=1),
+        Field("page_size",
+              type=int,
+              default=10)
+    )
+
+    @classmethod
+    def _version_keys(cls, activity_id):
+        """Private method used to get the keys of the versioned data the availabilities depend on:
+        the users and the activities in the week of the activity to be assigned
+
+        Args:
+            activity_id (int): The identifier of the maintenance activity to be assigned.
+
+        Returns:
+            list of (str): The version keys, or None if the activity does not exist
+        """
+        activity = MaintenanceActivityModel.find_by_id(activity_id, ["week"])
+        return ["users", f"week:{activity.week}"] if activity else None
 
     @classmethod
     @role_required("planner")
+    @conditional(lambda cls, activity_id: cls._version_keys(activity_id), cached=True)
+    @traced()
     def get(cls, activity_id):
         """Gets a paginated list of Maintainers weekly availability, along with its metadata.
         For every user it returns aswell the user itself, the user's skill compliance (expressed as a fraction) 
@@ -51,20 +70,40 @@ class MaintainerWeeklyAvailabilityList(Resource):
 
 class MaintainerDailyAvailability(Resource):
     """MaintainerAvailability API to get the maintainer's daily availabilities"""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("activity_id",
-                                  type=int,
-                                  required=True,
-                                  help="A valid activity_id for the activity that the planner wants to assign"
-                                  )
-    _activity_parser.add_argument("week_day",
-                                  type=str,
-                                  required=True,
-                                  help="Week should be a valid weekday name (i.e: monday, tuesday, ...)"
-                                  )
+    _activity_parser = Schema(
+        Field("activity_id",
+              type=int,
+              required=True,
+              help="A valid activity_id for the activity that the planner wants to assign"),
+        Field("week_day",
+              type=str,
+              required=True,
+              help="Week should be a valid weekday name (i.e: monday, tuesday, ...)")
+    )
+
+    @classmethod
+    def _version_keys(cls, username):
+        """Private method used to get the keys of the versioned data the agenda depends on:
+        the user and the activities in the week of the activity to be assigned
+
+        Args:
+            username (str): The username of the maintainer
+
+        Returns:
+            list of (str): The version keys, or None if the request is not valid
+        """
+        try:
+            data = cls._activity_parser.parse_args()
+        except HTTPException:
+            return None
+        activity = MaintenanceActivityModel.find_by_id(
+            data["activity_id"], ["week"])
+        return [f"user:{username}", f"week:{activity.week}"] if activity else None
 
     @classmethod
     @role_required("planner")
+    @conditional(lambda cls, username: cls._version_keys(username), cached=True)
+    @traced()
     def get(cls, username):
         """Gets the public representation of the DailyAgenda for a user with given username based on the week associated with
         the activity with given activity_id and the given week_day.
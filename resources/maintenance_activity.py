@@ -1,39 +1,50 @@
 from config import MAINTAINER_WORK_HOURS, MAINTAINER_WORK_START_HOUR
 from models.maintenance_activity import MaintenanceActivityModel
 from models.user import UserModel
-from flask_restful import Resource, reqparse
+from flask_restful import Resource
 from jwt_utils import role_required
+from common.schema import Field, Schema
+from common.etag import conditional
+from common.utils import id_list
 
 
 class MaintenanceActivity(Resource):
     """MaintenanceActivity API for get (single), put and delete operations."""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("workspace_notes",
-                                  type=str,
-                                  required=False,
-                                  help="Workspace Notes should be a short description of the workspace"
-                                  )
+    _activity_parser = Schema(
+        Field("workspace_notes",
+              type=str,
+              required=False,
+              help="Workspace Notes should be a short description of the workspace")
+    )
+    _fields_parser = Schema(
+        Field("fields",
+              type=MaintenanceActivityModel.parse_fields,
+              location="args")
+    )
 
     @classmethod
     @role_required("planner")
+    @conditional(lambda cls, id: [f"activity:{id}"], cached=True)
     def get(cls, id):
         """Gets one activity from database based on given id.
             Fails if there is no activity with that id.
 
         Args:
             id (int): The identifier of the maintenance activity to be retrieved.
+            fields (str, optional): Query param indicating the comma separated keys to return. Defaults to every key.
 
         Returns:
             dict of (str, any): Jsonified activity or error message.
         """
+        fields = cls._fields_parser.parse_args()["fields"]
         try:
-            activity = MaintenanceActivityModel.find_by_id(id)
+            activity = MaintenanceActivityModel.find_by_id(id, fields)
         except Exception as e:
             return {"error": str(e)}, 500
 
         if not activity:
             return {"message": "Activity not found"}, 404
-        return activity.json(), 200
+        return activity.json(fields), 200
 
     @classmethod
     @role_required("planner")
@@ -86,92 +97,107 @@ class MaintenanceActivity(Resource):
 
 class MaintenanceActivityList(Resource):
     """Maintenance Activity API for get (multiple) operations."""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("week",
-                                  type=int,
-                                  required=False
-                                  )
-    _activity_parser.add_argument("current_page",
-                                  type=int,
-                                  default=1
-                                  )
-    _activity_parser.add_argument("page_size",
-                                  type=int,
-                                  default=10
-                                  )
+    _activity_parser = Schema(
+        Field("week",
+              type=int,
+              required=False),
+        Field("current_page",
+              type=int,
+              default=1),
+        Field("page_size",
+              type=int,
+              default=10),
+        Field("fields",
+              type=MaintenanceActivityModel.parse_fields,
+              required=False),
+        Field("ids",
+              type=id_list,
+              required=False)
+    )
+
+    @classmethod
+    def _version_keys(cls):
+        """Private method used to get the keys of the versioned data the requested page depends on
+
+        Returns:
+            list of (str): The version keys
+        """
+        data = cls._activity_parser.parse_args()
+        return [f"week:{data['week']}"] if data["week"] and not data["ids"] else ["activities"]
 
     @classmethod
     @role_required("planner")
+    @conditional(lambda cls: cls._version_keys(), cached=True)
     def get(cls):
         """Gets a paginated list of activites, along with its metadata. Takes current_page and page_size as optional body arguments.
+            When ids is given, gets the activities with those identifiers instead of a page.
 
         Args:
+            week (int, optional): Body param indicating the week of the activities.
             current_page (int, optional): Body param indicating the requested page. Defaults to 1.
             page_size (int, optional): Body param indicating the page size. Defaults to 10.
+            fields (str, optional): Body param indicating the comma separated keys to return for every activity. Defaults to every key.
+            ids (str, optional): Body param indicating the comma separated identifiers of the activities to get.
 
         Returns:
             dict of (str, any): Json of rows and meta. Rows is the list of paginated activities; meta is its metadata;
         """
         data = cls._activity_parser.parse_args()
         rows, meta = [], {}
-        if data["week"]:
+        if data["ids"]:
+            rows = MaintenanceActivityModel.find_by_ids(
+                data["ids"], data["fields"])
+            meta = {"count": len(rows)}
+        elif data["week"]:
             rows, meta = MaintenanceActivityModel.find_some_in_week(
-                **data)
+                data["week"], data["current_page"], data["page_size"], data["fields"])
         else:
             rows, meta = MaintenanceActivityModel.find_some(
-                data["current_page"], data["page_size"])
+                data["current_page"], data["page_size"], data["fields"])
 
-        return {"rows": [activity.json() for activity in rows], "meta": meta}, 200
+        return {"rows": [activity.json(data["fields"]) for activity in rows], "meta": meta}, 200
 
 
 class MaintenanceActivityCreate(Resource):
     """Maintenance Activity API for post operations."""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("activity_type",
-                                  type=str,
-                                  required=True,
-                                  help="Type should be planned, unplanned or extra"
-                                  )
-    _activity_parser.add_argument("site",
-                                  type=str,
-                                  required=True,
-                                  help="Site should be a factory's location"
-                                  )
-    _activity_parser.add_argument("typology",
-                                  type=str,
-                                  required=True,
-                                  help="Typology should be the context of the Maintenance Activity"
-                                  )
-    _activity_parser.add_argument("description",
-                                  type=str,
-                                  required=True,
-                                  help="Description of the activity"
-                                  )
-    _activity_parser.add_argument("estimated_time",
-                                  type=int,
-                                  required=True,
-                                  help="estimated_time should be the expected duration of the activity, in minutes"
-                                  )
-    _activity_parser.add_argument("interruptible",
-                                  type=bool,
-                                  required=True,
-                                  help="Interruptible should be True (yes) or False (not)"
-                                  )
-    _activity_parser.add_argument("materials",
-                                  type=str,
-                                  required=False,
-                                  help="Materials should be the list of materials needed for the activity"
-                                  )
-    _activity_parser.add_argument("week",
-                                  type=int,
-                                  required=True,
-                                  help="Week should be an integer between 1 and 52"
-                                  )
-    _activity_parser.add_argument("workspace_notes",
-                                  type=str,
-                                  required=False,
-                                  help="Workspace Notes should be a short description of the workspace"
-                                  )
+    _activity_parser = Schema(
+        Field("activity_type",
+              type=str,
+              required=True,
+              help="Type should be planned, unplanned or extra"),
+        Field("site",
+              type=str,
+              required=True,
+              help="Site should be a factory's location"),
+        Field("typology",
+              type=str,
+              required=True,
+              help="Typology should be the context of the Maintenance Activity"),
+        Field("description",
+              type=str,
+              required=True,
+              help="Description of the activity"),
+        Field("estimated_time",
+              type=int,
+              required=True,
+              help="estimated_time should be the expected duration of the activity, in minutes"),
+        Field("interruptible",
+              type=bool,
+              required=True,
+              help="Interruptible should be True (yes) or False (not)"),
+        Field("materials",
+              type=str,
+              required=False,
+              help="Materials should be the list of materials needed for the activity"),
+        Field("week",
+              type=int,
+              required=True,
+              help="Week should be an integer between 1 and 52"),
+        Field("workspace_notes",
+              type=str,
+              required=False,
+              help="Workspace Notes should be a short description of the workspace")
+    )
 
     @classmethod
     @role_required("planner")
@@ -205,22 +231,20 @@ class MaintenanceActivityCreate(Resource):
 
 class MaintenanceActivityAssign(Resource):
     """MaintenanceActivity API for activity assignment"""
-    _activity_parser = reqparse.RequestParser()
-    _activity_parser.add_argument("maintainer_username",
-                                  type=str,
-                                  required=True,
-                                  help="maintainer_username should be a valid maintainer username"
-                                  )
-    _activity_parser.add_argument("week_day",
-                                  type=str,
-                                  required=True,
-                                  help="Week should be a valid weekday name (i.e: monday, tuesday, ...)"
-                                  )
-    _activity_parser.add_argument("start_time",
-                                  type=int,
-                                  required=True,
-                                  help=f"start_time should be an integer between {MAINTAINER_WORK_START_HOUR} and {MAINTAINER_WORK_START_HOUR + MAINTAINER_WORK_HOURS}"
-                                  )
+    _activity_parser = Schema(
+        Field("maintainer_username",
+              type=str,
+              required=True,
+              help="maintainer_username should be a valid maintainer username"),
+        Field("week_day",
+              type=str,
+              required=True,
+              help="Week should be a valid weekday name (i.e: monday, tuesday, ...)"),
+        Field("start_time",
+              type=int,
+              required=True,
+              help=f"start_time should be an integer between {MAINTAINER_WORK_START_HOUR} and {MAINTAINER_WORK_START_HOUR + MAINTAINER_WORK_HOURS}")
+    )
 
     @classmethod
     @role_required("planner")
@@ -0,0 +1,33 @@
+from flask import Response, current_app, request
+from flask_restful import Resource
+from jwt_utils import role_required
+from common.metrics import metrics
+import hmac
+
+
+class Metrics(Resource):
+    """Metrics API to scrape the application metrics"""
+    @classmethod
+    def get(cls):
+        """Gets the request latencies, SQL statement counts and times, agenda computations,
+        database pool state and cache lookups in the Prometheus text format: of every worker process
+        with METRICS_DIR set, of the process that answered otherwise.
+            Fails if the request has neither the METRICS_TOKEN bearer token nor an admin access token.
+
+        Returns:
+            Response: The metrics
+        """
+        token = current_app.config.get("METRICS_TOKEN")
+        authorization = request.headers.get("Authorization", "")
+        if token and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+            return cls._exposition()
+        return cls._admin_exposition()
+
+    @staticmethod
+    def _exposition():
+        return Response(metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @classmethod
+    @role_required()
+    def _admin_exposition(cls):
+        return cls._exposition()
@@ -0,0 +1,40 @@
+from flask import current_app, send_from_directory
+from flask_restful import Resource
+from jwt_utils import role_required
+from common.profiler import parse_profile_name
+from os import path
+
+
+class RequestProfileList(Resource):
+    """RequestProfile API to list the saved request profiles"""
+    @classmethod
+    @role_required()
+    def get(cls):
+        """Gets the saved request profiles of this host, most recent first.
+
+        Returns:
+            dict of (str, any): Json of rows. Every row has the profile name, creation timestamp, request method,
+            route and duration in milliseconds.
+        """
+        return {"rows": current_app.extensions["request_profiler"].profiles()}, 200
+
+
+class RequestProfile(Resource):
+    """RequestProfile API to download a saved request profile"""
+    @classmethod
+    @role_required()
+    def get(cls, name):
+        """Downloads a request profile, to be read with pstats or a profile viewer (i.e.: snakeviz).
+            Fails if there is no profile with that name.
+
+        Args:
+            name (str): The profile name
+
+        Returns:
+            Response: The .pstats file or an error message.
+        """
+        directory = current_app.extensions["request_profiler"].directory
+        if parse_profile_name(name) is None or not path.isfile(path.join(directory, name)):
+            return {"message": "Profile not found"}, 404
+        return send_from_directory(path.abspath(directory), name, as_attachment=True,
+                                   mimetype="application/octet-stream")
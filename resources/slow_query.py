@@ -0,0 +1,56 @@
+from flask import current_app
+from flask_restful import Resource
+from jwt_utils import role_required
+from common.schema import Field, Schema
+
+
+def _order(value):
+    """Private function used to parse the sort key of the offenders
+
+    Args:
+        value (str): The sort key
+
+    Raises:
+        ValueError: If the sort key is not total, max or count
+
+    Returns:
+        str: The sort key
+    """
+    if value not in ("total", "max", "count"):
+        raise ValueError("Order should be total, max or count")
+    return value
+
+
+class SlowQueryList(Resource):
+    """SlowQuery API to list the statements that were slower than SLOW_QUERY_THRESHOLD"""
+    _offenders_parser = Schema(
+        Field("limit",
+              type=int,
+              default=10,
+              location="args",
+              help="Limit should be an integer"),
+        Field("order",
+              type=_order,
+              default="total",
+              location="args",
+              help="Order should be total, max or count")
+    )
+
+    @classmethod
+    @role_required()
+    def get(cls):
+        """Gets the slow statements of this process grouped by fingerprint, worst first.
+        Every offender comes with its number of slow runs, their total and maximum time
+        and the last run, with its parameters, model method, route and plan.
+
+        Args:
+            limit (int, optional): Query param indicating the maximum number of offenders. Defaults to 10.
+            order (str, optional): Query param indicating the sort key: total, max or count. Defaults to total.
+
+        Returns:
+            dict of (str, any): Json of rows and threshold.
+        """
+        slow_query_log = current_app.extensions["slow_query_log"]
+        data = cls._offenders_parser.parse_args()
+        return {"rows": slow_query_log.top(data["limit"], data["order"]),
+                "threshold": slow_query_log.threshold}, 200
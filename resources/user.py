@@ -1,32 +1,56 @@
 from flask_jwt_extended.utils import get_jwt_identity
+from flask import current_app, request
+from math import ceil
 from models.user import UserModel
-from flask_restful import Resource, reqparse
-from werkzeug.security import check_password_hash
+from flask_restful import Resource
+from common.password_hasher import hasher
+from exceptions.hashing_busy_error import HashingBusyError
 from flask_jwt_extended import (
     create_access_token,
+    create_refresh_token,
     jwt_required,
+    jwt_refresh_token_required,
+    decode_token,
+    get_jwt_claims,
     get_raw_jwt
 )
 from jwt_utils import role_required
+from common.schema import Field, Schema
+from common.etag import conditional
 from blacklist import BLACKLIST
 
 
+def _create_linked_access_token(user, refresh_jwt):
+    """Private function used to create an access token carrying the id of the refresh token it was issued with,
+    so that logging out revokes both
+
+    Args:
+        user (UserModel): The owner of the tokens
+        refresh_jwt (dict of (str, any)): The decoded refresh token
+
+    Returns:
+        str: The access token
+    """
+    return create_access_token(identity=user.username, user_claims=dict(
+        user.json(), refresh_jti=refresh_jwt["jti"], refresh_exp=refresh_jwt.get("exp")))
+
+
 class User(Resource):
     """User API for get (single), put and delete operations."""
-    _user_parser = reqparse.RequestParser()
-    _user_parser.add_argument("username",
-                              type=str,
-                              required=False,
-                              help="Username should be non-empty string"
-                              )
-    _user_parser.add_argument("role",
-                              type=str,
-                              required=False,
-                              help="Role should be admin, maintainer or planner"
-                              )
+    _user_parser = Schema(
+        Field("username",
+              type=str,
+              required=False,
+              help="Username should be non-empty string"),
+        Field("role",
+              type=str,
+              required=False,
+              help="Role should be admin, maintainer or planner")
+    )
 
     @classmethod
     @role_required()
+    @conditional(lambda cls, username: [f"user:{username}"])
     def get(cls, username):
         """Gets one user from database based on given username. 
             Fails if there is no user with that username.
@@ -102,18 +126,18 @@ class User(Resource):
 
 class UserList(Resource):
     """User API for get (multiple) operations."""
-    _user_parser = reqparse.RequestParser()
-    _user_parser.add_argument("current_page",
-                              type=int,
-                              default=1
-                              )
-    _user_parser.add_argument("page_size",
-                              type=int,
-                              default=10
-                              )
+    _user_parser = Schema(
+        Field("current_page",
+              type=int,
+              default=1),
+        Field("page_size",
+              type=int,
+              default=10)
+    )
 
     @classmethod
     @role_required()
+    @conditional(lambda cls: ["users"], cached=True)
     def get(cls):
         """Gets a paginated list of users, along with its metadata. Takes current_page and page_size as optional body arguments.
 
@@ -131,19 +155,20 @@ class UserList(Resource):
 
 class UserCreate(Resource):
     """User API for post operations."""
-    _user_parser = reqparse.RequestParser()
-    _user_parser.add_argument("username",
-                              type=str, required=True,
-                              help="Username should be non-empty string"
-                              )
-    _user_parser.add_argument("password",
-                              type=str, required=True,
-                              help="Password should be non-empty string"
-                              )
-    _user_parser.add_argument("role",
-                              type=str, required=True,
-                              help="Role should be admin, maintainer or planner"
-                              )
+    _user_parser = Schema(
+        Field("username",
+              type=str,
+              required=True,
+              help="Username should be non-empty string"),
+        Field("password",
+              type=str,
+              required=True,
+              help="Password should be non-empty string"),
+        Field("role",
+              type=str,
+              required=True,
+              help="Role should be admin, maintainer or planner")
+    )
 
     @classmethod
     @role_required()
@@ -167,6 +192,8 @@ class UserCreate(Resource):
 
             user = UserModel(**data)
             user.save_to_db()
+        except HashingBusyError as e:
+            return {"message": e.message}, 503
         except Exception as e:
             return {"error": str(e)}, 500
 
@@ -175,31 +202,57 @@ class UserCreate(Resource):
 
 class UserLogin(Resource):
     """User API for login operation."""
-    _user_parser = reqparse.RequestParser()
-    _user_parser.add_argument("username",
-                              type=str, required=True,
-                              help="Username should be non-empty string"
-                              )
-    _user_parser.add_argument("password",
-                              type=str, required=True,
-                              help="Password should be non-empty string"
-                              )
+    _user_parser = Schema(
+        Field("username",
+              type=str,
+              required=True,
+              help="Username should be non-empty string"),
+        Field("password",
+              type=str,
+              required=True,
+              help="Password should be non-empty string")
+    )
 
     @classmethod
     def post(cls):
         """Creates an access token and a refresh token for the user with given username and password.
             Fails if there is no user with that username.
             Fails if password don't match.
+            Fails if the server is busy hashing other passwords.
+            Fails if there have been too many login attempts for the username or from the client address,
+            or if there are too many logins in progress.
+            The stored password hash is updated if it was computed with outdated hashing parameters.
 
         Args:
             username (str): Body param indicating the username.
             password (str): Body param indicating the password.
 
         Returns:
-            dict of (str, str): Access token
+            dict of (str, str): Access token, refresh token and user
         """
         data = cls._user_parser.parse_args()
 
+        throttle = current_app.extensions["login_throttle"]
+        retry_after = throttle.check(data["username"], request.remote_addr)
+        if retry_after:
+            return {"message": "Too many login attempts, please try again later"}, 429, {"Retry-After": str(ceil(retry_after))}
+        if not throttle.acquire():
+            return {"message": "Too many logins in progress, please try again later"}, 429, {"Retry-After": "1"}
+        try:
+            return cls._login(data)
+        finally:
+            throttle.release()
+
+    @classmethod
+    def _login(cls, data):
+        """Private method used to check the credentials and create the tokens, once the login attempt has been admitted
+
+        Args:
+            data (dict of (str, str)): Dictionary of username and password
+
+        Returns:
+            dict of (str, str): Access token, refresh token and user
+        """
         try:
             user = UserModel.find_by_username(data['username'])
         except Exception as e:
@@ -208,41 +261,91 @@ class UserLogin(Resource):
         if not user:
             return {"message": "User not found"}, 404
 
-        if not check_password_hash(user.password, data["password"]):
-            return {"message": "Incorrect password"}, 400
+        try:
+            if not hasher.verify(user.password, data["password"]):
+                return {"message": "Incorrect password"}, 400
+        except HashingBusyError as e:
+            return {"message": e.message}, 503
+
+        if hasher.needs_rehash(user.password):
+            try:
+                user.update_and_save(dict(password=data["password"]))
+            except HashingBusyError:
+                # The outdated hash is still valid, it will be updated on a later login
+                pass
+
+        refresh_token = create_refresh_token(identity=user.username)
+        access_token = _create_linked_access_token(
+            user, decode_token(refresh_token))
+        return {"access_token": access_token, "refresh_token": refresh_token, "user": user.json()}, 200
+
+
+class UserTokenRefresh(Resource):
+    """User API for access token refresh and refresh token revocation operations"""
+    @classmethod
+    @jwt_refresh_token_required
+    def post(cls):
+        """Creates a new access token for the owner of the refresh token, without checking the password again.
+            Fails if the user does not exist anymore.
+
+        Returns:
+            dict of (str, str): Access token and user
+        """
+        username = get_jwt_identity()
+        try:
+            user = UserModel.find_by_username(username)
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+        if not user:
+            return {"message": "User not found"}, 404
 
-        access_token = create_access_token(
-            identity=user.username, user_claims=user.json())
+        access_token = _create_linked_access_token(user, get_raw_jwt())
         return {"access_token": access_token, "user": user.json()}, 200
 
+    @classmethod
+    @jwt_refresh_token_required
+    def delete(cls):
+        """Revokes the current refresh token until it expires, so that it cannot create access tokens anymore.
+
+        Returns:
+            dict of (str, str): A confirmation message
+        """
+        raw_jwt = get_raw_jwt()
+        BLACKLIST.add(raw_jwt['jti'], raw_jwt.get('exp'))
+        return {"message": "Refresh token revoked"}, 200
+
 
 class UserLogout(Resource):
     """User API for logout operation"""
     @classmethod
     @jwt_required
     def post(cls):
-        """Retrieves the current jwt id and saves it in memory, since a jwt token cannot be forced to expire.
+        """Retrieves the current jwt id and saves it in the revoked tokens store until the token expires,
+        since a jwt token cannot be forced to expire. The refresh token the access token was issued with is revoked too.
 
         Returns:
             dict of (str, str): A confirmation message
         """
         # jti is "JWT ID", a unique identifier for JWT
-        jti = get_raw_jwt()['jti']
-        BLACKLIST.add(jti)
+        raw_jwt = get_raw_jwt()
+        BLACKLIST.add(raw_jwt['jti'], raw_jwt.get('exp'))
+        claims = get_jwt_claims()
+        if claims.get("refresh_jti"):
+            BLACKLIST.add(claims["refresh_jti"], claims.get("refresh_exp"))
         return {"message": "Successfully logged out"}, 200
 
 
 class UserChangePassword(Resource):
     """User API for change password operation"""
-    _user_parser = reqparse.RequestParser()
-    _user_parser.add_argument("old_password",
-                              type=str,
-                              required=True
-                              )
-    _user_parser.add_argument("new_password",
-                              type=str,
-                              required=True
-                              )
+    _user_parser = Schema(
+        Field("old_password",
+              type=str,
+              required=True),
+        Field("new_password",
+              type=str,
+              required=True)
+    )
 
     @classmethod
     @jwt_required
@@ -268,11 +371,13 @@ class UserChangePassword(Resource):
         if not user:
             return {"message": "User not found"}, 404
 
-        if not check_password_hash(user.password, data["old_password"]):
-            return {"message": "Incorrect password"}, 401  # Not authorized
-
         try:
+            if not hasher.verify(user.password, data["old_password"]):
+                return {"message": "Incorrect password"}, 401  # Not authorized
+
             user.update_and_save(dict(password=data["new_password"]))
+        except HashingBusyError as e:
+            return {"message": e.message}, 503
         except Exception as e:
             return {"error": str(e)}, 500
 
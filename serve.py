@@ -0,0 +1,164 @@
+"""Production entry point: serves the app with gunicorn, a pre-fork WSGI server.
+
+The master process never imports the app nor loads the .env file: it reads the SERVER_* settings in a short-lived
+process of its own, and every worker creates and warms up the app from the code and the .env file found on disk.
+So SIGHUP reloads the server without downtime: the master reads the settings again and starts new workers, running
+the current code, on the same listening socket, then stops the old ones, which finish their in-flight requests within
+SERVER_GRACEFUL_TIMEOUT seconds. Only a change to this file or to gunicorn needs a restart.
+Every worker runs SERVER_THREADS threads and is replaced, after finishing its in-flight requests,
+once it has served SERVER_MAX_REQUESTS requests or its memory has grown over SERVER_MAX_WORKER_MEMORY megabytes.
+On SIGTERM and SIGINT the workers finish their in-flight requests the same way, then the server stops: its socket is
+closed, so a restart refuses connections until the new server has started its workers.
+Every worker runs JOBS_WORKERS background job threads too: a stopping worker queues its running jobs again,
+and closes its event streams right away, since they would last until the graceful timeout.
+
+Usage:
+    python serve.py
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+import resource
+import signal
+
+CONFIG = "config.Config"
+SETTINGS = ("SERVER_BIND", "SERVER_WORKERS", "SERVER_THREADS", "SERVER_TIMEOUT", "SERVER_GRACEFUL_TIMEOUT",
+            "SERVER_KEEPALIVE", "SERVER_MAX_REQUESTS")
+
+
+def isolated(fn, *args):
+    """Runs a function in a new interpreter, so that the modules it imports and the .env file it loads
+    are not inherited by the workers forked afterwards
+
+    Args:
+        fn (callable): A module level function, returning a picklable value
+        *args: The arguments of the function
+
+    Returns:
+        any: The value returned by the function
+    """
+    with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def read_settings():
+    """Reads the server settings from the configuration, and so from the current .env file
+
+    Returns:
+        dict of (str, any): The SETTINGS values
+    """
+    from config import Config
+    return {name: getattr(Config, name) for name in SETTINGS}
+
+
+def clear_metrics_snapshots():
+    """Removes the metrics snapshots of the workers of a previous run of the server (see METRICS_DIR)"""
+    from config import Config
+    from common.metrics import metrics
+    metrics.directory = Config.METRICS_DIR or None
+    metrics.clear_snapshots()
+
+
+def resident_memory():
+    """Gets the resident memory of the current process
+
+    Returns:
+        float: The resident memory in megabytes
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 1048576
+    except OSError:
+        # the peak resident memory, in kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Server(BaseApplication):
+    """gunicorn application whose workers create the app themselves, so that a reload runs the current code"""
+
+    def __init__(self, config=CONFIG):
+        """Server constructor.
+
+        Args:
+            config (str, optional): The import name of the app configuration. Defaults to CONFIG.
+        """
+        self.config = config
+        super().__init__()
+
+    def load_config(self):
+        # called again on SIGHUP
+        settings = isolated(read_settings)
+        threads = settings["SERVER_THREADS"]
+        options = {
+            "bind": settings["SERVER_BIND"],
+            "workers": settings["SERVER_WORKERS"],
+            "threads": threads,
+            "worker_class": "gthread" if threads > 1 else "sync",
+            "preload_app": False,
+            "timeout": settings["SERVER_TIMEOUT"],
+            "graceful_timeout": settings["SERVER_GRACEFUL_TIMEOUT"],
+            "keepalive": settings["SERVER_KEEPALIVE"],
+            "max_requests": settings["SERVER_MAX_REQUESTS"],
+            # so that the workers are not replaced all at the same time
+            "max_requests_jitter": settings["SERVER_MAX_REQUESTS"] // 10,
+            "on_starting": self.on_starting,
+            "post_worker_init": self.post_worker_init,
+            "post_request": self.post_request,
+            "worker_exit": self.worker_exit,
+        }
+        for key, value in options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # in the worker, which warms the app up as it creates it (see WARMUP_ENABLED)
+        from app import create_app
+        return create_app(self.config)
+
+    def run(self):
+        arbiter = Arbiter(self)
+        # gunicorn stops without draining the workers on SIGINT, the signal pm2 stops its processes with
+        arbiter.handle_int = arbiter.handle_term
+        arbiter.run()
+
+    def on_starting(self, server):
+        # not on SIGHUP, the counters of the replaced workers must be kept
+        isolated(clear_metrics_snapshots)
+
+    def post_worker_init(self, worker):
+        from common.agenda_feed import agenda_feed
+        # the queued jobs are picked up before the first request
+        worker.wsgi.extensions["job_runner"].start()
+
+        def handle_exit(sig, frame):
+            agenda_feed.close()
+            worker.handle_exit(sig, frame)
+        # pm2 sends SIGINT to the workers as well, they drain their requests like on SIGTERM
+        signal.signal(signal.SIGTERM, handle_exit)
+        signal.signal(signal.SIGINT, handle_exit)
+        # like gunicorn does, so that the signals do not interrupt the in-flight requests
+        signal.siginterrupt(signal.SIGTERM, False)
+        signal.siginterrupt(signal.SIGINT, False)
+
+    def post_request(self, worker, req, environ, response):
+        from common.agenda_feed import agenda_feed
+        max_memory = worker.wsgi.config["SERVER_MAX_WORKER_MEMORY"]
+        if max_memory and resident_memory() > max_memory:
+            worker.log.info("Worker using more than %s MB, replacing it",
+                            max_memory)
+            # the worker finishes its in-flight requests, then the master replaces it
+            worker.alive = False
+        if not worker.alive:
+            # replaced after SERVER_MAX_REQUESTS requests or its memory growth
+            agenda_feed.close()
+
+    def worker_exit(self, server, worker):
+        app = getattr(worker, "wsgi", None)
+        if app is not None:
+            # the running jobs are queued again for the other workers
+            app.extensions["job_runner"].stop()
+
+
+if __name__ == "__main__":
+    Server().run()
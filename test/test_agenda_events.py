@@ -0,0 +1,203 @@
+import json
+import pytest
+import time
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a planner and a maintainer
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer', 'password': 'password', 'role': 'maintainer'},
+    ]
+
+
+@pytest.fixture
+def activity_seed():
+    """Gets an activity with preset activity_id
+
+    Returns:
+        dict of (str, any): the activity
+    """
+    return {'activity_id': '101', 'activity_type': 'planned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Planned electrical Maintenance Activity', 'estimated_time': '30',
+            'interruptible': True, 'materials': 'drill', 'week': '1', 'workspace_notes': 'Site: Management; Typology: Electrical'}
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds, activity_seed):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and the activity
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        MaintenanceActivityModel(**activity_seed).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, user_seeds):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=user_seeds[0]).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+@pytest.fixture
+def stream(planner_client):
+    """Opens the event stream of the first week
+
+    Returns:
+        iterator of (bytes): The chunks of the stream
+    """
+    res = planner_client.get("/events?week=1", buffered=False)
+    assert res.status_code == 200
+    assert res.mimetype == "text/event-stream"
+    chunks = iter(res.response)
+    yield chunks
+    res.close()
+
+
+def parse(chunk):
+    """Parses a server-sent event
+
+    Args:
+        chunk (bytes): The event
+
+    Returns:
+        (str, dict of (str, any)): The event name and data
+    """
+    lines = dict(line.split(": ", 1)
+                 for line in chunk.decode().strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+def test_assignment_delta(planner_client, stream):
+    """ Tests that an assignment is pushed to the subscribers of its week """
+    assert parse(next(stream))[0] == "ready"
+
+    res = planner_client.put("/activity/101/assign", data={
+        "maintainer_username": "maintainer", "week_day": "monday", "start_time": 8})
+    assert res.status_code == 200
+
+    name, data = parse(next(stream))
+    assert name == "agenda"
+    assert data["activity_id"] == 101
+    assert data["assigned"]
+    assert (data["maintainer"], data["week"], data["week_day"], data["start_time"]) == (
+        "maintainer", 1, "monday", 8)
+    assert data["free_minutes"] == 30
+
+    res = planner_client.delete("/activity/101")
+    assert res.status_code == 200
+    name, data = parse(next(stream))
+    assert not data["assigned"]
+    assert data["free_minutes"] == 60
+
+
+def test_delta_of_other_worker(app, stream, monkeypatch):
+    """ Tests that a change recorded by another worker is read from the database and pushed """
+    from common.agenda_feed import agenda_feed
+    monkeypatch.setattr(agenda_feed, "poll_interval", 0.01)
+    assert parse(next(stream))[0] == "ready"
+
+    with app.app_context():
+        from db import db
+        from models.agenda_change import AgendaChangeModel
+        from models.version import VersionModel
+        VersionModel.bump(["week:1"])
+        version = agenda_feed.week_version(1)
+        db.session.add(AgendaChangeModel(
+            1, version, 102, True, "maintainer", "tuesday", 9, time.time()))
+        db.session.commit()
+
+    name, data = parse(next(stream))
+    assert name == "agenda"
+    assert (data["activity_id"], data["week_day"], data["start_time"], data["version"]) == (
+        102, "tuesday", 9, version)
+    assert data["free_minutes"] == 60
+
+
+def test_changes_pruned(app):
+    """ Tests that the recorded changes are deleted once they are older than the retention """
+    from common.agenda_feed import agenda_feed
+    with app.app_context():
+        from models.agenda_change import AgendaChangeModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        MaintenanceActivityModel.find_by_id(101).update_and_save(
+            {"maintainer_username": "maintainer", "week_day": "monday", "start_time": 8})
+        assert len(AgendaChangeModel.find_since(1, 0)) == 1
+        assert AgendaChangeModel.prune(
+            time.time() - agenda_feed.retention) == 0
+        assert AgendaChangeModel.prune(time.time() + 1) == 1
+
+
+def test_resync_after_change_of_other_worker(app, stream):
+    """ Tests that a change without a delta causes a resync at the next heartbeat """
+    from common.agenda_feed import agenda_feed
+    agenda_feed.heartbeat_interval = 0.01
+    assert parse(next(stream))[0] == "ready"
+    assert next(stream) == b": heartbeat\n\n"
+
+    with app.app_context():
+        from db import db
+        from models.version import VersionModel
+        VersionModel.bump(["week:1"])
+        db.session.commit()
+    assert parse(next(stream))[0] == "resync"
+
+
+def test_slow_subscriber_dropped(stream):
+    """ Tests that a subscriber whose queue is full is dropped """
+    from common.agenda_feed import agenda_feed
+    assert parse(next(stream))[0] == "ready"
+    for _ in range(agenda_feed.bus.queue_size + 1):
+        agenda_feed.bus.publish(1, {"version": 0})
+    assert parse(next(stream))[0] == "dropped"
+    assert not agenda_feed.bus.has_subscribers(1)
+
+
+def test_streams_capped(planner_client, stream, monkeypatch):
+    """ Tests that a worker refuses the streams over EVENTS_MAX_STREAMS """
+    from common.agenda_feed import agenda_feed
+    monkeypatch.setattr(agenda_feed, "max_streams", 1)
+    assert parse(next(stream))[0] == "ready"
+    res = planner_client.get("/events?week=2")
+    assert res.status_code == 503
+    assert res.get_json()["message"] == "Too many event streams are open, please try again later"
+
+
+def test_streams_default_to_threads(app):
+    """ Tests that a worker serves as many streams as its threads but one by default """
+    from common.agenda_feed import agenda_feed
+    assert app.config["EVENTS_MAX_STREAMS"] == 0
+    assert agenda_feed.max_streams == app.config["SERVER_THREADS"] - 1
+
+
+def test_streams_closed(planner_client, stream):
+    """ Tests that the streams are closed, and the new ones refused, once the feed is closed """
+    from common.agenda_feed import agenda_feed
+    assert parse(next(stream))[0] == "ready"
+    agenda_feed.close()
+    assert parse(next(stream)) == ("closing", {"week": 1})
+    assert next(stream, None) is None
+    assert not agenda_feed.bus.has_subscribers(1)
+    assert planner_client.get("/events?week=1").status_code == 503
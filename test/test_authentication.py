@@ -148,3 +148,210 @@ def test_change_password_wrong_password(client):
     res = client.post("/change_password", data=data)
     assert res.status_code == 401
     assert "message" in res.get_json()
+
+
+def test_login_rehashes_outdated_password(app, client, user_seeds):
+    """ Tests that a successful login updates a password hash computed with outdated hashing parameters """
+    test_user = user_seeds[0]
+    with app.app_context():
+        from models.user import UserModel
+        from werkzeug.security import generate_password_hash
+        user = UserModel.find_by_username(test_user["username"])
+        user.password = generate_password_hash(
+            test_user["password"], "pbkdf2:sha256:500")
+        user.save_to_db()
+
+    res = client.post(
+        "/login", data=test_user)
+    assert res.status_code == 200
+
+    with app.app_context():
+        user = UserModel.find_by_username(test_user["username"])
+        assert user.password.startswith(
+            app.config["PASSWORD_HASH_METHOD"] + "$")
+
+
+def test_login_keeps_hash_of_method_without_cost(app, client, user_seeds):
+    """ Tests that a hash made with a configured method without iterations is not computed again on every login """
+    test_user = user_seeds[0]
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256"
+    from common.password_hasher import hasher
+    hasher.init_app(app)
+    with app.app_context():
+        from models.user import UserModel
+        user = UserModel.find_by_username(test_user["username"])
+        user.password = hasher.hash(test_user["password"])
+        user.save_to_db()
+        stored = user.password
+
+    assert client.post("/login", data=test_user).status_code == 200
+
+    with app.app_context():
+        assert UserModel.find_by_username(
+            test_user["username"]).password == stored
+
+
+def test_role_required_after_logout(admin_client):
+    """ Tests that a token already used on a role protected endpoint is refused after logout """
+    res = admin_client.get("/users")
+    assert res.status_code == 200
+    res = admin_client.get("/users")
+    assert res.status_code == 200
+
+    admin_client.post("/logout")
+    res = admin_client.get("/users")
+    assert res.status_code == 401
+    assert res.get_json()["error"] == "token_revoked"
+
+
+@pytest.fixture
+def refresh_client(client, admin_user):
+    """ Creates a test client with preset admin refresh authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    res = client.post(
+        "/login", data=admin_user)
+    refresh_token = res.get_json()["refresh_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + refresh_token
+    return client
+
+
+def test_refresh_success(refresh_client, admin_user):
+    """ Tests a successful creation of an access token by means of a refresh token """
+    res = refresh_client.post("/refresh")
+    assert res.status_code == 200
+    assert "access_token" in res.get_json()
+    assert res.get_json()["user"]["username"] == admin_user["username"]
+
+    refresh_client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + \
+        res.get_json()["access_token"]
+    res = refresh_client.get("/users")
+    assert res.status_code == 200
+
+
+def test_logout_revokes_refresh_token(client, admin_user):
+    """ Tests that the refresh token issued together with the access token cannot be used after logout """
+    tokens = client.post("/login", data=admin_user).get_json()
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + \
+        tokens["access_token"]
+    assert client.post("/logout").status_code == 200
+
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + \
+        tokens["refresh_token"]
+    res = client.post("/refresh")
+    assert res.status_code == 401
+    assert res.get_json()["error"] == "token_revoked"
+
+
+def test_logout_after_refresh_revokes_refresh_token(refresh_client):
+    """ Tests that logging out with a refreshed access token revokes the refresh token it was created with """
+    refresh_token = refresh_client.environ_base['HTTP_AUTHORIZATION']
+    access_token = refresh_client.post("/refresh").get_json()["access_token"]
+    refresh_client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    assert refresh_client.post("/logout").status_code == 200
+
+    refresh_client.environ_base['HTTP_AUTHORIZATION'] = refresh_token
+    assert refresh_client.post("/refresh").status_code == 401
+
+
+def test_refresh_with_access_token(admin_client):
+    """ Tests a failed refresh by using an access token instead of a refresh token """
+    res = admin_client.post("/refresh")
+    assert res.status_code == 401
+    assert "message" in res.get_json()
+
+
+def test_refresh_revoked_token(refresh_client):
+    """ Tests a failed refresh by using a refresh token that has already been revoked """
+    res = refresh_client.delete("/refresh")
+    assert res.status_code == 200
+    assert "message" in res.get_json()
+
+    res = refresh_client.post("/refresh")
+    assert res.status_code == 401
+    assert res.get_json()["error"] == "token_revoked"
+
+
+def test_login_too_many_attempts(app, client, user_seeds):
+    """ Tests that repeated login attempts for the same username are throttled """
+    test_user = dict(user_seeds[0], password="wrongpassword")
+    for _ in range(app.config["LOGIN_USERNAME_BURST"]):
+        res = client.post(
+            "/login", data=test_user)
+        assert res.status_code == 400
+
+    res = client.post(
+        "/login", data=test_user)
+    assert res.status_code == 429
+    assert "message" in res.get_json()
+    assert int(res.headers["Retry-After"]) > 0
+
+
+def test_throttled_address_does_not_lock_username(app, client, user_seeds):
+    """ Tests that the attempts of a throttled address do not consume the attempts of the username """
+    throttle = app.extensions["login_throttle"]
+    for _ in range(app.config["LOGIN_ADDRESS_BURST"]):
+        throttle.addresses.consume("10.0.0.1")
+    test_user = dict(user_seeds[0], password="wrongpassword")
+    for _ in range(app.config["LOGIN_USERNAME_BURST"] + 1):
+        res = client.post("/login", data=test_user,
+                          environ_base={"REMOTE_ADDR": "10.0.0.1"})
+        assert res.status_code == 429
+
+    res = client.post("/login", data=user_seeds[0],
+                      environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert res.status_code == 200
+
+
+def test_login_throttled_by_forwarded_address(user_seeds):
+    """ Tests that behind a trusted proxy the attempts are counted by the forwarded client address """
+    from app import create_app
+    from config import TestConfig
+
+    class ProxyConfig(TestConfig):
+        TRUSTED_PROXY_HOPS = 1
+        LOGIN_ADDRESS_BURST = 1
+
+    client = create_app(ProxyConfig).test_client()
+    test_user = dict(user_seeds[0], password="wrongpassword")
+    res = client.post("/login", data=test_user,
+                      headers={"X-Forwarded-For": "10.0.0.1"})
+    assert res.status_code == 400
+    res = client.post("/login", data=test_user,
+                      headers={"X-Forwarded-For": "10.0.0.1"})
+    assert res.status_code == 429
+    res = client.post("/login", data=test_user,
+                      headers={"X-Forwarded-For": "10.0.0.2"})
+    assert res.status_code == 400
+
+
+def test_login_too_many_in_progress(app, client, user_seeds):
+    """ Tests that logins are rejected when too many password verifications are in progress """
+    throttle = app.extensions["login_throttle"]
+    for _ in range(app.config["LOGIN_MAX_CONCURRENT"]):
+        assert throttle.acquire()
+
+    res = client.post(
+        "/login", data=user_seeds[0])
+    assert res.status_code == 429
+    assert "message" in res.get_json()
+
+    throttle.release()
+    res = client.post(
+        "/login", data=user_seeds[0])
+    assert res.status_code == 200
+
+
+def test_hasher_reconfigured_during_hash(app):
+    """ Tests that a hash running while the hasher is reconfigured releases the slot it acquired """
+    from common.password_hasher import PasswordHasher
+    hasher = PasswordHasher()
+
+    def reconfigure():
+        app.config["PASSWORD_HASH_MAX_PENDING"] = hasher.max_pending + 1
+        hasher.init_app(app)
+        return True
+
+    assert hasher._run(reconfigure) is True
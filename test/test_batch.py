@@ -0,0 +1,99 @@
+import pytest
+
+
+@pytest.fixture
+def planner_seed():
+    """Gets an user with role 'planner'
+
+    Returns:
+        (dict of (str, str):  the planner user
+    """
+    return {'username': 'planner', 'password': 'password', 'role': 'planner'}
+
+
+@pytest.fixture
+def activity_seed():
+    """Gets an activity with preset activity_id
+
+    Returns:
+        dict of (str, any): the activity
+    """
+    return {'activity_id': '101', 'activity_type': 'planned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Planned electrical Maintenance Activity', 'estimated_time': '30',
+            'interruptible': True, 'materials': 'drill', 'week': '1', 'workspace_notes': 'Site: Management; Typology: Electrical'}
+
+
+@pytest.fixture(autouse=True)
+def setup(app, planner_seed, activity_seed):
+    """Before each test it drops every table and recreates them.
+    Then it creates the planner and the activity
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.maintenance_activity import MaintenanceActivityModel
+        MaintenanceActivityModel(**activity_seed).save_to_db()
+        from models.user import UserModel
+        UserModel(**planner_seed).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, planner_seed):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=planner_seed).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_batch_responses_in_order(planner_client):
+    """ Tests that reads and writes of a batch are answered in the requested order """
+    res = planner_client.post("/batch", json={"requests": [
+        {"path": "/activity/101"},
+        {"path": "/activities", "query": {"week": 1}},
+        {"method": "put", "path": "/activity/101",
+            "body": {"workspace_notes": "New notes"}},
+        {"path": "/activity/101?fields=workspace_notes"},
+        {"path": "/activity/500"},
+        {"path": "/users"},
+    ]})
+    assert res.status_code == 200
+    responses = res.get_json()["responses"]
+    assert [response["status"] for response in responses] == [
+        200, 200, 200, 200, 404, 403]
+    assert responses[0]["body"]["workspace_notes"] == "Site: Management; Typology: Electrical"
+    assert responses[1]["body"]["meta"]["count"] == 1
+    assert responses[3]["body"] == {"workspace_notes": "New notes"}
+
+
+def test_batch_requires_token(client):
+    """ Tests that a batch without a valid access token is rejected """
+    res = client.post("/batch", json={"requests": [{"path": "/activities"}]})
+    assert res.status_code == 401
+
+
+def test_batch_validation(app, planner_client):
+    """ Tests that nested, malformed and too large batches are rejected """
+    assert planner_client.post("/batch", json={}).get_json()["message"] == {
+        "requests": "Missing required parameter in the JSON body"}
+    res = planner_client.post(
+        "/batch", json={"requests": [{"path": "/batch"}]})
+    assert res.status_code == 400
+    assert res.get_json()["message"] == {"requests": "Batches cannot be nested"}
+    res = planner_client.post(
+        "/batch", json={"requests": [{"method": "PATCH", "path": "/activities"}]})
+    assert res.status_code == 400
+
+    max_requests = app.extensions["batch_dispatcher"].max_requests
+    res = planner_client.post(
+        "/batch", json={"requests": [{"path": "/activities"}] * (max_requests + 1)})
+    assert res.status_code == 400
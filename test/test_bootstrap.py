@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture(autouse=True)
+def setup(app):
+    """Before each test it drops every table
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+    return True
+
+
+def test_bootstrap_command(app):
+    """ Tests that the bootstrap command creates the missing tables, then finds the database up to date """
+    runner = app.test_cli_runner()
+    res = runner.invoke(args=["bootstrap", "--check"])
+    assert res.exit_code == 1
+    assert "Missing tables: " in res.output
+
+    res = runner.invoke(args=["bootstrap"])
+    assert res.exit_code == 0
+    assert "maintenance_activities" in res.output
+
+    res = runner.invoke(args=["bootstrap", "--check"])
+    assert res.exit_code == 0
+    assert "The database is up to date" in res.output
+
+
+def test_missing_index_created(app):
+    """ Tests that the indexes missing from existing tables are reported and created """
+    from common.bootstrap import bootstrap
+    with app.app_context():
+        from db import db
+        db.create_all()
+        db.session.execute(text("DROP INDEX ix_maintenance_activities_week"))
+        db.session.commit()
+        assert bootstrap(create=False) == {
+            "tables": [], "indexes": ["ix_maintenance_activities_week"]}
+        bootstrap()
+        assert bootstrap(create=False) == {"tables": [], "indexes": []}
+
+
+def test_warm_up(app, caplog):
+    """ Tests that the warm-up runs the hot statements, and skips them on a database without tables """
+    from common.bootstrap import warm_up
+    timings = warm_up(app)
+    assert "statements_seconds" not in timings
+    assert "Database not warmed up" in caplog.text
+
+    with app.app_context():
+        from db import db
+        db.create_all()
+    timings = warm_up(app)
+    assert {"pool_seconds", "statements_seconds",
+            "hasher_seconds"} <= set(timings)
+
+
+def test_no_warm_up_when_preloaded(monkeypatch):
+    """ Tests that an app preloaded by the server is not warmed up, its workers are """
+    from app import create_app
+    from config import TestConfig
+    import common.bootstrap
+
+    class WarmUpConfig(TestConfig):
+        WARMUP_ENABLED = True
+
+    calls = []
+    monkeypatch.setattr(common.bootstrap, "warm_up", calls.append)
+    monkeypatch.setenv("SERVER_PRELOAD", "TRUE")
+    create_app(WarmUpConfig)
+    assert calls == []
+    monkeypatch.delenv("SERVER_PRELOAD")
+    app = create_app(WarmUpConfig)
+    assert calls == [app]
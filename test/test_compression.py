@@ -0,0 +1,102 @@
+import gzip
+import json
+import pytest
+
+
+@pytest.fixture
+def planner_seed():
+    """Gets an user with role 'planner'
+
+    Returns:
+        (dict of (str, str):  the planner user
+    """
+    return {'username': 'planner', 'password': 'password', 'role': 'planner'}
+
+
+@pytest.fixture
+def activity_seed_without_id():
+    """Gets an activity without preset activity_id
+
+    Returns:
+        dict of (str, any): the activity without id
+    """
+    return {'activity_type': 'extra', 'site': 'management',
+            'typology': 'electrical', 'description': 'Extra electrical Maintenance Activity', 'estimated_time': '60',
+            'interruptible': True, 'materials': 'spikes', 'week': '20',
+            'workspace_notes': 'Site: Management; Typology: Electrical'}
+
+
+@pytest.fixture(autouse=True)
+def setup(app, planner_seed, activity_seed_without_id):
+    """Before each test it drops every table and recreates them.
+    Then it creates the planner and 20 activities
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        UserModel(**planner_seed).save_to_db()
+        for _ in range(20):
+            MaintenanceActivityModel(**activity_seed_without_id).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, planner_seed):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    res = client.post(
+        "/login", data=planner_seed)
+    access_token = res.get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_gzip_large_response(planner_client):
+    """ Tests that a large response is compressed when the client accepts gzip """
+    uncompressed = planner_client.get("/activities?page_size=20")
+    assert "Content-Encoding" not in uncompressed.headers
+
+    res = planner_client.get("/activities?page_size=20",
+                             headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["Vary"]
+    assert len(res.data) < len(uncompressed.data)
+    assert json.loads(gzip.decompress(res.data)) == uncompressed.get_json()
+
+
+def test_small_response_not_compressed(planner_client):
+    """ Tests that a response below the size threshold is sent as is """
+    res = planner_client.get("/activities?page_size=1",
+                             headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert "Content-Encoding" not in res.headers
+    assert len(res.get_json()["rows"]) == 1
+
+
+def test_refused_encoding(planner_client):
+    """ Tests that a response is not compressed with an encoding the client refuses """
+    res = planner_client.get("/activities?page_size=20",
+                             headers={"Accept-Encoding": "gzip;q=0"})
+    assert res.status_code == 200
+    assert "Content-Encoding" not in res.headers
+
+
+def test_resource_compression_true(app, planner_client, monkeypatch):
+    """ Tests that a resource enabling compression with True uses the app settings """
+    from resources.maintenance_activity import MaintenanceActivityList
+    monkeypatch.setattr(MaintenanceActivityList,
+                        "compression", True, raising=False)
+    res = planner_client.get("/activities?page_size=20",
+                             headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,121 @@
+import pytest
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a list of users for every possible role
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer', 'password': 'password', 'role': 'maintainer'},
+    ]
+
+
+@pytest.fixture
+def activity_seeds():
+    """Gets a list of activities with presets activity_id in two different weeks
+
+    Returns:
+        list of (dict of (str, any)): list of activities
+    """
+    return [
+        {'activity_id': '101', 'activity_type': 'planned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Planned electrical Maintenance Activity', 'estimated_time': '30',
+            'interruptible': True, 'materials': 'drill', 'week': '1', 'workspace_notes': 'Site: Management; Typology: Electrical'},
+
+        {'activity_id': '102', 'activity_type': 'unplanned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Unplanned electrical Maintenance Activity', 'estimated_time': '45',
+            'interruptible': False, 'materials': 'drill', 'week': '2', 'workspace_notes': 'Site: Management; Typology: Electrical'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds, activity_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates an user for every dictionary present in user_seeds and
+    an activity for every dictionary present in activity_seeds
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        for seed in activity_seeds:
+            MaintenanceActivityModel(**seed).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, user_seeds):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    planner = next(user for user in user_seeds if user["role"] == "planner")
+    res = client.post(
+        "/login", data=planner)
+    access_token = res.get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_activities_not_modified(planner_client):
+    """ Tests that polling an unchanged week with its ETag gets a 304 without body """
+    res = planner_client.get("/activities?week=1")
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    res = planner_client.get("/activities?week=1",
+                             headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.data == b""
+
+
+def test_activities_modified_in_week(planner_client, activity_seeds):
+    """ Tests that a change in a week invalidates the ETag of that week only """
+    etags = {week: planner_client.get(f"/activities?week={week}").headers["ETag"]
+             for week in ("1", "2")}
+
+    test_activity = activity_seeds[0]
+    res = planner_client.put(
+        f"/activity/{test_activity['activity_id']}", data={"workspace_notes": "New notes"})
+    assert res.status_code == 200
+
+    res = planner_client.get(f"/activities?week={test_activity['week']}",
+                             headers={"If-None-Match": etags[test_activity["week"]]})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etags[test_activity["week"]]
+
+    res = planner_client.get("/activities?week=2",
+                             headers={"If-None-Match": etags["2"]})
+    assert res.status_code == 304
+
+
+def test_availabilities_not_modified_until_assignment(planner_client, activity_seeds, user_seeds):
+    """ Tests that the weekly availabilities ETag changes when an activity of the week is assigned """
+    test_activity = activity_seeds[0]
+    url = f"/maintainer/{test_activity['activity_id']}/availabilities"
+    etag = planner_client.get(url).headers["ETag"]
+    res = planner_client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    maintainer = next(
+        user for user in user_seeds if user["role"] == "maintainer")
+    res = planner_client.put(f"/activity/{test_activity['activity_id']}/assign", data={
+        "maintainer_username": maintainer["username"], "week_day": "monday", "start_time": 8})
+    assert res.status_code == 200
+
+    res = planner_client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 200
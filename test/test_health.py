@@ -0,0 +1,130 @@
+from unittest.mock import patch
+from sqlalchemy.exc import OperationalError
+import pytest
+import time
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets an admin and a planner
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+    return True
+
+
+def login(client, seed):
+    """Sets the authorization header of the client for the given user
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post("/login", data=seed).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_liveness(client):
+    res = client.get("/healthz")
+    assert res.status_code == 200
+    assert res.get_json() == {"status": "ok"}
+
+
+def engine(app):
+    """Gets the database engine of the app
+
+    Returns:
+        Engine: The engine
+    """
+    with app.app_context():
+        from db import db
+        return db.engine
+
+
+def test_liveness_does_not_use_database(app, client):
+    with patch.object(engine(app), "connect", side_effect=AssertionError("database used")):
+        assert client.get("/healthz").status_code == 200
+
+
+def test_readiness(client, user_seeds):
+    res = client.get("/readyz")
+    assert res.status_code == 200
+    assert res.get_json() == {"status": "ok", "database": {"ok": True}}
+
+    login(client, user_seeds[1])
+    assert client.get("/readyz").status_code == 403
+
+    login(client, user_seeds[0])
+    res = client.get("/readyz")
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["status"] == "ok"
+    assert data["database"]["ok"] is True
+    assert set(data["caches"]) == {"response_cache", "verified_token_cache"}
+    assert "hit_ratio" in data["caches"]["response_cache"]
+    assert "backend" in data["revocation_store"]
+    assert isinstance(data["pool"], dict)
+
+
+def test_readiness_reuses_the_ping(app, client):
+    probe = app.extensions["readiness_probe"]
+    probe.ping_interval = 60
+    with patch.object(probe, "ping", wraps=probe.ping) as ping:
+        for _ in range(5):
+            assert client.get("/readyz").status_code == 200
+    assert ping.call_count == 1
+
+
+def test_readiness_pings_again_after_the_interval(app, client):
+    probe = app.extensions["readiness_probe"]
+    probe.ping_interval = 0.01
+    with patch.object(probe, "ping", wraps=probe.ping) as ping:
+        client.get("/readyz")
+        time.sleep(0.02)
+        client.get("/readyz")
+    assert ping.call_count == 2
+
+
+def test_readiness_database_down(app, client, user_seeds, monkeypatch):
+    from blacklist import BLACKLIST
+    probe = app.extensions["readiness_probe"]
+    probe.ping_interval = 0
+    # the revoked tokens are not synced with the database meanwhile
+    monkeypatch.setattr(BLACKLIST, "sync_interval", 3600)
+    access_token = client.post(
+        "/login", data=user_seeds[0]).get_json()["access_token"]
+    headers = {"Authorization": "Bearer " + access_token}
+    assert client.get("/readyz", headers=headers).status_code == 200
+    with patch.object(engine(app), "connect", side_effect=OperationalError("SELECT 1", {}, Exception("unreachable"))):
+        res = client.get("/readyz")
+        assert res.status_code == 503
+        assert res.get_json() == {"status": "unavailable", "database": {"ok": False}}
+        res = client.get("/readyz", headers=headers)
+    assert res.status_code == 503
+    data = res.get_json()
+    assert data["status"] == "unavailable"
+    assert data["database"]["ok"] is False
+    assert data["database"]["error"] == "unreachable"
+    assert client.get("/readyz").status_code == 200
@@ -0,0 +1,346 @@
+import csv
+import gzip
+import pytest
+import time
+from io import StringIO
+from app import create_app
+from config import TestConfig
+from common.jobs import JobResult, job_kind
+
+
+@job_kind("test_wait")
+def wait(context, params):
+    """Reports its progress until it is cancelled or stopped"""
+    deadline = time.time() + params.get("seconds", 10)
+    while time.time() < deadline:
+        context.progress(0.5, "waiting", checkpoint={"attempt": True})
+        time.sleep(0.01)
+    return JobResult("done", "text/plain", "done.txt")
+
+
+@job_kind("test_fail")
+def fail(context, params):
+    """Fails right away"""
+    raise RuntimeError("broken")
+
+
+@job_kind("test_admin", role="admin")
+def admin_only(context, params):
+    """Returns nothing"""
+    return None
+
+
+@pytest.fixture
+def app():
+    """Creates the app with two job threads, polling the jobs table often
+
+    Returns:
+        Flask: The Flask app
+    """
+    class JobsConfig(TestConfig):
+        JOBS_WORKERS = 2
+        JOBS_POLL_INTERVAL = 0.05
+        JOBS_LEASE = 0.5
+
+    app = create_app(JobsConfig)
+    yield app
+    app.extensions["job_runner"].stop()
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets an admin, two planners and a maintainer
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'planner2', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer', 'password': 'password', 'role': 'maintainer'},
+    ]
+
+
+@pytest.fixture
+def activity_seeds():
+    """Gets three activities, two of them in the first week
+
+    Returns:
+        list of (dict of (str, any)): list of activities
+    """
+    return [
+        {"activity_id": activity_id, "activity_type": "planned", "site": "management", "typology": "electrical",
+         "description": "description", "estimated_time": 30, "interruptible": True, "week": week}
+        for activity_id, week in ((1, 1), (2, 1), (3, 2))
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds, activity_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and the activities
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        for seed in activity_seeds:
+            MaintenanceActivityModel(**seed).save_to_db()
+    return True
+
+
+def login(client, username):
+    """Sets the authorization header of the client for the given user
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data={"username": username, "password": "password"}).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+@pytest.fixture
+def planner_client(client):
+    """Gets the test client, logged in as planner
+
+    Returns:
+        FlaskClient: The test client
+    """
+    return login(client, "planner")
+
+
+def wait_for(client, id, statuses, timeout=5):
+    """Polls a job until it reaches one of the given statuses
+
+    Returns:
+        dict of (str, any): The job
+    """
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/jobs/{id}").get_json()
+        if job["status"] in statuses or time.time() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_export_activities(planner_client):
+    res = planner_client.post(
+        "/jobs", json={"kind": "export_activities", "params": {"week": 1}})
+    assert res.status_code == 202
+    job = res.get_json()
+    assert job["status"] == "queued" and job["created_by"] == "planner"
+    assert res.headers["Location"].endswith(f"/jobs/{job['id']}")
+
+    job = wait_for(planner_client, job["id"], ("succeeded", "failed"))
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1
+    assert job["has_result"] is True
+
+    res = planner_client.get(f"/jobs/{job['id']}/result")
+    assert res.status_code == 200
+    assert res.content_type.startswith("text/csv")
+    assert 'filename="activities_week_1.csv"' in res.headers["Content-Disposition"]
+    rows = list(csv.DictReader(StringIO(res.get_data(as_text=True))))
+    assert [row["activity_id"] for row in rows] == ["1", "2"]
+
+
+def test_export_streamed_by_chunks(app, planner_client, monkeypatch):
+    import common.job_kinds
+    monkeypatch.setattr(common.job_kinds, "CHUNK_SIZE", 1)
+    job = planner_client.post(
+        "/jobs", json={"kind": "export_activities", "params": {}}).get_json()
+    assert wait_for(planner_client, job["id"], ("succeeded", "failed"))[
+        "status"] == "succeeded"
+    with app.app_context():
+        from models.job_result_chunk import JobResultChunkModel
+        assert len(list(JobResultChunkModel.iter_data(job["id"]))) == 3
+
+    res = planner_client.get(f"/jobs/{job['id']}/result",
+                             headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.is_streamed and "Content-Length" not in res.headers
+    assert res.headers["Content-Encoding"] == "gzip"
+    rows = list(csv.DictReader(
+        StringIO(gzip.decompress(res.get_data()).decode())))
+    assert [row["activity_id"] for row in rows] == ["1", "2", "3"]
+
+
+def test_import_activities(app, planner_client):
+    activities = [{"activity_type": "planned", "site": "site", "typology": "electrical", "description": "imported",
+                   "estimated_time": 60, "interruptible": False, "week": 3} for _ in range(3)]
+    res = planner_client.post(
+        "/jobs", json={"kind": "import_activities", "params": {"activities": activities}})
+    assert res.status_code == 202
+    assert res.get_json()["params"] == {"activities": 3}
+    job = wait_for(planner_client, res.get_json()["id"], ("succeeded", "failed"))
+    assert job["status"] == "succeeded"
+    assert planner_client.get(f"/jobs/{job['id']}/result").get_json() == {"imported": 3}
+    res = planner_client.get("/activities", query_string={"week": 3})
+    assert res.get_json()["meta"]["count"] == 3
+
+
+def test_import_activities_invalid(planner_client):
+    res = planner_client.post("/jobs", json={"kind": "import_activities", "params": {
+        "activities": [{"activity_type": "planned", "site": "site"}]}})
+    assert res.status_code == 400
+    assert res.get_json()["message"] == "Activity 0: typology is required"
+
+
+def test_unknown_kind(planner_client):
+    res = planner_client.post("/jobs", json={"kind": "unknown"})
+    assert res.status_code == 400
+
+
+def test_role_mismatch(planner_client):
+    res = planner_client.post("/jobs", json={"kind": "test_admin"})
+    assert res.status_code == 403
+
+
+def test_failed_job(planner_client):
+    res = planner_client.post("/jobs", json={"kind": "test_fail"})
+    job = wait_for(planner_client, res.get_json()["id"], ("failed",))
+    assert job["status"] == "failed"
+    assert job["error"] == "broken"
+    assert planner_client.get(f"/jobs/{job['id']}/result").status_code == 404
+
+
+def test_cancel_running_job(planner_client):
+    id = planner_client.post(
+        "/jobs", json={"kind": "test_wait"}).get_json()["id"]
+    job = wait_for(planner_client, id, ("running",))
+    assert job["status"] == "running"
+    res = planner_client.delete(f"/jobs/{id}")
+    assert res.status_code == 200
+    assert res.get_json()["cancel_requested"] is True
+    job = wait_for(planner_client, id, ("cancelled",))
+    assert job["status"] == "cancelled"
+    assert planner_client.delete(f"/jobs/{id}").status_code == 400
+
+
+def test_cancel_queued_job(app, planner_client):
+    app.extensions["job_runner"].workers = 0
+    id = planner_client.post(
+        "/jobs", json={"kind": "test_wait"}).get_json()["id"]
+    res = planner_client.delete(f"/jobs/{id}")
+    assert res.status_code == 200
+    assert res.get_json()["status"] == "cancelled"
+
+
+def test_jobs_of_other_users(client):
+    id = login(client, "planner").post(
+        "/jobs", json={"kind": "test_fail"}).get_json()["id"]
+    assert login(client, "planner2").get(f"/jobs/{id}").status_code == 404
+    assert login(client, "planner2").delete(
+        f"/jobs/{id}").status_code == 404
+    assert login(client, "admin").get(f"/jobs/{id}").status_code == 200
+
+
+def test_stopped_runner_requeues_its_jobs(app, planner_client):
+    id = planner_client.post(
+        "/jobs", json={"kind": "test_wait"}).get_json()["id"]
+    assert wait_for(planner_client, id, ("running",))["status"] == "running"
+    app.extensions["job_runner"].stop()
+    # so that the next request does not start it again
+    app.extensions["job_runner"].workers = 0
+    job = planner_client.get(f"/jobs/{id}").get_json()
+    assert job["status"] == "queued"
+    assert job["attempts"] == 1
+
+
+def test_stale_jobs_are_requeued(app, planner_client):
+    with app.app_context():
+        from models.job import JobModel
+        job = JobModel("test_wait", {"seconds": 0}, "planner", time.time())
+        job.status, job.owner, job.attempts = "running", "killed-worker", 1
+        job.heartbeat_at = time.time() - 10
+        job.save_to_db()
+        id = job.id
+    job = wait_for(planner_client, id, ("succeeded",))
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 2
+    assert planner_client.get(f"/jobs/{id}/result").get_data() == b"done"
+
+
+def test_failed_import_reports_the_imported_activities(planner_client, monkeypatch):
+    import common.job_kinds
+    from sqlalchemy.exc import OperationalError
+    from models.version import VersionModel
+    bump = VersionModel.bump
+    bumps = []
+
+    def failing_bump(keys):
+        bumps.append(keys)
+        if len(bumps) == 2:
+            raise OperationalError("UPDATE versions", {}, Exception("disk full"))
+        bump(keys)
+    monkeypatch.setattr(common.job_kinds, "CHUNK_SIZE", 2)
+    monkeypatch.setattr(common.job_kinds.VersionModel, "bump", failing_bump)
+    activities = [{"activity_type": "planned", "site": "site", "typology": "electrical", "description": f"imported {index}",
+                   "estimated_time": 60, "interruptible": False, "week": 3} for index in range(3)]
+    id = planner_client.post(
+        "/jobs", json={"kind": "import_activities", "params": {"activities": activities}}).get_json()["id"]
+    job = wait_for(planner_client, id, ("succeeded", "failed"))
+    assert job["status"] == "failed"
+    assert job["error"] == "Imported the first 2 of 3 activities, the ones from index 2 failed: disk full"
+    rows = planner_client.get("/activities", query_string={"week": 3}).get_json()["rows"]
+    assert [row["description"] for row in rows] == ["imported 0", "imported 1"]
+
+
+def test_requeued_import_resumes_from_checkpoint(app, planner_client):
+    activities = [{"activity_type": "planned", "site": "site", "typology": "electrical", "description": f"imported {index}",
+                   "estimated_time": 60, "interruptible": False, "week": 3} for index in range(3)]
+    with app.app_context():
+        from models.job import JobModel
+        job = JobModel("import_activities", {"activities": activities}, "planner", time.time())
+        job.checkpoint = "2"
+        job.save_to_db()
+        id = job.id
+    assert wait_for(planner_client, id, ("succeeded",))["status"] == "succeeded"
+    rows = planner_client.get("/activities", query_string={"week": 3}).get_json()["rows"]
+    assert [row["description"] for row in rows] == ["imported 2"]
+
+
+def test_stale_jobs_fail_after_max_attempts(app, planner_client):
+    with app.app_context():
+        from models.job import JobModel
+        job = JobModel("test_wait", {"seconds": 0}, "planner", time.time())
+        job.status, job.owner, job.attempts = "running", "killed-worker", 3
+        job.heartbeat_at = time.time() - 10
+        job.save_to_db()
+        id = job.id
+    job = wait_for(planner_client, id, ("failed",))
+    assert job["status"] == "failed"
+    assert job["error"] == "Interrupted after 3 attempts"
+    assert job["attempts"] == 3
+
+
+def test_stopped_runner_fails_jobs_after_max_attempts(app, planner_client):
+    runner = app.extensions["job_runner"]
+    runner.max_attempts = 1
+    id = planner_client.post(
+        "/jobs", json={"kind": "test_wait"}).get_json()["id"]
+    assert wait_for(planner_client, id, ("running",))["status"] == "running"
+    runner.stop()
+    runner.workers = 0
+    job = planner_client.get(f"/jobs/{id}").get_json()
+    assert job["status"] == "failed"
+    assert job["error"] == "Interrupted after 1 attempts"
+
+
+def test_queue_only_runner(app, planner_client):
+    app.extensions["job_runner"].stop()
+    app.extensions["job_runner"].workers = 0
+    id = planner_client.post(
+        "/jobs", json={"kind": "test_fail"}).get_json()["id"]
+    time.sleep(0.2)
+    assert planner_client.get(f"/jobs/{id}").get_json()["status"] == "queued"
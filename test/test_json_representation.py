@@ -0,0 +1,45 @@
+import json
+import pytest
+from common import json_representation
+from models.maintenance_activity import MaintenanceActivityModel
+
+
+@pytest.fixture
+def activity():
+    """Gets a maintenance activity that has not been saved
+
+    Returns:
+        MaintenanceActivityModel: the activity
+    """
+    return MaintenanceActivityModel(activity_id=101, activity_type='planned', site='management',
+                                    typology='electrical', description='Planned electrical Maintenance Activity',
+                                    estimated_time=30, interruptible=True, week=1)
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Selects the encoder used by the JSON representation
+
+    Returns:
+        str: the encoder name
+    """
+    if request.param == "json":
+        monkeypatch.setattr(json_representation, "orjson", None)
+    elif json_representation.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_dumps_non_string_keys(encoder):
+    """ Tests that integer keys, like the ones of a daily agenda, are encoded as strings """
+    body = json_representation.dumps({8: 60, 9: 0})
+    assert json.loads(body) == {"8": 60, "9": 0}
+    assert body.endswith(b"\n")
+
+
+def test_dumps_models(encoder, activity):
+    """ Tests that models are encoded through their public representation """
+    body = json_representation.dumps({"rows": [activity]}, debug=True)
+    assert json.loads(body) == {"rows": [json.loads(
+        json.dumps(activity.json()))]}
+
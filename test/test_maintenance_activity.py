@@ -264,3 +264,49 @@ def test_delete_activity_not_found(planner_client, unexisting_activity):
     res = planner_client.delete(f"/activity/{test_activity['activity_id']}")
     assert res.status_code == 404
     assert 'message' in res.get_json().keys()
+
+
+def test_get_activity_fields_success(planner_client, activity_seeds):
+    """ Tests a successful retrival of a subset of the keys of a single activity """
+    test_activity: dict = activity_seeds[0]
+    res = planner_client.get(
+        f"/activity/{test_activity['activity_id']}?fields=week,estimated_time")
+    assert res.status_code == 200
+    assert res.get_json() == {
+        "week": int(test_activity["week"]), "estimated_time": int(test_activity["estimated_time"])}
+
+
+def test_get_activities_fields_success(planner_client, activity_seeds):
+    """ Tests a successful retrival of a page of activities limited to a subset of their keys """
+    test_fields = ["activity_id", "week", "estimated_time", "skills_needed"]
+    res = planner_client.get(
+        f"/activities?page_size={len(activity_seeds)}&fields={','.join(test_fields)}")
+    assert res.status_code == 200
+    assert len(res.get_json()["rows"]) == len(activity_seeds)
+    for activity in res.get_json()["rows"]:
+        assert list(activity.keys()) == test_fields
+
+
+def test_get_activities_unknown_fields(planner_client):
+    """ Tests a failed retrival of a page of activities asking for keys that do not exist """
+    res = planner_client.get("/activities?fields=week,password")
+    assert res.status_code == 400
+    assert "fields" in res.get_json()["message"].keys()
+
+
+def test_get_activities_by_ids_success(planner_client, activity_seeds, unexisting_activity):
+    """ Tests a successful retrival of many activities by their identifiers, skipping the ones that do not exist """
+    test_ids = [activity_seeds[2]["activity_id"],
+                unexisting_activity["activity_id"], activity_seeds[0]["activity_id"]]
+    res = planner_client.get(f"/activities?ids={','.join(test_ids)}")
+    assert res.status_code == 200
+    assert [str(activity["activity_id"]) for activity in res.get_json()["rows"]] == [
+        test_ids[0], test_ids[2]]
+    assert res.get_json()["meta"]["count"] == 2
+
+
+def test_get_activities_invalid_ids(planner_client):
+    """ Tests a failed retrival of many activities by using identifiers that are not integers """
+    res = planner_client.get("/activities?ids=1,two")
+    assert res.status_code == 400
+    assert "ids" in res.get_json()["message"].keys()
@@ -0,0 +1,159 @@
+import pytest
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a planner, a maintainer and an admin
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer', 'password': 'password', 'role': 'maintainer'},
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+    ]
+
+
+@pytest.fixture
+def app(app):
+    """Configures the scrapers token of the app
+
+    Returns:
+        Flask: The Flask app
+    """
+    app.config["METRICS_TOKEN"] = "metrics-token"
+    return app
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and an activity
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        MaintenanceActivityModel(activity_id=101, activity_type="planned", site="management", typology="electrical",
+                                 description="description", estimated_time=30, interruptible=True, week=1).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, user_seeds):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=user_seeds[0]).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_request_metrics(planner_client):
+    """ Tests that latency, SQL statements and agenda computations are recorded per resource and method """
+    from common.metrics import metrics
+    labels = ("MaintainerDailyAvailability", "GET")
+    requests = metrics.request_duration.count(labels)
+    agenda_computations = metrics.agenda_computations.value(("daily_agenda",))
+
+    res = planner_client.get(
+        "/maintainer/maintainer/availability?activity_id=101&week_day=monday")
+    assert res.status_code == 200
+    assert metrics.request_duration.count(labels) == requests + 1
+    assert metrics.request_queries.count(labels) == requests + 1
+    assert metrics.agenda_computations.value(
+        ("daily_agenda",)) == agenda_computations + 1
+
+    res = planner_client.get(
+        "/metrics", headers={"Authorization": "Bearer metrics-token"})
+    assert res.status_code == 200
+    assert res.content_type.startswith("text/plain; version=0.0.4")
+    body = res.get_data(as_text=True)
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_requests_total{resource="MaintainerDailyAvailability",method="GET",status="200"}' in body
+    assert 'http_request_db_queries_bucket{resource="MaintainerDailyAvailability",method="GET",le="+Inf"}' in body
+    assert 'agenda_computations_total{kind="daily_agenda"}' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    """ Tests that the histogram samples follow the Prometheus text format """
+    from common.metrics import Histogram
+    histogram = Histogram("test_seconds", "Test", ("resource",), (0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, ("r",))
+    assert histogram.samples() == [
+        'test_seconds_bucket{resource="r",le="0.1"} 1',
+        'test_seconds_bucket{resource="r",le="1"} 3',
+        'test_seconds_bucket{resource="r",le="+Inf"} 4',
+        'test_seconds_sum{resource="r"} 6.25',
+        'test_seconds_count{resource="r"} 4',
+    ]
+
+
+def test_metrics_authentication(client, user_seeds):
+    """ Tests that the metrics can only be scraped with the scrapers token or by an admin """
+    assert client.get("/metrics").status_code == 401
+    assert client.get(
+        "/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(
+        "/metrics", headers={"Authorization": "Bearer metrics-token"}).status_code == 200
+
+    for seed, status in ((user_seeds[0], 403), (user_seeds[2], 200)):
+        access_token = client.post(
+            "/login", data=seed).get_json()["access_token"]
+        res = client.get(
+            "/metrics", headers={"Authorization": "Bearer " + access_token})
+        assert res.status_code == status
+
+
+def test_metrics_of_every_worker(client, tmp_path, monkeypatch):
+    """ Tests that with METRICS_DIR the counters of every worker are summed, and the gauges of the running ones """
+    import json
+    import os
+    from common.metrics import metrics
+    monkeypatch.setattr(metrics, "directory", str(tmp_path))
+    labels = ["Health", "GET", "200"]
+    # above the largest pid of linux, so never running
+    exited_worker = 2 ** 22 + 1
+    with open(tmp_path / f"{exited_worker}.json", "w") as file:
+        json.dump({"http_requests_total": [[labels, 1000]],
+                   "db_pool_connections": [[["idle"], 1000]]}, file)
+    client.get("/healthz")
+    own = metrics.requests.value(tuple(labels))
+
+    body = client.get(
+        "/metrics", headers={"Authorization": "Bearer metrics-token"}).get_data(as_text=True)
+    assert f'http_requests_total{{resource="Health",method="GET",status="200"}} {own + 1000}' in body
+    assert 'db_pool_connections{state="idle"} 1000' not in body
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+
+
+def test_batch_metrics(planner_client):
+    """ Tests that a batch is recorded as a whole, statements of the sub-requests run on its thread included,
+    and every sub-request on its own """
+    from common.metrics import metrics
+    batch, write = ("Batch", "POST"), ("MaintenanceActivity", "PUT")
+    batches, batch_queries = metrics.request_duration.count(batch), metrics.request_queries.sum(batch)
+    writes, write_queries = metrics.request_duration.count(write), metrics.request_queries.sum(write)
+
+    res = planner_client.post("/batch", json={"requests": [
+        {"method": "put", "path": "/activity/101", "body": {"workspace_notes": "First"}},
+        {"method": "put", "path": "/activity/101", "body": {"workspace_notes": "Second"}},
+    ]})
+    assert res.status_code == 200
+    assert metrics.request_duration.count(batch) == batches + 1
+    assert metrics.request_duration.count(write) == writes + 2
+    assert metrics.request_queries.sum(write) > write_queries
+    assert metrics.request_queries.sum(batch) - batch_queries >= \
+        metrics.request_queries.sum(write) - write_queries
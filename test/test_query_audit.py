@@ -0,0 +1,109 @@
+import pytest
+from common.query_audit import QueryAudit, QueryBudgetExceeded, fingerprint
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a planner and two maintainers
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer1', 'password': 'password', 'role': 'maintainer'},
+        {'username': 'maintainer2', 'password': 'password', 'role': 'maintainer'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds, monkeypatch):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and an activity.
+    Revocations are not synchronized during the tests, so that requests run a constant number of statements
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        MaintenanceActivityModel(activity_id=101, activity_type="planned", site="management", typology="electrical",
+                                 description="description", estimated_time=30, interruptible=True, week=1).save_to_db()
+    from blacklist import BLACKLIST
+    monkeypatch.setattr(BLACKLIST, "sync_interval", 3600)
+    return True
+
+
+@pytest.fixture
+def planner_client(client, user_seeds):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=user_seeds[0]).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_fingerprint():
+    """ Tests that statements differing only by their values have the same fingerprint """
+    assert fingerprint("SELECT * FROM users WHERE id IN (1, 2, 3) AND name = 'a'") == \
+        fingerprint("SELECT *\n FROM users WHERE id IN (?, ?) AND name = 'b'") == \
+        "SELECT * FROM users WHERE id IN (?...) AND name = ?"
+
+
+# Every budget counts the synchronization of the revoked tokens made by the first request
+@pytest.mark.parametrize("url,max_queries", [
+    ("/activities?week=1", 4),
+    ("/activity/101", 3),
+    ("/maintainer/maintainer1/availability?activity_id=101&week_day=monday", 6),
+])
+def test_query_budget(planner_client, url, max_queries):
+    """ Tests that the planner reads stay within their query budget, without repeated statements """
+    with QueryAudit(max_queries=max_queries, max_repeats=1):
+        res = planner_client.get(url)
+    assert res.status_code == 200
+
+
+def test_repeated_statements_attributed(planner_client):
+    """ Tests that the statements repeated for every maintainer and day are reported with their call sites """
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with QueryAudit(max_repeats=1) as audit:
+            res = planner_client.get("/maintainer/101/availabilities")
+    assert res.status_code == 200
+    statement, count, sites = audit.repeated()[0]
+    assert count == 14
+    assert "FROM maintenance_activities" in statement
+    assert any(site.startswith("models/user.py") and site.endswith("get_daily_activities")
+               for site in sites)
+    assert any(site.startswith("resources/maintainer_availability.py")
+               for site in sites)
+    assert "14x" in str(error.value)
+
+
+def test_audit_header(planner_client):
+    """ Tests that the requests with the X-Query-Audit header get their statement counts """
+    res = planner_client.get("/activity/101")
+    assert "X-Query-Audit" not in res.headers
+    res = planner_client.get(
+        "/maintainer/101/availabilities", headers={"X-Query-Audit": "1"})
+    assert res.headers["X-Query-Audit"].endswith("repeated=1")
+
+
+def test_audited_batch(planner_client):
+    """ Tests that an audited batch reports the statements of the sub-requests run on its thread """
+    res = planner_client.post("/batch", headers={"X-Query-Audit": "1"}, json={"requests": [
+        {"method": "put", "path": "/activity/101", "body": {"workspace_notes": "First"}},
+        {"method": "put", "path": "/activity/101", "body": {"workspace_notes": "Second"}},
+    ]})
+    assert res.status_code == 200
+    queries = int(res.headers["X-Query-Audit"].split(";")[0].split("=")[1])
+    assert queries >= 2
@@ -0,0 +1,182 @@
+import pytest
+import time
+from app import create_app
+from config import TestConfig
+from common.agenda import calculate_agenda
+from common.rebalancer import WeekState, rebalance
+from exceptions.invalid_agenda_error import InvalidAgendaError
+
+
+@pytest.fixture
+def app():
+    """Creates the app with a job thread, polling the jobs table often
+
+    Returns:
+        Flask: The Flask app
+    """
+    class JobsConfig(TestConfig):
+        JOBS_WORKERS = 1
+        JOBS_POLL_INTERVAL = 0.05
+
+    app = create_app(JobsConfig)
+    yield app
+    app.extensions["job_runner"].stop()
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a planner and three maintainers
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [{'username': 'planner', 'password': 'password', 'role': 'planner'}] + [
+        {'username': f'maintainer{index}', 'password': 'password', 'role': 'maintainer'} for index in range(3)]
+
+
+@pytest.fixture
+def activity_seeds():
+    """Gets six activities of the first week, all assigned to the first maintainer's monday
+
+    Returns:
+        list of (dict of (str, any)): list of activities
+    """
+    return [
+        {"activity_id": activity_id, "activity_type": "planned", "site": "management", "typology": "electrical",
+         "description": "description", "estimated_time": 60, "interruptible": True, "week": 1}
+        for activity_id in range(1, 7)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds, activity_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and the activities
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        for seed in activity_seeds:
+            activity = MaintenanceActivityModel(**seed)
+            activity.update({"maintainer_username": "maintainer0", "week_day": "monday",
+                             "start_time": 7 + seed["activity_id"]})
+            activity.save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client):
+    """Gets the test client, logged in as planner
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data={"username": "planner", "password": "password"}).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def wait_for(client, id, timeout=5):
+    """Polls a job until it finishes
+
+    Returns:
+        dict of (str, any): The job
+    """
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/jobs/{id}").get_json()
+        if job["status"] in ("succeeded", "failed", "cancelled") or time.time() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_calculate_agenda():
+    assert calculate_agenda([(8, 30), (10, 90)], 8, 4) == {
+        8: 30, 9: 60, 10: 0, 11: 30}
+    with pytest.raises(InvalidAgendaError):
+        calculate_agenda([(11, 90)], 8, 4)
+
+
+def test_rebalance_spreads_the_load():
+    state = WeekState(["a", "b"], [(id, "a", "monday", 7 + id, 60) for id in range(1, 5)],
+                      work_start_hour=8, work_hours=4)
+    result = rebalance(state)
+    assert result["variance_before"] > result["variance_after"]
+    assert state.loads[("a", "monday")] == 60
+    assert sorted(state.loads.values(), reverse=True)[:4] == [60, 60, 60, 60]
+    assert len(result["moves"]) == 3
+    for move in result["moves"]:
+        assert move["from"]["maintainer_username"] == "a"
+        assert move["to"] != move["from"]
+
+
+def test_rebalance_respects_the_agenda():
+    # a two hours activity cannot start in the last hour of the day
+    state = WeekState(["a", "b"], [(1, "a", "monday", 8, 120), (2, "a", "monday", 10, 120)],
+                      work_start_hour=8, work_hours=4)
+    rebalance(state)
+    for (maintainer, week_day), activities in state.days.items():
+        calculate_agenda([(start_time, state.estimated_times[id]) for id, start_time in activities.items()],
+                         8, 4)
+        assert all(start_time <= 10 for start_time in activities.values())
+
+
+def test_rebalance_keeps_balanced_weeks():
+    state = WeekState(["a"], [(1, "a", "monday", 8, 30)],
+                      work_start_hour=8, work_hours=4)
+    assert rebalance(state)["moves"] == []
+    assert rebalance(state, tolerance=0)["moves"] == []
+
+
+def test_rebalance_max_moves():
+    state = WeekState(["a", "b"], [(id, "a", "monday", 7 + id, 60) for id in range(1, 5)],
+                      work_start_hour=8, work_hours=4)
+    assert len(rebalance(state, max_moves=1)["moves"]) == 1
+
+
+def test_rebalance_week_job(app, planner_client):
+    res = planner_client.post(
+        "/jobs", json={"kind": "rebalance_week", "params": {"week": 1}})
+    assert res.status_code == 202
+    job = wait_for(planner_client, res.get_json()["id"])
+    assert job["status"] == "succeeded"
+    result = planner_client.get(f"/jobs/{job['id']}/result").get_json()
+    assert result["applied"] is False
+    assert len(result["moves"]) == 5
+    assert result["variance_after"] < result["variance_before"]
+    with app.app_context():
+        from models.maintenance_activity import MaintenanceActivityModel
+        assert {activity.maintainer_username for activity in MaintenanceActivityModel.find_all()} == {
+            "maintainer0"}
+
+
+def test_rebalance_week_job_apply(app, planner_client):
+    res = planner_client.post(
+        "/jobs", json={"kind": "rebalance_week", "params": {"week": 1, "apply": True}})
+    job = wait_for(planner_client, res.get_json()["id"])
+    assert job["status"] == "succeeded"
+    result = planner_client.get(f"/jobs/{job['id']}/result").get_json()
+    assert result["applied"] is True
+    with app.app_context():
+        from models.maintenance_activity import MaintenanceActivityModel
+        for move in result["moves"]:
+            activity = MaintenanceActivityModel.find_by_id(
+                move["activity_id"])
+            assert (activity.maintainer_username, activity.week_day,
+                    activity.start_time) == tuple(move["to"].values())
+
+
+def test_rebalance_week_job_invalid(planner_client):
+    res = planner_client.post(
+        "/jobs", json={"kind": "rebalance_week", "params": {"week": 1, "max_moves": -1}})
+    assert res.status_code == 400
+    assert res.get_json()["message"] == "max_moves should be a non negative integer"
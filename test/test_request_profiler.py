@@ -0,0 +1,98 @@
+import pstats
+import pytest
+from app import create_app
+from config import TestConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Creates the app with request profiling enabled, saving the profiles to a temporary folder
+
+    Returns:
+        Flask: The Flask app
+    """
+    class ProfilingConfig(TestConfig):
+        PROFILING_ENABLED = True
+        PROFILING_DIR = str(tmp_path)
+        PROFILING_MAX_FILES = 2
+
+    return create_app(ProfilingConfig)
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets an admin and a planner
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+    return True
+
+
+def login(client, seed):
+    """Sets the authorization header of the client for the given user
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post("/login", data=seed).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+def test_profile_on_demand(client, user_seeds, tmp_path):
+    """ Tests that the requests of admins with the header are profiled, listed and downloadable """
+    login(client, user_seeds[0])
+    res = client.get("/user/planner", headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    name = res.headers["X-Profile"]
+
+    rows = client.get("/profiles").get_json()["rows"]
+    assert [(row["name"], row["method"], row["route"]) for row in rows] == [
+        (name, "GET", "/user/<string:username>")]
+
+    res = client.get(f"/profile/{name}")
+    assert res.status_code == 200
+    path = tmp_path / "downloaded.pstats"
+    path.write_bytes(res.data)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert client.get("/profile/unknown.pstats").status_code == 404
+
+
+def test_header_ignored_for_other_roles(client, user_seeds, tmp_path):
+    """ Tests that the header of users that are not admins is ignored """
+    login(client, user_seeds[1])
+    res = client.get("/activities", headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    assert "X-Profile" not in res.headers
+    assert client.get("/profiles").status_code == 403
+
+
+def test_sampled_requests(app, client, user_seeds, tmp_path):
+    """ Tests that sampled requests are profiled and that only the most recent profiles are kept """
+    login(client, user_seeds[1])
+    app.extensions["request_profiler"].sample_rate = 1
+    names = [client.get(f"/activities?current_page=1&page_size={size}").headers["X-Profile"]
+             for size in (1, 2, 3)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names[1:])
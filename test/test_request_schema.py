@@ -0,0 +1,62 @@
+from flask_restful import reqparse
+from werkzeug.exceptions import HTTPException
+from common.schema import Field, Schema
+from common.utils import id_list
+import pytest
+
+
+@pytest.fixture
+def fields():
+    """Gets fields covering the argument kinds declared by the resources
+
+    Returns:
+        list of (Field): The fields
+    """
+    return [
+        Field("description", type=str, required=True,
+              help="Description of the activity"),
+        Field("estimated_time", type=int, required=True),
+        Field("week", type=int, help="Week is not valid: {error_msg}"),
+        Field("interruptible", type=bool),
+        Field("page_size", type=int, default=10),
+        Field("ids", type=id_list, location="args"),
+    ]
+
+
+def parse(parser):
+    """Parses the current request, turning the abort into a result
+
+    Args:
+        parser (Schema or RequestParser): The parser to use
+
+    Returns:
+        tuple of (int, dict of (str, any)): The status code and the parsed arguments or the error response
+    """
+    try:
+        return 200, dict(parser.parse_args())
+    except HTTPException as e:
+        return e.code, e.data
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(data={"description": "d", "estimated_time": "30"}),
+    dict(json={"description": "d", "estimated_time": 30,
+               "interruptible": False, "week": None}),
+    dict(data={"description": "d", "estimated_time": "30", "week": "2", "interruptible": "yes"},
+         query_string={"page_size": "5", "ids": "3,1,3"}),
+    dict(data={"estimated_time": "30"}),
+    dict(json={"description": "d"}),
+    dict(data={"description": "d", "estimated_time": "half an hour"}),
+    dict(data={"description": "d", "estimated_time": "30", "week": "first"}),
+    dict(data={"description": "d", "estimated_time": "30"},
+         query_string={"ids": "1,a"}),
+])
+def test_same_results_as_reqparse(app, fields, kwargs):
+    """ Tests that the schema gives the same arguments and error messages as reqparse """
+    parser = reqparse.RequestParser()
+    for field in fields:
+        parser.add_argument(field.name, type=field.type, required=field.required,
+                            default=field.default, help=field.help, location=field.location)
+
+    with app.test_request_context("/", method="POST", **kwargs):
+        assert parse(Schema(*fields)) == parse(parser)
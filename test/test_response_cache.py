@@ -0,0 +1,133 @@
+import pytest
+import time
+
+
+@pytest.fixture
+def planner_seed():
+    """Gets an user with role 'planner'
+
+    Returns:
+        (dict of (str, str):  the planner user
+    """
+    return {'username': 'planner', 'password': 'password', 'role': 'planner'}
+
+
+@pytest.fixture
+def activity_seeds():
+    """Gets a list of activities with presets activity_id in two different weeks
+
+    Returns:
+        list of (dict of (str, any)): list of activities
+    """
+    return [
+        {'activity_id': '101', 'activity_type': 'planned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Planned electrical Maintenance Activity', 'estimated_time': '30',
+            'interruptible': True, 'materials': 'drill', 'week': '1', 'workspace_notes': 'Site: Management; Typology: Electrical'},
+
+        {'activity_id': '102', 'activity_type': 'unplanned', 'site': 'management',
+            'typology': 'electrical', 'description': 'Unplanned electrical Maintenance Activity', 'estimated_time': '45',
+            'interruptible': False, 'materials': 'drill', 'week': '2', 'workspace_notes': 'Site: Management; Typology: Electrical'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, planner_seed, activity_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the planner and an activity for every dictionary present in activity_seeds
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        UserModel(**planner_seed).save_to_db()
+        for seed in activity_seeds:
+            MaintenanceActivityModel(**seed).save_to_db()
+    return True
+
+
+@pytest.fixture
+def planner_client(client, planner_seed):
+    """ Creates a test client with preset planner authorization headers taken from the login endpoint
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=planner_seed).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+@pytest.fixture
+def cache(app):
+    """Gets the response cache of the app
+
+    Returns:
+        ResponseCache: The response cache
+    """
+    return app.extensions["response_cache"]
+
+
+def test_write_purges_affected_tags_only(planner_client, cache):
+    """ Tests that a write purges the cached responses of its week and activity only """
+    for url in ("/activities?week=1", "/activities?week=2", "/activity/101"):
+        assert planner_client.get(url).status_code == 200
+    assert planner_client.get("/activities?week=2").status_code == 200
+    assert cache.status()["hits"] == 1
+
+    res = planner_client.put(
+        "/activity/101", data={"workspace_notes": "New notes"})
+    assert res.status_code == 200
+    assert cache.status()["size"] == 1
+    assert cache.status()["purged"] == 2
+
+    res = planner_client.get("/activity/101")
+    assert res.get_json()["workspace_notes"] == "New notes"
+    assert planner_client.get("/activities?week=2").status_code == 200
+    assert cache.status()["hits"] == 2
+
+
+def test_writes_of_other_workers_invalidate(app, planner_client, cache):
+    """ Tests that a cached response is not served after a change committed by another worker """
+    assert planner_client.get(
+        "/activity/101").get_json()["workspace_notes"] != "New notes"
+
+    with app.app_context():
+        from db import db
+        from models.maintenance_activity import MaintenanceActivityModel
+        from models.version import VersionModel
+        activity = MaintenanceActivityModel.find_by_id(101)
+        activity.workspace_notes = "New notes"
+        keys = activity.version_keys()
+        VersionModel.bump(keys)
+        # another worker's commit does not purge this worker's cache
+        db.session.info.pop("bumped_version_keys")
+        db.session.commit()
+    assert cache.status()["size"] == 1
+
+    res = planner_client.get("/activity/101")
+    assert res.get_json()["workspace_notes"] == "New notes"
+    assert cache.status()["hits"] == 0
+
+
+def test_stale_while_revalidate(planner_client, cache):
+    """ Tests that an outdated response is served while it is rebuilt in background """
+    cache.stale_ttl = 60
+    assert planner_client.get("/activity/101").status_code == 200
+    res = planner_client.put(
+        "/activity/101", data={"workspace_notes": "New notes"})
+    assert res.status_code == 200
+
+    res = planner_client.get("/activity/101")
+    assert res.get_json()["workspace_notes"] == "Site: Management; Typology: Electrical"
+    assert cache.status()["stale_hits"] == 1
+
+    deadline = time.monotonic() + 5
+    while planner_client.get("/activity/101").get_json()["workspace_notes"] != "New notes":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
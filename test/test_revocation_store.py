@@ -0,0 +1,98 @@
+import pytest
+import time
+from blacklist import RevocationStore
+
+
+@pytest.fixture
+def admin_user():
+    """Gets an user with role 'admin'
+
+    Returns:
+        dict of (str, str): the admin user
+    """
+    return {'username': 'admin', 'password': 'password', 'role': 'admin'}
+
+
+@pytest.fixture(autouse=True)
+def setup(app, admin_user):
+    """Before each test it drops every table and recreates them.
+    Then it creates the admin user
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        UserModel(**admin_user).save_to_db()
+    return True
+
+
+@pytest.fixture
+def other_worker_store(app):
+    """Creates a revocation store bound to the same app, as another worker process would
+
+    Returns:
+        RevocationStore: The revocation store
+    """
+    store = RevocationStore()
+    store.init_app(app)
+    return store
+
+
+def test_logout_visible_to_other_workers(app, client, admin_user, other_worker_store):
+    """ Tests that a logout performed by a worker is seen by the store of another worker """
+    access_token = client.post("/login", data=admin_user).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    with app.test_request_context():
+        from flask_jwt_extended import decode_token
+        jti = decode_token(access_token)["jti"]
+        assert jti not in other_worker_store
+
+    res = client.post("/logout")
+    assert res.status_code == 200
+
+    with app.test_request_context():
+        other_worker_store.sync_interval = 0
+        assert jti in other_worker_store
+
+
+def test_expired_revocations_are_purged(app, other_worker_store):
+    """ Tests that revocations of expired tokens are removed from the store """
+    with app.app_context():
+        now = time.time()
+        other_worker_store.add("expired-jti", int(now) - 1)
+        other_worker_store.add("valid-jti", int(now) + 60)
+        assert "expired-jti" not in other_worker_store
+        assert "valid-jti" in other_worker_store
+
+        other_worker_store.purge_interval = 0
+        other_worker_store.sync_interval = 0
+        assert "valid-jti" in other_worker_store
+        from models.revoked_token import RevokedTokenModel
+        assert [token.jti for token in RevokedTokenModel.query.all()] == [
+            "valid-jti"]
+
+
+def test_bloom_capacity_is_configured(app):
+    """ Tests that the Bloom filter is sized by REVOCATION_BLOOM_CAPACITY from the start """
+    app.config["REVOCATION_BLOOM_CAPACITY"] = 1000
+    store = RevocationStore()
+    store.init_app(app)
+    assert store.status()["bloom_filter_capacity"] == 1000
+
+
+def test_purge_does_not_commit_the_request_session(app, other_worker_store):
+    """ Tests that the purge of expired revocations runs in a transaction of its own """
+    with app.app_context():
+        from db import db
+        from models.user import UserModel
+        other_worker_store.add("expired-jti", int(time.time()) - 1)
+        UserModel.find_by_username("admin").role = "planner"
+        other_worker_store.purge_interval = 0
+        other_worker_store.sync_interval = 0
+        assert "expired-jti" not in other_worker_store
+        db.session.rollback()
+        assert UserModel.find_by_username("admin").role == "admin"
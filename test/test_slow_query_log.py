@@ -0,0 +1,116 @@
+import json
+import pytest
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets an admin and a planner
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'admin', 'password': 'password', 'role': 'admin'},
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and an activity
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        MaintenanceActivityModel(activity_id=101, activity_type="planned", site="management", typology="electrical",
+                                 description="description", estimated_time=30, interruptible=True, week=1).save_to_db()
+    return True
+
+
+def login(client, seed):
+    """Sets the authorization header of the client for the given user
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post("/login", data=seed).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+@pytest.fixture
+def slow_query_log(app):
+    """Gets the slow query log of the app, logging every statement
+
+    Returns:
+        SlowQueryLog: The slow query log
+    """
+    slow_query_log = app.extensions["slow_query_log"]
+    slow_query_log.threshold = 0
+    return slow_query_log
+
+
+def test_top_offenders(app, client, user_seeds, slow_query_log):
+    """ Tests that the slow statements are listed with their caller, route and plan """
+    login(client, user_seeds[1])
+    slow_query_log.clear()
+    assert client.get("/activity/101").status_code == 200
+    slow_query_log.wait()
+
+    login(client, user_seeds[0])
+    res = client.get("/slow_queries?order=count&limit=50")
+    assert res.status_code == 200
+    rows = res.get_json()["rows"]
+    offender = next(row for row in rows
+                    if row["last"]["caller"].endswith("find_by_id"))
+    assert offender["count"] == 1
+    assert offender["last"]["route"] == "GET /activity/<int:id>"
+    assert offender["last"]["parameters"] == ["101", "1", "0"]
+    assert "USING INTEGER PRIMARY KEY" in offender["last"]["plan"]
+
+
+def test_admin_only(client, user_seeds):
+    """ Tests that only admins can list the slow statements """
+    login(client, user_seeds[1])
+    assert client.get("/slow_queries").status_code == 403
+    login(client, user_seeds[0])
+    res = client.get("/slow_queries?order=latency")
+    assert res.status_code == 400
+
+
+def test_rotating_file(app, tmp_path):
+    """ Tests that the slow statements are appended to the log file, and that writes are neither explained
+    nor logged with their parameters """
+    from common.slow_query_log import SlowQueryLog
+    path = tmp_path / "slow_queries.log"
+    slow_query_log = SlowQueryLog(threshold=0, path=str(path))
+    slow_query_log.init_app(app)
+    with app.app_context():
+        from models.maintenance_activity import MaintenanceActivityModel
+        MaintenanceActivityModel.find_by_id(101).delete_from_db()
+    slow_query_log.wait()
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert any(entry["statement"].startswith("SELECT") and entry["plan"]
+               for entry in entries)
+    assert any(entry["statement"].startswith("DELETE") and entry["plan"] is None
+               and entry["parameters"] == ["<redacted>"] for entry in entries)
+
+
+def test_sensitive_parameters(client, user_seeds, slow_query_log):
+    """ Tests that the parameters of the statements on the users are not logged """
+    slow_query_log.clear()
+    login(client, user_seeds[0])
+    slow_query_log.wait()
+    rows = client.get("/slow_queries?order=count&limit=50").get_json()["rows"]
+    users = [row["last"] for row in rows if "FROM users" in row["last"]["statement"]]
+    assert users
+    assert all(set(entry["parameters"]) == {"<redacted>"} for entry in users)
@@ -0,0 +1,178 @@
+import json
+import pytest
+from app import create_app
+from config import TestConfig
+
+
+@pytest.fixture
+def traces_path(tmp_path):
+    """Gets the file the traces are appended to
+
+    Returns:
+        pathlib.Path: The file path
+    """
+    return tmp_path / "traces.jsonl"
+
+
+@pytest.fixture
+def app(traces_path):
+    """Creates the app with tracing enabled, tracing no request unless asked by the traceparent header
+
+    Returns:
+        Flask: The Flask app
+    """
+    class TracingConfig(TestConfig):
+        TRACING_ENABLED = True
+        TRACING_SAMPLE_RATE = 0
+        TRACING_PATH = str(traces_path)
+
+    return create_app(TracingConfig)
+
+
+@pytest.fixture
+def user_seeds():
+    """Gets a planner and a maintainer
+
+    Returns:
+        list of (dict of (str, str)): list of users
+    """
+    return [
+        {'username': 'planner', 'password': 'password', 'role': 'planner'},
+        {'username': 'maintainer', 'password': 'password', 'role': 'maintainer'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def setup(app, user_seeds):
+    """Before each test it drops every table and recreates them.
+    Then it creates the users and an activity
+
+    Returns:
+        boolean: the return status
+    """
+    with app.app_context():
+        from db import db
+        db.drop_all()
+        db.create_all()
+        from models.user import UserModel
+        from models.maintenance_activity import MaintenanceActivityModel
+        for seed in user_seeds:
+            UserModel(**seed).save_to_db()
+        MaintenanceActivityModel(activity_id=101, activity_type="planned", site="management", typology="electrical",
+                                 description="description", estimated_time=30, interruptible=True, week=1).save_to_db()
+    return True
+
+
+@pytest.fixture
+def client(client, user_seeds):
+    """Gets the test client, logged in as planner
+
+    Returns:
+        FlaskClient: The test client
+    """
+    access_token = client.post(
+        "/login", data=user_seeds[0]).get_json()["access_token"]
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    return client
+
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+def traces(traces_path):
+    """Reads the exported traces
+
+    Returns:
+        list of (list of (dict of (str, any))): The spans of every trace
+    """
+    if not traces_path.exists():
+        return []
+    return [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+            for line in traces_path.read_text().splitlines()]
+
+
+def test_untraced_request(client, traces_path):
+    res = client.get("/maintainer/101/availabilities")
+    assert res.status_code == 200
+    assert "X-Trace-Id" not in res.headers
+    assert traces(traces_path) == []
+
+
+def test_traced_request(client, traces_path):
+    res = client.get("/maintainer/101/availabilities",
+                     headers={"traceparent": TRACEPARENT})
+    assert res.status_code == 200
+    assert res.headers["X-Trace-Id"] == TRACE_ID
+
+    [spans] = traces(traces_path)
+    by_id = {span["spanId"]: span for span in spans}
+    root = next(span for span in spans if span["kind"] == 2)
+    assert root["name"] == "GET /maintainer/<int:activity_id>/availabilities"
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in root["attributes"]
+    assert all(span["traceId"] == TRACE_ID for span in spans)
+    assert all(span["parentSpanId"] in by_id for span in spans if span is not root)
+
+    names = [span["name"] for span in spans]
+    assert "MaintainerWeeklyAvailabilityList.get" in names
+    assert "UserModel.get_weekly_percentage_availability" in names
+    assert names.count("MaintenanceActivityModel.find_all_in_day_for_user") == 7
+    statements = [span for span in spans if span["kind"] == 3]
+    assert statements and all(span["name"] == "SELECT" for span in statements)
+    weekly = next(span for span in spans if span["name"]
+                  == "UserModel.get_weekly_percentage_availability")
+    day = next(span for span in spans if span["name"]
+               == "MaintenanceActivityModel.find_all_in_day_for_user")
+    ancestors = []
+    while day is not root:
+        day = by_id[day["parentSpanId"]]
+        ancestors.append(day["spanId"])
+    assert weekly["spanId"] in ancestors
+    assert all(int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"]) for span in spans)
+
+
+def test_traced_agenda(client, traces_path):
+    res = client.get("/maintainer/maintainer/availability", query_string={"activity_id": 101, "week_day": "monday"},
+                     headers={"traceparent": TRACEPARENT})
+    assert res.status_code == 200
+    names = [span["name"] for span in traces(traces_path)[0]]
+    assert "MaintainerDailyAvailability.get" in names
+    assert "UserModel.DailyAgenda._calculate_agenda_dictionary" in names
+
+
+def test_unsampled_traceparent(client, traces_path):
+    res = client.get("/maintainer/101/availabilities",
+                     headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-00"})
+    assert "X-Trace-Id" not in res.headers
+    assert traces(traces_path) == []
+
+
+def test_sample_rate(app, client, traces_path):
+    app.extensions["tracer"].sample_rate = 1
+    res = client.get("/activities", query_string={"week": 1})
+    assert res.status_code == 200
+    [spans] = traces(traces_path)
+    assert {span["traceId"] for span in spans} == {res.headers["X-Trace-Id"]}
+    assert not any("parentSpanId" in span for span in spans if span["kind"] == 2)
+
+
+def test_batch_sub_requests(client, traces_path):
+    res = client.post("/batch", json={"requests": [
+        {"method": "GET", "path": "/activities?week=1"},
+        {"method": "GET", "path": "/maintainer/101/availabilities"},
+    ]}, headers={"traceparent": TRACEPARENT})
+    assert res.status_code == 200
+    # the reads run on the pool threads, each one exporting its part of the trace
+    spans = [span for trace in traces(traces_path) for span in trace]
+    by_id = {span["spanId"]: span for span in spans}
+    assert {span["traceId"] for span in spans} == {TRACE_ID}
+    servers = {span["name"]: span for span in spans if span["kind"] == 2}
+    assert set(servers) == {"POST /batch", "GET /activities",
+                            "GET /maintainer/<int:activity_id>/availabilities"}
+    assert servers["GET /activities"]["parentSpanId"] == servers["POST /batch"]["spanId"]
+    assert all(span["parentSpanId"] in by_id for span in spans if span is not servers["POST /batch"])
+
+
+def test_tracing_disabled():
+    assert "tracer" not in create_app(TestConfig).extensions